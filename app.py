@@ -13,7 +13,11 @@ from huggingface_hub import sync_bucket
 from loguru import logger
 
 from medirag.cache.local import LocalSemanticCache
-from medirag.index.lance import LanceIndexer
+from medirag.core.models import MODELS as MODEL_REGISTRY
+from medirag.index.embed_cache import EmbeddingCache
+from medirag.index.lance import EMBED_DIM, EMBED_MODEL, LanceIndexer
+from medirag.index.query_cache import QueryEmbeddingCache
+from medirag.index.rerank import CrossEncoderReranker
 from medirag.rag.dspy import DspyRAG
 from medirag.rag.pipeline import answer_stream
 
@@ -23,6 +27,28 @@ load_dotenv()
 LANCE_DB_PATH = os.getenv("LANCE_DB_PATH", "./lance_db")
 LANCE_TABLE = os.getenv("LANCE_TABLE", "spl")
 CACHE_FILE = os.getenv("CACHE_FILE", "rag_cache.json")
+# Semantic cache embedding model. Set to the index's EMBED_MODEL to reuse each question's retrieval embedding instead
+# of loading a second model; retune SEMANTIC_CACHE_THRESHOLD for it, since similarity scales differ between models.
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-mpnet-base-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# ANN query knobs, only used when the table has a vector index (see medirag.index.ann_report)
+LANCE_NPROBES = int(os.getenv("LANCE_NPROBES", "0")) or None
+LANCE_REFINE_FACTOR = int(os.getenv("LANCE_REFINE_FACTOR", "0")) or None
+# Recent query vectors kept in memory (0 disables), their TTL, and an optional directory that keeps them across restarts
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR")
+# Concurrent questions are encoded together: each batch waits up to ENCODER_BATCH_WINDOW_MS (0 disables batching) for
+# up to ENCODER_MAX_BATCH texts, then runs one forward pass.
+ENCODER_BATCH_WINDOW_MS = float(os.getenv("ENCODER_BATCH_WINDOW_MS", "5"))
+ENCODER_MAX_BATCH = int(os.getenv("ENCODER_MAX_BATCH", "32"))
+# Optional cross-encoder reranking (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; unset disables it): retrieve
+# RERANK_OVERFETCH x top-k candidates, rescore as many as fit in RERANK_BUDGET_MS. Pairs well with low LANCE_NPROBES.
+RERANK_MODEL = os.getenv("RERANK_MODEL")
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "4"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+# Load the encoders (and run one forward pass) at startup rather than on the first question.
+WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "1") == "1"
 HF_BUCKET = os.getenv("HF_BUCKET")  # e.g. "alvinhenrick/dailymed-embeddings"
 HF_BUCKET_PREFIX = os.getenv("HF_BUCKET_PREFIX", "lance_db/v1")  # path inside the bucket
 
@@ -46,17 +72,57 @@ DEFAULT_MODEL_LABEL = "GPT-4o mini (fast, cheap)"
 DEFAULT_TOP_K = 7
 
 
+query_cache = (
+    QueryEmbeddingCache(
+        EMBED_MODEL,
+        max_entries=QUERY_CACHE_SIZE,
+        ttl=QUERY_CACHE_TTL,
+        persistent=EmbeddingCache(QUERY_CACHE_DIR, EMBED_MODEL, EMBED_DIM, max_entries=100_000)
+        if QUERY_CACHE_DIR
+        else None,
+    )
+    if QUERY_CACHE_SIZE
+    else None
+)
+
+
+def _batcher(model: str, device: str | None = None):
+    if not ENCODER_BATCH_WINDOW_MS:
+        return None
+    return MODEL_REGISTRY.batcher(model, device, max_batch_size=ENCODER_MAX_BATCH, max_wait_ms=ENCODER_BATCH_WINDOW_MS)
+
+
 logger.info(f"Loading LanceDB index from {LANCE_DB_PATH} (table={LANCE_TABLE})")
-indexer = LanceIndexer(db_path=LANCE_DB_PATH, table_name=LANCE_TABLE)
+indexer = LanceIndexer(
+    db_path=LANCE_DB_PATH,
+    table_name=LANCE_TABLE,
+    nprobes=LANCE_NPROBES,
+    refine_factor=LANCE_REFINE_FACTOR,
+    query_cache=query_cache,
+    query_batcher=_batcher(EMBED_MODEL, "cpu"),  # the indexer encodes queries on CPU
+    reranker=CrossEncoderReranker(RERANK_MODEL, overfetch=RERANK_OVERFETCH, budget_ms=RERANK_BUDGET_MS)
+    if RERANK_MODEL
+    else None,
+)
 if indexer.table is None:
     logger.warning(f"No index found at {LANCE_DB_PATH}. Build one with `uv run python -m medirag.index.runner`.")
 
 semantic_cache = LocalSemanticCache(
-    model_name="sentence-transformers/all-mpnet-base-v2",
+    model_name=SEMANTIC_CACHE_MODEL,
     dimension=768,
     json_file=CACHE_FILE,
+    load_encoder=SEMANTIC_CACHE_MODEL != EMBED_MODEL,  # otherwise answer_stream passes the indexer's query vector
+    batcher=_batcher(SEMANTIC_CACHE_MODEL) if SEMANTIC_CACHE_MODEL != EMBED_MODEL else None,
 )
 
+if WARM_UP_MODELS:
+    MODEL_REGISTRY.warm_up(EMBED_MODEL, "cpu")  # the indexer's query encoder
+    if semantic_cache.load_encoder:
+        MODEL_REGISTRY.warm_up(SEMANTIC_CACHE_MODEL)
+    if RERANK_MODEL:
+        MODEL_REGISTRY.cross_encoder(RERANK_MODEL, "cpu")
+    MODEL_REGISTRY.log_memory()
+
 
 def clear_cache() -> None:
     semantic_cache.clear()
@@ -71,13 +137,13 @@ async def ask(query: str, model_label: str):
     model_id = MODELS.get(model_label, MODELS[DEFAULT_MODEL_LABEL])
     lm = dspy.LM(model_id, max_tokens=1500)
 
-    rag = DspyRAG(indexer=indexer, k=DEFAULT_TOP_K, hybrid=True)
+    rag = DspyRAG(indexer=indexer, k=DEFAULT_TOP_K, hybrid=True, rerank=indexer.reranker is not None)
 
     # DSPy 3 requires per-task configuration; Gradio spawns a new task per request,
     # so we use `dspy.context()` instead of a global `dspy.configure()`.
     with dspy.context(lm=lm):
         accumulated = ""
-        async for chunk in answer_stream(rag, semantic_cache, query):
+        async for chunk in answer_stream(rag, semantic_cache, query, cosine_threshold=SEMANTIC_CACHE_THRESHOLD):
             accumulated += chunk
             yield accumulated
 
@@ -118,4 +184,16 @@ with gr.Blocks(title="MediRAG") as app:
 
 
 if __name__ == "__main__":
-    app.launch(css=css)
+    try:
+        app.launch(css=css)
+    finally:
+        indexer.close()
+        MODEL_REGISTRY.close_batchers()  # logs each encoder's batch-size and latency summary
+        if indexer.reranker is not None:
+            stats = indexer.reranker.stats()
+            logger.info(
+                f"Reranker: {stats['candidates']['mean']:.1f} candidates scored per query, latency p95 <= "
+                f"{stats['latency_ms']['p95']:g} ms, score cache hit rate {stats['cache_hit_rate']:.0%}"
+            )
+        if query_cache is not None:
+            query_cache.close()  # flushes the on-disk tier
@@ -1,20 +1,27 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
+
 
 class SemanticCache(ABC):
     """
     Abstract base class for semantic caching mechanisms.
+
+    `model_name` is the embedding model questions are compared with. Callers that already hold a question's embedding
+    from that model (e.g. the retriever's query vector) pass it as `vector`, and the cache skips encoding it again.
     """
 
+    model_name: str | None = None
+
     @abstractmethod
-    def lookup(self, question: str, cosine_threshold: float):
+    def lookup(self, question: str, cosine_threshold: float, vector: np.ndarray | None = None):
         """
         Retrieve a response from the cache based on the question and cosine similarity threshold.
         """
         pass
 
     @abstractmethod
-    def save(self, question: str, answer: str):
+    def save(self, question: str, answer: str, vector: np.ndarray | None = None):
         """
         Save a question-answer pair to the cache.
         """
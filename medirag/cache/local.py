@@ -3,8 +3,21 @@ Semantic cache backed by a normalized numpy matrix + cosine similarity.
 
 Small enough that brute-force search beats maintaining an ANN index, and avoids a faiss-cpu BLAS conflict with
 pyarrow/lancedb on macOS.
+
+The encoder comes from the process-wide model registry (`medirag.core.models`) on first use, so a cache keyed on a
+model some other component already loaded shares that instance. With `load_encoder=False` the cache uses no model:
+every lookup and save passes the question's `vector`, embedded by `model_name` elsewhere. Keyed on the retriever's
+model, that lets `answer_stream` embed each question once for both the cache and retrieval. The cache file records its
+model, and a file written with another model is ignored. With a `batcher` (`MODELS.batcher`) the cache's encodes join
+concurrent requests' forward passes instead of running alone.
+
+Lookups and saves may run on several threads at once. Questions are encoded outside the cache's lock; reading the
+matrix, appending a row and writing the file happen under it, so the matrix rows and the stored answers stay aligned.
+The file is written to a temporary name and renamed into place.
 """
 
+import os
+import threading
 from pathlib import Path
 
 import json
@@ -14,9 +27,12 @@ from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 from medirag.cache.abc import SemanticCache
+from medirag.core.batching import MicroBatchEncoder
+from medirag.core.models import MODELS
 
 
 class SemanticCacheModel(BaseModel):
+    model_name: str | None = None  # None: written before the model was recorded
     questions: list[str] = []
     embeddings: list[list[float]] = []
     response_text: list[str] = []
@@ -28,20 +44,38 @@ class LocalSemanticCache(SemanticCache):
         model_name: str = "sentence-transformers/all-mpnet-base-v2",
         dimension: int = 768,
         json_file: str = "cache.json",
+        load_encoder: bool = True,
+        batcher: MicroBatchEncoder | None = None,
     ):
+        if batcher is not None and batcher.model_name != model_name:
+            raise ValueError(f"Batcher encodes with {batcher.model_name}, not {model_name}")
         self.model_name = model_name
         self.dimension = dimension
         self.json_file = json_file
-        self.encoder = SentenceTransformer(model_name)
-        self._cache = SemanticCacheModel()
+        self.load_encoder = load_encoder
+        self.batcher = batcher if load_encoder else None
+        self._cache = SemanticCacheModel(model_name=model_name)
         self._matrix: np.ndarray = np.zeros((0, dimension), dtype=np.float32)
+        self._lock = threading.Lock()
         self.load_cache()
 
+    @property
+    def encoder(self) -> SentenceTransformer | None:
+        return MODELS.get(self.model_name) if self.load_encoder and self.model_name is not None else None
+
     def load_cache(self) -> None:
         try:
             with open(self.json_file, "r") as file:
                 data = json.load(file)
-            self._cache = SemanticCacheModel(**data)
+            cache = SemanticCacheModel(**data)
+            if cache.model_name not in (None, self.model_name):
+                logger.warning(
+                    f"Cache file {self.json_file} was built with {cache.model_name}, not {self.model_name}; "
+                    "starting empty"
+                )
+                return
+            self._cache = cache
+            self._cache.model_name = self.model_name
             if self._cache.embeddings:
                 self._matrix = np.asarray(self._cache.embeddings, dtype=np.float32)
         except FileNotFoundError:
@@ -52,41 +86,59 @@ class LocalSemanticCache(SemanticCache):
             logger.error(f"Failed to load or process cache: {e}")
 
     def save_cache(self):
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
         data = self._cache.model_dump()
-        with open(self.json_file, "w") as file:
+        tmp = f"{self.json_file}.tmp"
+        with open(tmp, "w") as file:
             json.dump(data, file, indent=4)
+        os.replace(tmp, self.json_file)
         logger.info("Cache saved successfully.")
 
-    def _encode(self, text: str) -> np.ndarray:
-        vec = self.encoder.encode([text], show_progress_bar=False, normalize_embeddings=True)
-        return np.asarray(vec, dtype=np.float32).reshape(1, -1)
+    def _encode(self, text: str, vector: np.ndarray | None = None) -> np.ndarray:
+        if vector is None:
+            if self.batcher is not None:
+                vector = self.batcher.encode([text])
+            else:
+                encoder = self.encoder
+                if encoder is None:
+                    raise ValueError(f"{type(self).__name__} has no encoder loaded; pass the question's vector")
+                vector = encoder.encode([text], show_progress_bar=False, normalize_embeddings=True)
+        return np.asarray(vector, dtype=np.float32).reshape(1, -1)
 
-    def lookup(self, question: str, cosine_threshold: float = 0.7) -> str | None:
+    def lookup(self, question: str, cosine_threshold: float = 0.7, vector: np.ndarray | None = None) -> str | None:
         if self._matrix.shape[0] == 0:
             return None
-        q = self._encode(question)
-        sims = (self._matrix @ q.T).ravel()
-        best = int(np.argmax(sims))
-        if float(sims[best]) >= cosine_threshold:
-            return self._cache.response_text[best]
+        q = self._encode(question, vector)
+        with self._lock:
+            if self._matrix.shape[0] == 0:  # cleared while encoding
+                return None
+            sims = (self._matrix @ q.T).ravel()
+            best = int(np.argmax(sims))
+            if float(sims[best]) >= cosine_threshold:
+                return self._cache.response_text[best]
         return None
 
-    def save(self, question: str, response: str):
-        q = self._encode(question)
-        self._cache.questions.append(question)
-        self._cache.embeddings.append(q.ravel().tolist())
-        self._cache.response_text.append(response)
-        self._matrix = np.vstack([self._matrix, q]) if self._matrix.size else q
-        self.save_cache()
+    def save(self, question: str, response: str, vector: np.ndarray | None = None):
+        q = self._encode(question, vector)
+        with self._lock:
+            self._cache.questions.append(question)
+            self._cache.embeddings.append(q.ravel().tolist())
+            self._cache.response_text.append(response)
+            self._matrix = np.vstack([self._matrix, q]) if self._matrix.size else q
+            self._write()
         logger.info("New response saved to cache.")
 
     def clear(self):
-        self._cache = SemanticCacheModel()
-        self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
-        cache_file_path = Path(self.json_file)
-        try:
-            cache_file_path.unlink(missing_ok=True)
-            logger.info(f"Cache file {self.json_file} deleted successfully.")
-        except Exception as e:
-            logger.error(f"Failed to delete cache file {self.json_file}: {e}")
+        with self._lock:
+            self._cache = SemanticCacheModel(model_name=self.model_name)
+            self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+            cache_file_path = Path(self.json_file)
+            try:
+                cache_file_path.unlink(missing_ok=True)
+                logger.info(f"Cache file {self.json_file} deleted successfully.")
+            except Exception as e:
+                logger.error(f"Failed to delete cache file {self.json_file}: {e}")
         logger.info("Cache cleared.")
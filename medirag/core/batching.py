@@ -0,0 +1,149 @@
+"""
+Micro-batching encoder: concurrent single-query encodes coalesced into one forward pass.
+
+Under load every request encodes its own question, a batch of one, and a CPU forward pass over one short text leaves
+most of the cores' throughput unused. MicroBatchEncoder queues each caller's texts and a dedicated thread drains the
+queue: it takes the first request, waits up to `max_wait_ms` for more (or until `max_batch_size` texts are pending),
+encodes them all in one `encode` call and resolves each caller's future with its own rows. A lone request pays at most
+the window in extra latency; a burst of N requests costs one pass instead of N.
+
+`stats()` reports histograms of batch size and of end-to-end latency (queued + encoded), to tune the window against.
+Get instances from `MODELS.batcher()` so every component encoding with one model shares one queue.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+from loguru import logger
+
+from medirag.core.metrics import Histogram
+
+
+BATCH_SIZE_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128)
+LATENCY_MS_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+@dataclass
+class _Request:
+    texts: list[str]
+    future: Future = field(default_factory=Future)
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatchEncoder:
+    """
+    Thread-safe encode service over one model; `load_model` is called on the first batch, on the service's thread.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        load_model: Callable[[], Any],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Histogram(BATCH_SIZE_BOUNDS)
+        self.latency_ms = Histogram(LATENCY_MS_BOUNDS)
+        self._load_model = load_model
+        self._queue: queue.SimpleQueue[_Request | None] = queue.SimpleQueue()
+        self._lock = threading.Lock()  # orders submits against close(), so nothing is queued behind the stop marker
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"encode-{model_name.rsplit('/', 1)[-1]}", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> "Future[np.ndarray]":
+        """
+        Queue `texts` for the next batch; the future resolves to their normalized embeddings, one row per text.
+        """
+        request = _Request(list(texts))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Encoder for {self.model_name} is closed")
+            self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def stats(self) -> dict:
+        return {"batch_size": self.batch_sizes.snapshot(), "latency_ms": self.latency_ms.snapshot()}
+
+    def close(self) -> None:
+        """
+        Stop the service after the requests already queued; logs its batch-size and latency summary.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        if self.batch_sizes.count:
+            logger.info(
+                f"Encoder {self.model_name}: {self.batch_sizes.count} batches, mean size "
+                f"{self.batch_sizes.sum / self.batch_sizes.count:.1f}, latency p50 <= "
+                f"{self.latency_ms.quantile(0.5):g} ms, p99 <= {self.latency_ms.quantile(0.99):g} ms"
+            )
+
+    def _run(self) -> None:
+        carry: _Request | None = None  # a request that didn't fit the previous batch
+        stopping = False
+        while not stopping:
+            first = carry if carry is not None else self._queue.get()
+            carry = None
+            if first is None:
+                break
+            batch, pending = [first], len(first.texts)
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while pending < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                if pending + len(request.texts) > self.max_batch_size:
+                    carry = request
+                    break
+                batch.append(request)
+                pending += len(request.texts)
+            self._encode(batch)
+
+    def _encode(self, batch: list[_Request]) -> None:
+        # Callers may have given up (e.g. a cancelled request); don't spend the forward pass on them.
+        batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        texts = [t for r in batch for t in r.texts]
+        if not texts:
+            for r in batch:
+                r.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return
+        try:
+            vectors = self._load_model().encode(
+                texts,
+                batch_size=len(texts),
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        except Exception as e:
+            for r in batch:
+                r.future.set_exception(e)
+            return
+        self.batch_sizes.observe(len(texts))
+        done = time.perf_counter()
+        start = 0
+        for r in batch:
+            r.future.set_result(vectors[start : start + len(r.texts)])
+            start += len(r.texts)
+            self.latency_ms.observe((done - r.submitted) * 1000)
@@ -0,0 +1,243 @@
+"""
+Random-access catalog of the SPLs inside DailyMed zips.
+
+One row per SPL: `set_id`, `version`, the outer `zip`, the `member` of it holding the label (an inner zip, or the
+XML itself), the `inner` XML's name when `member` is a zip, and where `member`'s bytes sit in the outer zip (`offset`
+of its local file header, compressed `size` and compression `method`). Names are kept whole, so members under
+directories ("prescription/20240101_abc.zip") resolve like any other. With those, `read_spl_xml` seeks straight to
+one label — no central-directory walk of the outer zip and no other inner zip opened — so a single set_id can be
+re-indexed, or a parser bug reproduced, in milliseconds instead of a multi-minute scan of the bundle.
+
+Building a catalog only reads the head of each XML, where `setId` and `versionNumber` sit; it is stored as one
+Parquet file sorted by set_id.
+
+Usage:
+    uv run python -m medirag.core.catalog --catalog spl_catalog.parquet --build parts/dm_spl_release_human_rx_part*.zip
+
+    # Where a label lives, and what the parser makes of it
+    uv run python -m medirag.core.catalog --catalog spl_catalog.parquet --show BE27854A-A805-4300-9729-ACCD1B7F226F
+"""
+
+import argparse
+import mmap
+import re
+import sys
+import zipfile
+import zlib
+from dataclasses import asdict, dataclass, replace
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator, cast
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from loguru import logger
+
+from medirag.core.reader import _LOCAL_FILE_HEADER, ENGINES, _MemberWindow, _open_inner_zip, parse_spl
+
+SCHEMA = pa.schema(
+    [
+        ("set_id", pa.string()),
+        ("version", pa.string()),
+        ("zip", pa.dictionary(pa.int32(), pa.string())),
+        ("member", pa.string()),
+        ("inner", pa.string()),
+        ("offset", pa.int64()),
+        ("size", pa.int64()),
+        ("method", pa.int8()),
+    ]
+)
+
+# setId and versionNumber are document-header elements, ahead of the first <component>.
+_HEAD_BYTES = 16 << 10
+_SET_ID = re.compile(rb"<setId\b[^>]*?\broot=\"([^\"]+)\"")
+_VERSION = re.compile(rb"<versionNumber\b[^>]*?\bvalue=\"([^\"]+)\"")
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    set_id: str
+    version: str | None
+    zip: str  # outer zip, as an absolute path when the catalog was built
+    member: str  # entry of the outer zip: an inner zip, or the XML itself
+    inner: str | None  # the XML inside `member` when it is a zip
+    offset: int  # local file header of `member`
+    size: int  # compressed size of that entry
+    method: int  # its zipfile compression type
+
+    @property
+    def path(self) -> str:
+        """
+        Where the XML sits, named as `iter_spl_xml` names it ("spl.zip/name.xml" or "name.xml").
+        """
+        return f"{self.member}/{self.inner}" if self.inner is not None else self.member
+
+
+def _version_key(entry: CatalogEntry) -> tuple[int, str]:
+    version = entry.version or ""
+    return (int(version), "") if version.isdigit() else (-1, version)
+
+
+def _header_ids(head: bytes) -> tuple[str | None, str | None]:
+    set_id = _SET_ID.search(head)
+    version = _VERSION.search(head)
+    return (
+        set_id[1].decode() if set_id else None,
+        version[1].decode() if version else None,
+    )
+
+
+def _read_ids(open_member: Callable[[], IO[bytes]]) -> tuple[str | None, str | None]:
+    with open_member() as f:
+        set_id, version = _header_ids(f.read(_HEAD_BYTES))
+    if set_id is None or version is None:  # unusually long header: fall back to the whole document
+        with open_member() as f:
+            set_id, version = _header_ids(f.read())
+    return set_id, version
+
+
+def _entries(
+    zip_path: Path, info: zipfile.ZipInfo, members: Iterable[tuple[str | None, Callable[[], IO[bytes]]]]
+) -> Iterator[CatalogEntry]:
+    # `members` pairs each XML's name inside `info` (None when `info` is the XML) with an opener for it.
+    for inner, open_member in members:
+        set_id, version = _read_ids(open_member)
+        if set_id is None:
+            where = f"{info.filename}/{inner}" if inner is not None else info.filename
+            logger.warning(f"{zip_path.name}:{where}: no setId, not cataloged")
+            continue
+        yield CatalogEntry(
+            set_id=set_id,
+            version=version,
+            zip=str(zip_path),
+            member=info.filename,
+            inner=inner,
+            offset=info.header_offset,
+            size=info.compress_size,
+            method=info.compress_type,
+        )
+
+
+def scan_zip(zip_path: str | Path) -> Iterator[CatalogEntry]:
+    """
+    Yield a CatalogEntry for every SPL XML in a DailyMed zip, descending into nested zips like `iter_spl_xml`.
+    """
+    zip_path = Path(zip_path).resolve()
+    with open(zip_path, "rb") as raw, zipfile.ZipFile(raw, "r") as outer:
+        with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for info in outer.infolist():
+                if info.filename.endswith(".xml"):
+                    yield from _entries(zip_path, info, [(None, partial(outer.open, info))])
+                elif info.filename.endswith(".zip"):
+                    with _open_inner_zip(outer, buf, info) as inner_file, zipfile.ZipFile(inner_file) as inner:
+                        members = [
+                            (name, partial(inner.open, name)) for name in inner.namelist() if name.endswith(".xml")
+                        ]
+                        yield from _entries(zip_path, info, members)
+
+
+def build_catalog(zip_paths: Iterable[str | Path], path: str | Path) -> int:
+    """
+    Catalog every SPL in `zip_paths` into a Parquet file at `path`. Returns the number of SPLs cataloged.
+    """
+    entries: list[CatalogEntry] = []
+    for zip_path in zip_paths:
+        n = len(entries)
+        entries.extend(scan_zip(zip_path))
+        logger.info(f"Cataloged {len(entries) - n} SPLs from {zip_path}")
+    table = pa.Table.from_pylist([asdict(e) for e in entries], schema=SCHEMA).sort_by("set_id")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, path)
+    return table.num_rows
+
+
+class SplCatalog:
+    """
+    Catalog lookups by set_id. `zip_dir`, if given, is where the cataloged zips are now (matched by file name).
+    """
+
+    def __init__(self, path: str | Path, zip_dir: str | Path | None = None):
+        self.path = Path(path)
+        self.zip_dir = Path(zip_dir) if zip_dir is not None else None
+        self._table = pq.read_table(self.path)
+
+    def __len__(self) -> int:
+        return self._table.num_rows
+
+    def lookup(self, set_id: str) -> list[CatalogEntry]:
+        """
+        Every cataloged copy of `set_id`, newest version first.
+        """
+        rows = self._table.filter(pc.equal(self._table["set_id"], set_id)).to_pylist()
+        entries = [CatalogEntry(**row) for row in rows]
+        if self.zip_dir is not None:
+            entries = [replace(e, zip=str(self.zip_dir / Path(e.zip).name)) for e in entries]
+        return sorted(entries, key=_version_key, reverse=True)
+
+    def find(self, set_id: str, version: str | None = None) -> CatalogEntry:
+        """
+        The newest cataloged copy of `set_id`, or the one at `version`. Raises KeyError if there is none.
+        """
+        for entry in self.lookup(set_id):
+            if version is None or entry.version == version:
+                return entry
+        raise KeyError(f"{set_id} (version {version})" if version is not None else set_id)
+
+
+def _open_entry(buf: mmap.mmap, entry: CatalogEntry) -> IO[bytes]:
+    header = _LOCAL_FILE_HEADER.unpack_from(buf, entry.offset)
+    if header[0] != b"PK\x03\x04":
+        raise ValueError(f"{entry.zip}: no zip entry at offset {entry.offset}; catalog is stale")
+    name_len, extra_len = header[10], header[11]
+    start = entry.offset + _LOCAL_FILE_HEADER.size + name_len + extra_len
+    if entry.method == zipfile.ZIP_STORED:
+        return cast(IO[bytes], _MemberWindow(buf, start, entry.size))
+    if entry.method == zipfile.ZIP_DEFLATED:
+        return BytesIO(zlib.decompress(buf[start : start + entry.size], -zlib.MAX_WBITS))
+    raise ValueError(f"{entry.zip}:{entry.member}: unsupported compression method {entry.method}")
+
+
+def read_spl_xml(entry: CatalogEntry) -> bytes:
+    """
+    Raw XML of one cataloged SPL, read straight from its offset in the outer zip.
+    """
+    with open(entry.zip, "rb") as raw, mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        with _open_entry(buf, entry) as f:
+            if entry.inner is None:
+                return f.read()
+            with zipfile.ZipFile(f) as inner, inner.open(entry.inner) as xml:
+                return xml.read()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", required=True, help="Catalog Parquet file")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--build", nargs="+", metavar="ZIP", help="DailyMed zips to catalog (replaces the catalog)")
+    action.add_argument("--show", metavar="SET_ID", help="Print where a label lives and the records it parses into")
+    parser.add_argument("--zip-dir", default=None, help="Where the cataloged zips are now, if they have moved")
+    parser.add_argument("--engine", choices=ENGINES, default="iterparse", help="Parser for --show")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        n = build_catalog(args.build, args.catalog)
+        logger.info(f"Wrote {n} SPLs to {args.catalog}")
+        return 0
+
+    catalog = SplCatalog(args.catalog, zip_dir=args.zip_dir)
+    entries = catalog.lookup(args.show)
+    if not entries:
+        logger.error(f"{args.show} is not in {args.catalog}")
+        return 1
+    for entry in entries:
+        print(f"version {entry.version}: {entry.zip} → {entry.path} @ {entry.offset}")
+    for record in parse_spl(read_spl_xml(entries[0]), engine=args.engine):
+        print(f"  {record.kind:<12} {getattr(record, 'loinc', '') or '':<8} {record.text[:80]!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
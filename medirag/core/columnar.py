@@ -0,0 +1,108 @@
+"""
+Columnar record builder: SPL records straight into pyarrow RecordBatches.
+
+Turning every record into a row dict only for LanceDB to convert it back into columns costs a Python dict per row.
+RecordBatchBuilder appends each field directly onto its column and converts whole columns at once, so
+`LanceIndexer.add` can hand Arrow data to Lance with no per-row dicts in between. The layout is the `spl` table schema
+minus `vector`, which `with_vectors` attaches before the write.
+"""
+
+from typing import Iterable
+
+import numpy as np
+import pyarrow as pa
+
+from medirag.core.reader import ProductCard, SectionRecord
+
+
+_STR_LIST = pa.list_(pa.string())
+
+ROW_SCHEMA = pa.schema(
+    [
+        pa.field("set_id", pa.string(), nullable=False),
+        pa.field("version", pa.string()),
+        pa.field("drug_name", pa.string(), nullable=False),
+        pa.field("kind", pa.string(), nullable=False),
+        pa.field("text", pa.string(), nullable=False),
+        pa.field("loinc", pa.string(), nullable=False),
+        pa.field("section_title", pa.string(), nullable=False),
+        pa.field("is_patient_facing", pa.bool_(), nullable=False),
+        pa.field("generic_name", pa.string(), nullable=False),
+        pa.field("manufacturer", pa.string(), nullable=False),
+        pa.field("dosage_form", pa.string(), nullable=False),
+        pa.field("route", pa.string(), nullable=False),
+        pa.field("active_ingredient_uniis", _STR_LIST, nullable=False),
+        pa.field("active_ingredient_names", _STR_LIST, nullable=False),
+        pa.field("inactive_ingredient_names", _STR_LIST, nullable=False),
+        pa.field("ndcs", _STR_LIST, nullable=False),
+    ]
+)
+
+_EMPTY: list[str] = []
+
+
+class RecordBatchBuilder:
+    """
+    Accumulates records column by column; `finish()` emits them as one RecordBatch and starts over.
+    """
+
+    def __init__(self):
+        self._columns: dict[str, list] = {name: [] for name in ROW_SCHEMA.names}
+
+    def __len__(self) -> int:
+        return len(self._columns["set_id"])
+
+    def extend(self, records: Iterable[ProductCard | SectionRecord]) -> None:
+        c = self._columns
+        for r in records:
+            c["set_id"].append(r.set_id)
+            c["version"].append(r.version)
+            c["drug_name"].append(r.drug_name)
+            c["kind"].append(r.kind)
+            c["text"].append(r.text)
+            if isinstance(r, ProductCard):
+                c["loinc"].append("")
+                c["section_title"].append("")
+                c["is_patient_facing"].append(False)
+                c["generic_name"].append(r.generic_name or "")
+                c["manufacturer"].append(r.manufacturer or "")
+                c["dosage_form"].append(r.dosage_form or "")
+                c["route"].append(r.route or "")
+                c["active_ingredient_uniis"].append(r.active_ingredient_uniis)
+                c["active_ingredient_names"].append(r.active_ingredient_names)
+                c["inactive_ingredient_names"].append(r.inactive_ingredients)
+                c["ndcs"].append(r.ndcs)
+            else:
+                c["loinc"].append(r.loinc)
+                c["section_title"].append(r.section_title)
+                c["is_patient_facing"].append(r.is_patient_facing)
+                c["generic_name"].append("")
+                c["manufacturer"].append("")
+                c["dosage_form"].append("")
+                c["route"].append("")
+                c["active_ingredient_uniis"].append(_EMPTY)
+                c["active_ingredient_names"].append(_EMPTY)
+                c["inactive_ingredient_names"].append(_EMPTY)
+                c["ndcs"].append(_EMPTY)
+
+    def finish(self) -> pa.RecordBatch:
+        arrays = [pa.array(self._columns[f.name], type=f.type) for f in ROW_SCHEMA]
+        self._columns = {name: [] for name in ROW_SCHEMA.names}
+        return pa.RecordBatch.from_arrays(arrays, schema=ROW_SCHEMA)
+
+
+def to_record_batch(records: Iterable[ProductCard | SectionRecord]) -> pa.RecordBatch:
+    builder = RecordBatchBuilder()
+    builder.extend(records)
+    return builder.finish()
+
+
+def with_vectors(rows: pa.RecordBatch, vectors: np.ndarray) -> pa.RecordBatch:
+    """
+    Append `vectors` as the fixed-size-list `vector` column Lance expects (float16 vectors stay float16).
+    """
+    dim = vectors.shape[1]
+    dtype = np.float16 if vectors.dtype == np.float16 else np.float32
+    flat = pa.array(np.ascontiguousarray(vectors, dtype=dtype).reshape(-1))
+    column = pa.FixedSizeListArray.from_arrays(flat, dim)
+    return rows.append_column(pa.field("vector", pa.list_(flat.type, dim)), column)
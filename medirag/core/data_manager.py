@@ -5,6 +5,8 @@ import requests
 import shutil
 from loguru import logger
 
+from medirag.core.download import Downloader, DownloadError, prefetch
+
 
 class DailyMedDataManager:
     def __init__(self, download_sources):
@@ -14,6 +16,7 @@ class DailyMedDataManager:
         self.extracted_dir = self.temp_dir / "common"
         self.extracted_dir.mkdir(parents=True, exist_ok=True)
         self.downloaded_files = []
+        self.downloader = Downloader()
         logger.info("Initialized DailyMedDataManager with temporary directories.")
 
     def download_zip(self, source):
@@ -23,19 +26,14 @@ class DailyMedDataManager:
         try:
             if source.startswith("http://") or source.startswith("https://"):
                 logger.info(f"Downloading and processing: {source}")
-                local_zip_path = self.temp_dir / Path(source).name
-                with requests.get(source, stream=True, timeout=10) as r:
-                    r.raise_for_status()
-                    with open(local_zip_path, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=65536):
-                            f.write(chunk)
+                local_zip_path = self.downloader.fetch(source, self.temp_dir / Path(source).name)
                 self.downloaded_files.append(local_zip_path)
             else:
                 logger.info(f"Processing local file: {source}")
                 local_zip_path = Path(source)
                 self.downloaded_files.append(local_zip_path)
             return local_zip_path
-        except requests.RequestException as e:
+        except (requests.RequestException, DownloadError) as e:
             logger.error(f"Failed to download {source}: {e}")
             return None
 
@@ -52,10 +50,9 @@ class DailyMedDataManager:
 
     def download_and_extract_zip(self):
         """
-        Downloads and extracts all zip files.
+        Downloads and extracts all zip files, fetching the next one while the current one is extracted.
         """
-        for source in self.download_sources:
-            zip_path = self.download_zip(source)
+        for source, zip_path in prefetch(self.download_sources, self.download_zip):
             if zip_path:
                 self.extract_zip(zip_path)
 
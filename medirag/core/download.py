@@ -0,0 +1,312 @@
+"""
+Resumable, verifiable HTTP downloads for DailyMed bundles, with background prefetch.
+
+A download streams into `<dest>.part` and is renamed to `dest` only once its size and its checksum (or, for a `.zip`
+given none, its own CRCs) check out, so a file at `dest` is always complete. An interrupted download, whether a
+dropped connection or a killed process, picks up from the bytes already on disk with an HTTP Range request instead of
+starting over.
+
+With `segments > 1` and a server that accepts ranges, the file is fetched as that many byte ranges on parallel
+connections, each written in place into a preallocated `.part` file. Per-segment progress is kept in
+`<dest>.part.json` so a segmented download resumes too; it is recorded only after the bytes it covers are synced to
+disk, so a killed process never resumes past a hole.
+
+`prefetch()` runs downloads on a background thread ahead of the consumer, so part N+1 is fetched while part N is being
+parsed and embedded.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Generator, Iterable, Iterator, TypeVar
+
+import requests
+from loguru import logger
+
+from medirag.core.metrics import METRICS
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+class DownloadCancelled(DownloadError):
+    pass
+
+
+@dataclass
+class _Remote:
+    size: int | None
+    ranges: bool
+
+
+def _part_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part")
+
+
+def _state_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part.json")
+
+
+def _split(size: int, segments: int) -> list[tuple[int, int]]:
+    """
+    [start, end) byte ranges covering `size` bytes in `segments` near-equal pieces.
+    """
+    step = -(-size // segments)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def _zip_problem(path: Path) -> str | None:
+    """
+    Why the zip at `path` is unreadable, or None if every member passes its CRC check.
+    """
+    try:
+        with zipfile.ZipFile(path) as z:
+            bad = z.testzip()
+    except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+        return str(e)
+    return f"bad CRC in {bad}" if bad is not None else None
+
+
+def file_digest(path: Path, algorithm: str = "sha256") -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Downloader:
+    """
+    Fetch URLs to local files with Range resume, optional segmented fetches and size/checksum checks.
+
+    `retries` bounds the failed attempts per download (or per segment), `backoff` seconds apart and doubling; each
+    retry resumes from the bytes already written. `close()` stops in-flight downloads at their next chunk, leaving
+    `.part` files to resume from.
+    """
+
+    def __init__(
+        self,
+        segments: int = 1,
+        timeout: float = 60,
+        retries: int = 3,
+        backoff: float = 1.0,
+        chunk_size: int = 1 << 20,
+        session: requests.Session | None = None,
+    ):
+        if segments < 1:
+            raise ValueError(f"segments must be >= 1, got {segments}")
+        self.segments = segments
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.session = session or requests.Session()
+        self._stop = threading.Event()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def __enter__(self) -> "Downloader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def fetch(self, url: str, dest: Path, size: int | None = None, checksum: str | None = None) -> Path:
+        """
+        Download `url` to `dest` unless a complete copy is already there, and return `dest`.
+
+        `size` is the expected length in bytes (default: the server's Content-Length). `checksum` is
+        "<algorithm>:<hexdigest>", e.g. "sha256:9f86…" or "md5:…"; without one, a `.zip` must pass `testzip()`. A
+        failed check raises DownloadError and discards the partial file, since resuming it would only reproduce the same
+        bytes.
+        """
+        dest = Path(dest)
+        if dest.exists():
+            logger.info(f"Using cached download {dest}")
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+
+        remote = self._probe(url)
+        if size is None:
+            size = remote.size
+        elif remote.size is not None and remote.size != size:
+            raise DownloadError(f"{url}: server reports {remote.size} bytes, expected {size}")
+
+        logger.info(f"Downloading {url} → {dest}")
+        t0 = time.time()
+        part = _part_path(dest)
+        if self.segments > 1 and size and remote.ranges:
+            self._fetch_segmented(url, dest, size)
+        else:
+            self._fetch_serial(url, part, size, resumable=remote.ranges)
+        self._verify(url, part, size, checksum, is_zip=dest.suffix == ".zip")
+        part.rename(dest)
+        _state_path(dest).unlink(missing_ok=True)
+
+        elapsed = max(time.time() - t0, 1e-9)
+        n = dest.stat().st_size
+        METRICS.add_time("download", elapsed)
+        METRICS.count("download_bytes", n)
+        logger.info(f"Downloaded {n / 1e6:.1f} MB in {elapsed:.1f}s ({n / 1e6 / elapsed:.1f} MB/s)")
+        return dest
+
+    def _probe(self, url: str) -> _Remote:
+        r = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        if r.status_code in (405, 501):  # HEAD not supported: fetch serially without a size to check against
+            return _Remote(size=None, ranges=False)
+        r.raise_for_status()
+        length = r.headers.get("Content-Length")
+        return _Remote(
+            size=int(length) if length is not None else None,
+            ranges=r.headers.get("Accept-Ranges", "").lower() == "bytes",
+        )
+
+    def _attempts(self, what: str) -> Iterator[int]:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                logger.warning(f"{what}: retrying ({attempt}/{self.retries})")
+                time.sleep(min(self.backoff * 2 ** (attempt - 1), 30))
+            yield attempt
+
+    def _copy(self, r: requests.Response, f, on_chunk: Callable[[int], None] | None = None) -> None:
+        for chunk in r.iter_content(chunk_size=self.chunk_size):
+            if self._stop.is_set():
+                raise DownloadCancelled("download cancelled")
+            if chunk:
+                f.write(chunk)
+                if on_chunk is not None:
+                    on_chunk(len(chunk))
+
+    def _fetch_serial(self, url: str, part: Path, size: int | None, resumable: bool) -> None:
+        for _ in self._attempts(url):
+            offset = part.stat().st_size if resumable and part.exists() else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+                    if r.status_code == 416:  # nothing left past `offset`: the part file is already whole
+                        return
+                    r.raise_for_status()
+                    if offset and r.status_code != 206:
+                        logger.warning(f"{url}: server ignored the Range request; restarting from byte 0")
+                        offset = 0
+                    elif offset:
+                        logger.info(f"Resuming {url} at byte {offset}")
+                    with open(part, "ab" if offset else "wb") as f:
+                        self._copy(r, f)
+                if size is None or part.stat().st_size >= size:
+                    return
+                logger.warning(f"{url}: connection closed at byte {part.stat().st_size} of {size}")
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                logger.warning(f"{url}: {e}")
+        raise DownloadError(f"{url}: gave up after {self.retries} retries")
+
+    def _fetch_segmented(self, url: str, dest: Path, size: int) -> None:
+        part, state_path = _part_path(dest), _state_path(dest)
+        ranges = _split(size, self.segments)
+        state = json.loads(state_path.read_text()) if part.exists() and state_path.exists() else {}
+        if state.get("size") == size and len(state.get("done", [])) == len(ranges):
+            done = state["done"]
+            logger.info(f"Resuming {url}: {sum(done)} of {size} bytes already fetched")
+        else:
+            done = [0] * len(ranges)
+            with open(part, "wb") as f:
+                f.truncate(size)
+        lock = threading.Lock()
+
+        def save() -> None:
+            tmp = state_path.with_name(f".{state_path.name}.tmp")
+            tmp.write_text(json.dumps({"size": size, "done": done}))
+            tmp.rename(state_path)
+
+        def fetch_segment(i: int) -> None:
+            start, end = ranges[i]
+
+            def advance(f, n: int) -> None:
+                # The bytes must be on disk before the state file claims them.
+                f.flush()
+                os.fsync(f.fileno())
+                with lock:
+                    done[i] += n
+                    save()
+
+            for _ in self._attempts(f"{url} segment {i}"):
+                if start + done[i] >= end:
+                    return
+                headers = {"Range": f"bytes={start + done[i]}-{end - 1}"}
+                try:
+                    with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+                        r.raise_for_status()
+                        if r.status_code != 206:
+                            raise DownloadError(f"{url}: server ignored the Range request for segment {i}")
+                        with open(part, "r+b") as f:
+                            f.seek(start + done[i])
+                            self._copy(r, f, on_chunk=partial(advance, f))
+                    if start + done[i] >= end:
+                        return
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    logger.warning(f"{url} segment {i}: {e}")
+            raise DownloadError(f"{url} segment {i}: gave up after {self.retries} retries")
+
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="download") as pool:
+            for future in [pool.submit(fetch_segment, i) for i in range(len(ranges))]:
+                future.result()
+
+    def _verify(self, url: str, part: Path, size: int | None, checksum: str | None, is_zip: bool = False) -> None:
+        actual = part.stat().st_size
+        if size is not None and actual != size:
+            part.unlink()
+            raise DownloadError(f"{url}: expected {size} bytes, got {actual}")
+        if checksum is not None:
+            algorithm, _, expected = checksum.partition(":")
+            digest = file_digest(part, algorithm)
+            if digest != expected.lower():
+                part.unlink()
+                raise DownloadError(f"{url}: {algorithm} mismatch (expected {expected}, got {digest})")
+        elif is_zip:
+            problem = _zip_problem(part)
+            if problem is not None:
+                part.unlink()
+                raise DownloadError(f"{url}: corrupt zip ({problem})")
+
+
+def prefetch(items: Iterable[T], fetch: Callable[[T], R], ahead: int = 1) -> Generator[tuple[T, R], None, None]:
+    """
+    Yield (item, fetch(item)) in order, running fetch for up to `ahead` later items on a background thread.
+
+    Fetches run one at a time (a second download would only split the same bandwidth), so at most `ahead + 1`
+    results exist at once. An exception from `fetch` is raised when its item is reached.
+    """
+    if ahead < 1:
+        for item in items:
+            yield item, fetch(item)
+        return
+    it = iter(items)
+    pending: deque = deque()
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+    try:
+        while True:
+            # Keep the current item plus `ahead` more submitted while the consumer works on the current one.
+            for item in it:
+                pending.append((item, pool.submit(fetch, item)))
+                if len(pending) > ahead:
+                    break
+            if not pending:
+                return
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,309 @@
+"""
+Single-pass SPL extractor built on `lxml.etree.iterparse`.
+
+Emits exactly the same ProductCard/SectionRecord output as the BeautifulSoup engine in `medirag.core.reader`, but
+never builds a soup tree. The document is read once, front to back: header fields are captured on start events, each
+section's narrative block and the product subtree are handled on their end events, and every finished subtree is
+cleared so peak memory tracks the largest section instead of the whole label.
+"""
+
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator
+
+from lxml import etree
+from loguru import logger
+
+from medirag.core.reader import (
+    NDC_CODE_SYSTEM,
+    PATIENT_LOINCS,
+    SKIP_LOINCS,
+    ProductCard,
+    SectionRecord,
+    _clean,
+    _format_product_card_text,
+)
+
+
+# Narrative elements whose text makes up a section body (same set as `reader._section_text`).
+_NARRATIVE_TAGS = ("{*}paragraph", "{*}item", "{*}caption", "{*}td", "{*}th")
+
+
+def _local(tag: object) -> str:
+    """
+    Namespace-free element name; "" for comments and processing instructions.
+    """
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def _find(el: etree._Element, name: str, *, recursive: bool = True) -> etree._Element | None:
+    """
+    First descendant (or direct child) named `name`, in document order — mirrors bs4 find().
+    """
+    it = el.iterdescendants(f"{{*}}{name}") if recursive else el.iterchildren(f"{{*}}{name}")
+    return next(it, None)
+
+
+def _find_all(el: etree._Element, name: str, *, recursive: bool = True) -> list[etree._Element]:
+    """
+    All descendants (or direct children) named `name`, in document order — mirrors bs4 find_all().
+    """
+    it = el.iterdescendants(f"{{*}}{name}") if recursive else el.iterchildren(f"{{*}}{name}")
+    return list(it)
+
+
+def _text(el: etree._Element) -> str:
+    """
+    Equivalent of bs4 `tag.get_text()`.
+    """
+    return "".join(el.itertext())
+
+
+def _stripped_text(el: etree._Element) -> str:
+    """
+    Equivalent of bs4 `tag.get_text(" ", strip=True)`.
+    """
+    return " ".join(t for s in el.itertext() if (t := s.strip()))
+
+
+def _section_text(text_block: etree._Element) -> str:
+    """
+    Narrative text of a section's direct <text> child: paragraphs, list items, captions, table cells.
+    """
+    parts: list[str] = []
+    for el in text_block.iterdescendants(*_NARRATIVE_TAGS):
+        t = _clean(_stripped_text(el))
+        if t:
+            parts.append(t)
+    return "\n".join(parts)
+
+
+def _product_fields(product: etree._Element) -> dict:
+    """
+    Pull structured product data out of the first <manufacturedProduct> subtree.
+
+    Field-for-field port of `reader._extract_product_metadata`. lxml elements are falsy when they have no children,
+    so every presence check here is an explicit `is None`.
+    """
+    medicine = _find(product, "manufacturedMedicine")
+    if medicine is None:
+        medicine = _find(product, "manufacturedProduct")
+    name_tag = _find(medicine, "name", recursive=False) if medicine is not None else None
+    drug_name = _clean(_text(name_tag)) if name_tag is not None else "Unknown"
+
+    generic_name = None
+    generic = _find(product, "genericMedicine")
+    generic_name_tag = _find(generic, "name") if generic is not None else None
+    if generic_name_tag is not None:
+        generic_name = _clean(_text(generic_name_tag))
+
+    form_code = _find(medicine, "formCode") if medicine is not None else None
+    dosage_form = form_code.get("displayName") if form_code is not None else None
+
+    route_tag = _find(product, "routeCode")
+    route = route_tag.get("displayName") if route_tag is not None else None
+
+    active_ingredients: list[dict] = []
+    seen_uniis: set[str] = set()
+    for ai in _find_all(medicine, "activeIngredient", recursive=False) if medicine is not None else []:
+        substance = _find(ai, "activeIngredientSubstance")
+        if substance is None:
+            continue
+        sub_name = _find(substance, "name", recursive=False)
+        code = _find(substance, "code", recursive=False)
+        unii = code.get("code") if code is not None else None
+        if unii and unii in seen_uniis:
+            continue
+        if unii:
+            seen_uniis.add(unii)
+        numerator = _find(ai, "numerator")
+        active_ingredients.append(
+            {
+                "name": _clean(_text(sub_name)) if sub_name is not None else None,
+                "unii": unii,
+                "strength": numerator.get("value") if numerator is not None else None,
+                "unit": numerator.get("unit") if numerator is not None else None,
+            }
+        )
+
+    inactive_ingredients: list[str] = []
+    seen_inactive: set[str] = set()
+    for ii in _find_all(medicine, "inactiveIngredient", recursive=False) if medicine is not None else []:
+        sub = _find(ii, "inactiveIngredientSubstance")
+        sub_name = _find(sub, "name") if sub is not None else None
+        if sub_name is not None:
+            name = _clean(_text(sub_name))
+            if name and name.lower() not in seen_inactive:
+                seen_inactive.add(name.lower())
+                inactive_ingredients.append(name)
+
+    ndcs: list[str] = []
+    for code in _find_all(product, "code"):
+        if code.get("codeSystem") == NDC_CODE_SYSTEM:
+            ndc = code.get("code")
+            if ndc and ndc not in ndcs:
+                ndcs.append(ndc)
+
+    appearance: dict = {}
+    for char in _find_all(product, "characteristic"):
+        code = _find(char, "code")
+        if code is None:
+            continue
+        key = (code.get("code") or "").upper()
+        value_tag = _find(char, "value")
+        if value_tag is None:
+            continue
+        display_name = value_tag.get("displayName")
+        value_str = value_tag.get("value")
+        if display_name:
+            appearance[key] = display_name
+        elif value_str:
+            unit = value_tag.get("unit")
+            appearance[key] = f"{value_str} {unit}" if unit else value_str
+        else:
+            t = _clean(_text(value_tag))
+            if t:
+                appearance[key] = t
+
+    return {
+        "drug_name": drug_name,
+        "generic_name": generic_name,
+        "dosage_form": dosage_form,
+        "route": route,
+        "active_ingredients": active_ingredients,
+        "inactive_ingredients": inactive_ingredients,
+        "ndcs": ndcs,
+        "appearance": appearance,
+    }
+
+
+@dataclass
+class _PendingSection:
+    """
+    A <section> seen during the pass; becomes a SectionRecord once the drug name is known.
+    """
+
+    code: dict | None = None  # attributes of the first direct <code> child
+    title: str | None = None  # cleaned text of the first direct <title> child
+    body: str | None = None  # narrative of the first direct <text> child
+
+    @property
+    def loinc(self) -> str | None:
+        return self.code.get("code") if self.code is not None else None
+
+    @property
+    def is_skipped(self) -> bool:
+        """
+        True once the first <code> rules the section out, so its body need not be extracted.
+        """
+        return self.code is not None and (not self.loinc or self.loinc in SKIP_LOINCS)
+
+
+def _events(source: str | Path | bytes) -> Iterator[tuple[str, etree._Element]]:
+    # recover=True matches the parser BeautifulSoup's lxml-xml builder uses.
+    stream = str(source) if isinstance(source, (str, Path)) else BytesIO(source)
+    return etree.iterparse(stream, events=("start", "end"), recover=True, huge_tree=True)
+
+
+def parse_spl_iterparse(source: str | Path | bytes) -> list[ProductCard | SectionRecord]:
+    """
+    Parse one SPL XML file in a single forward pass. Accepts a file path or raw bytes.
+
+    Paths are streamed from disk rather than read into memory first.
+    """
+    set_id: str | None = None
+    seen_set_id = False
+    version: str | None = None
+    seen_version = False
+    effective: str | None = None
+    seen_effective = False
+    org: etree._Element | None = None
+    manufacturer: str | None = None
+
+    product: etree._Element | None = None
+    product_section: _PendingSection | None = None
+    fields: dict | None = None
+
+    sections: list[_PendingSection] = []
+    open_sections: list[_PendingSection] = []
+
+    for event, el in _events(source):
+        name = _local(el.tag)
+        if event == "start":
+            if name == "section":
+                pending = _PendingSection()
+                sections.append(pending)
+                open_sections.append(pending)
+            elif name == "setId" and not seen_set_id:
+                seen_set_id = True
+                set_id = el.get("root")
+            elif name == "versionNumber" and not seen_version:
+                seen_version = True
+                version = el.get("value")
+            elif name == "effectiveTime" and not seen_effective:
+                seen_effective = True
+                effective = el.get("value")
+            elif name == "representedOrganization" and org is None:
+                org = el
+            elif name == "manufacturedProduct" and product is None:
+                product = el
+                product_section = open_sections[-1] if open_sections else None
+            continue
+
+        if name == "section":
+            open_sections.pop()
+            el.clear()
+        elif el is org:
+            org_name_tag = _find(el, "name")
+            manufacturer = _clean(_text(org_name_tag)) if org_name_tag is not None else None
+        elif el is product:
+            fields = _product_fields(el)
+            el.clear()
+        elif open_sections and _local(el.getparent().tag) == "section":
+            current = open_sections[-1]
+            if name == "code" and current.code is None:
+                current.code = dict(el.attrib)
+            elif name == "title" and current.title is None:
+                current.title = _clean(_text(el))
+            elif name == "text" and current.body is None:
+                current.body = "" if current.is_skipped else _section_text(el)
+                el.clear()
+
+    if not set_id or fields is None:
+        if not set_id:
+            logger.warning("SPL missing setId, skipping")
+        logger.warning("Could not extract product metadata, skipping document")
+        return []
+
+    if version is None:
+        version = effective
+
+    card_fields = {"manufacturer": manufacturer, **fields}
+    card = ProductCard(
+        set_id=set_id,
+        version=version,
+        text=_format_product_card_text(**card_fields),
+        **card_fields,
+    )
+
+    records: list[ProductCard | SectionRecord] = [card]
+    for pending in sections:
+        loinc = pending.loinc
+        if pending is product_section or pending.code is None or not loinc or loinc in SKIP_LOINCS:
+            continue
+        if not pending.body:
+            continue
+        display_name = pending.code.get("displayName") or pending.title or "SPL Section"
+        records.append(
+            SectionRecord(
+                set_id=set_id,
+                version=version,
+                drug_name=card.drug_name,
+                loinc=loinc,
+                section_title=display_name,
+                text=f"{card.drug_name} — {display_name}:\n{pending.body}",
+                is_patient_facing=loinc in PATIENT_LOINCS,
+            )
+        )
+    return records
@@ -0,0 +1,207 @@
+"""
+Per-stage build metrics: timers, counters and gauges, reported as periodic progress logs and a JSON file.
+
+Instrumented code records into the process-wide `METRICS`:
+
+    with METRICS.time("parse"):
+        records = parse_spl(data)
+    METRICS.count("spls")
+    METRICS.gauge("queue.to_embed", to_embed.qsize())
+
+Stage timers add up the seconds spent in each stage. Stages overlap when the pipeline or worker processes run them
+concurrently, so compare their shares rather than summing them to wall time. "clean" (text cleanup) is a sub-stage of
+"parse": its seconds are already inside parse's, and it is recorded once per document, so its calls count SPLs.
+Worker processes keep their own METRICS; they hand back `drain()` after each task and the parent `merge()`s it.
+
+`MetricsReporter` logs a one-line summary every `every` seconds and rewrites the JSON file each time, so a long
+build can be watched (and a killed one still leaves its numbers behind).
+
+`Histogram` is for serving-side distributions (request latency, batch sizes) where a mean hides the tail.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from loguru import logger
+
+
+class Metrics:
+    """
+    Thread-safe stage timers, counters and gauges for one build.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self._seconds: dict[str, float] = {}
+            self._calls: dict[str, int] = {}
+            self._counters: dict[str, int] = {}
+            self._gauges: dict[str, list[float]] = {}  # name → [last, max, sum, samples]
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._calls[stage] = self._calls.get(stage, 0) + calls
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t0)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            g = self._gauges.get(name)
+            if g is None:
+                self._gauges[name] = [value, value, value, 1]
+            else:
+                g[0] = value
+                g[1] = max(g[1], value)
+                g[2] += value
+                g[3] += 1
+
+    def drain(self) -> dict:
+        """
+        Stage times and counters recorded since the last drain, for a worker process to hand to its parent.
+        """
+        with self._lock:
+            delta = {"seconds": self._seconds, "calls": self._calls, "counters": self._counters}
+            self._seconds, self._calls, self._counters = {}, {}, {}
+        return delta
+
+    def merge(self, delta: dict) -> None:
+        for stage, seconds in delta["seconds"].items():
+            self.add_time(stage, seconds, delta["calls"].get(stage, 0))
+        for name, n in delta["counters"].items():
+            self.count(name, n)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            return {
+                "elapsed_s": elapsed,
+                "stages": {
+                    stage: {"seconds": seconds, "calls": self._calls.get(stage, 0)}
+                    for stage, seconds in sorted(self._seconds.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+                "rates_per_s": {name: n / elapsed for name, n in sorted(self._counters.items())},
+                "gauges": {
+                    name: {"last": g[0], "max": g[1], "mean": g[2] / g[3]} for name, g in sorted(self._gauges.items())
+                },
+            }
+
+    def write(self, path: str | Path) -> None:
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(self.snapshot(), indent=2))
+        tmp.rename(path)
+
+    def summary(self) -> str:
+        """
+        One-line progress: headline counters with rates, each stage's share of stage time, mean queue depths.
+        """
+        snap = self.snapshot()
+        counters, rates = snap["counters"], snap["rates_per_s"]
+        parts = [f"{counters[n]} {n} ({rates[n]:.1f}/s)" for n in ("spls", "records") if n in counters]
+        total = sum(s["seconds"] for s in snap["stages"].values())
+        if total:
+            shares = sorted(snap["stages"].items(), key=lambda kv: -kv[1]["seconds"])
+            parts.append(" ".join(f"{stage} {100 * s['seconds'] / total:.0f}%" for stage, s in shares))
+        queues = {name: g for name, g in snap["gauges"].items() if name.startswith("queue.")}
+        if queues:
+            parts.append(" ".join(f"{name} {g['mean']:.1f}" for name, g in queues.items()))
+        return f"progress after {snap['elapsed_s']:.0f}s: " + " | ".join(parts)
+
+
+METRICS = Metrics()
+
+
+class Histogram:
+    """
+    Thread-safe fixed-bucket histogram. Quantiles are reported as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(sorted(bounds))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.bounds) + 1)  # the last bucket is everything above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            rank = q * self.count
+            seen = 0
+            for bound, n in zip(self.bounds, self._counts):
+                seen += n
+                if n and seen >= rank:
+                    return bound
+            return self.max
+
+    def snapshot(self) -> dict:
+        quantiles = {f"p{round(q * 100)}": self.quantile(q) for q in (0.5, 0.95, 0.99)}
+        with self._lock:
+            buckets = {f"<={b:g}": n for b, n in zip(self.bounds, self._counts)}
+            buckets["+inf"] = self._counts[-1]
+            mean = self.sum / self.count if self.count else 0.0
+            return {"count": self.count, "mean": mean, "max": self.max, **quantiles, "buckets": buckets}
+
+
+class MetricsReporter:
+    """
+    Background thread that logs `metrics.summary()` and rewrites `path` (if given) every `every` seconds.
+
+    `close()` stops it and writes the final snapshot.
+    """
+
+    def __init__(self, metrics: Metrics, path: str | Path | None = None, every: float = 30.0):
+        self.metrics = metrics
+        self.path = Path(path) if path is not None else None
+        self.every = every
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="medirag-metrics", daemon=True)
+        self._thread.start()
+
+    def _report(self) -> None:
+        logger.info(self.metrics.summary())
+        if self.path is not None:
+            self.metrics.write(self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.every):
+            self._report()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._report()
+
+    def __enter__(self) -> "MetricsReporter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,159 @@
+"""
+Process-wide registry of SentenceTransformer models: each (model, device) pair is loaded once, on first use.
+
+Every encoder in the process resolves through `MODELS` (the indexer's embedder, its CPU query encoder, the semantic
+cache's encoder), so components that ask for the same weights on the same device share one instance instead of each
+holding a copy. On a CPU-only node the indexing embedder and the query encoder are the same object.
+
+Nothing is loaded until a component encodes something. A server that would rather pay the load and first-forward
+cost at startup than on its first request calls `warm_up()`; `memory_report()` lists what each loaded model holds.
+
+`batcher()` wraps a model in a shared `MicroBatchEncoder`, so concurrent requests encoding with it share forward passes.
+Rerankers' cross-encoders (`cross_encoder()`) are held and reported the same way.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, cast
+
+from loguru import logger
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from medirag.core.batching import MicroBatchEncoder
+
+
+def default_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@dataclass(frozen=True)
+class ModelMemory:
+    model: str
+    device: str
+    parameters: int
+    bytes: int  # parameters + buffers
+
+
+class ModelRegistry:
+    """
+    Thread-safe, lazily populated (model name, device) → SentenceTransformer (or CrossEncoder) map.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loading: dict[tuple[str, str], threading.Lock] = {}
+        self._models: dict[tuple[str, str], SentenceTransformer | CrossEncoder] = {}
+        self._batchers: dict[tuple[str, str], MicroBatchEncoder] = {}
+
+    def get(self, name: str, device: str | None = None) -> SentenceTransformer:
+        """
+        The model `name` on `device` (default: CUDA if available, else CPU), loading it if this is the first request.
+        """
+        return cast(SentenceTransformer, self._load(name, device, lambda n, d: SentenceTransformer(n, device=d)))
+
+    def cross_encoder(self, name: str, device: str | None = None) -> CrossEncoder:
+        """
+        `get` for a cross-encoder (query, passage) scorer.
+        """
+        return cast(CrossEncoder, self._load(name, device, lambda n, d: CrossEncoder(n, device=d)))
+
+    def _load(
+        self, name: str, device: str | None, load: Callable[[str, str], SentenceTransformer | CrossEncoder]
+    ) -> SentenceTransformer | CrossEncoder:
+        key = (name, device or default_device())
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        # One lock per key: a second caller waits for the first load instead of starting its own, while other models
+        # load in parallel.
+        with loading:
+            model = self._models.get(key)
+            if model is None:
+                t0 = time.perf_counter()
+                model = load(*key)
+                with self._lock:
+                    self._models[key] = model
+                logger.info(f"Loaded {name} on {key[1]} in {time.perf_counter() - t0:.1f}s")
+        return model
+
+    def loaded(self, name: str) -> SentenceTransformer | None:
+        """
+        An already-loaded instance of `name` on any device, without loading one.
+        """
+        with self._lock:
+            models = list(self._models.items())
+        for (n, _), model in models:
+            if n == name and isinstance(model, SentenceTransformer):
+                return model
+        return None
+
+    def dimension(self, name: str, device: str | None = None) -> int:
+        """
+        Output dimension of `name`, read off a loaded instance on any device before loading one on `device`.
+        """
+        model = self.loaded(name) or self.get(name, device)
+        dimension = model.get_sentence_embedding_dimension()
+        if dimension is None:
+            raise ValueError(f"{name} does not report its embedding dimension")
+        return dimension
+
+    def batcher(
+        self, name: str, device: str | None = None, max_batch_size: int = 32, max_wait_ms: float = 5.0
+    ) -> MicroBatchEncoder:
+        """
+        The shared micro-batching encoder for `name` on `device`, created on first request; the model itself still
+        loads on the first batch. Later calls get the same encoder whatever their batch settings.
+        """
+        key = (name, device or default_device())
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = MicroBatchEncoder(name, partial(self.get, *key), max_batch_size, max_wait_ms)
+                self._batchers[key] = batcher
+        return batcher
+
+    def close_batchers(self) -> None:
+        with self._lock:
+            batchers, self._batchers = list(self._batchers.values()), {}
+        for batcher in batchers:
+            batcher.close()
+
+    def warm_up(self, name: str, device: str | None = None) -> SentenceTransformer:
+        """
+        Load `name` on `device` now and run one encode, so the first real request pays for neither.
+        """
+        model = self.get(name, device)
+        model.encode(["warm-up"], show_progress_bar=False)
+        return model
+
+    def memory_report(self) -> list[ModelMemory]:
+        with self._lock:
+            models = sorted(self._models.items())
+        report = []
+        for (name, device), model in models:
+            params = list(model.parameters())
+            n_bytes = sum(p.numel() * p.element_size() for p in params)
+            n_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+            report.append(
+                ModelMemory(model=name, device=device, parameters=sum(p.numel() for p in params), bytes=n_bytes)
+            )
+        return report
+
+    def log_memory(self) -> None:
+        report = self.memory_report()
+        for m in report:
+            logger.info(f"Model {m.model} on {m.device}: {m.parameters / 1e6:.0f}M parameters, {m.bytes / 1e6:.0f} MB")
+        logger.info(f"{len(report)} model(s) loaded, {sum(m.bytes for m in report) / 1e6:.0f} MB in total")
+
+    def unload(self, name: str, device: str | None = None) -> None:
+        with self._lock:
+            self._models.pop((name, device or default_device()), None)
+
+
+MODELS = ModelRegistry()
@@ -0,0 +1,206 @@
+"""
+Content-addressed cache of parsed SPLs, stored as Parquet.
+
+Each SPL is keyed by the SHA-256 of its raw XML bytes; the rows hold every ProductCard/SectionRecord field plus
+`set_id`/`version`, so the cache doubles as a columnar copy of the corpus that experiments can scan with pyarrow
+without touching XML:
+
+    import pyarrow.dataset as ds
+    corpus = ParseCache("./parse_cache").dataset()
+    corpus.to_table(filter=ds.field("kind") == "section", columns=["set_id", "loinc", "text"])
+
+Rows are buffered in memory and written out as one Parquet shard per `flush_every` SPLs, so a crashed run keeps
+everything parsed up to its last flush. Empty parse results (no setId / no product) are not cached.
+"""
+
+import hashlib
+import uuid
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from loguru import logger
+
+from medirag.core.reader import ProductCard, SectionRecord
+
+# Bump when parser output changes; shards from other versions live in sibling dirs and are ignored.
+PARSE_CACHE_VERSION = 1
+
+_INGREDIENT = pa.struct(
+    [
+        ("name", pa.string()),
+        ("unii", pa.string()),
+        ("strength", pa.string()),
+        ("unit", pa.string()),
+    ]
+)
+
+SCHEMA = pa.schema(
+    [
+        ("xml_sha256", pa.string()),
+        ("set_id", pa.string()),
+        ("version", pa.string()),
+        ("kind", pa.string()),
+        ("drug_name", pa.string()),
+        ("text", pa.string()),
+        # section fields (null for product cards)
+        ("loinc", pa.string()),
+        ("section_title", pa.string()),
+        ("is_patient_facing", pa.bool_()),
+        # product fields (null for sections)
+        ("generic_name", pa.string()),
+        ("manufacturer", pa.string()),
+        ("dosage_form", pa.string()),
+        ("route", pa.string()),
+        ("active_ingredients", pa.list_(_INGREDIENT)),
+        ("inactive_ingredients", pa.list_(pa.string())),
+        ("ndcs", pa.list_(pa.string())),
+        ("appearance", pa.map_(pa.string(), pa.string())),
+    ]
+)
+
+
+def _to_row(key: str, r: ProductCard | SectionRecord) -> dict[str, Any]:
+    row: dict[str, Any] = {
+        "xml_sha256": key,
+        "set_id": r.set_id,
+        "version": r.version,
+        "kind": r.kind,
+        "drug_name": r.drug_name,
+        "text": r.text,
+    }
+    if isinstance(r, ProductCard):
+        row.update(
+            generic_name=r.generic_name,
+            manufacturer=r.manufacturer,
+            dosage_form=r.dosage_form,
+            route=r.route,
+            active_ingredients=r.active_ingredients,
+            inactive_ingredients=r.inactive_ingredients,
+            ndcs=r.ndcs,
+            appearance=list(r.appearance.items()),
+        )
+    else:
+        row.update(loinc=r.loinc, section_title=r.section_title, is_patient_facing=r.is_patient_facing)
+    return row
+
+
+def _from_row(row: dict) -> ProductCard | SectionRecord:
+    if row["kind"] == "product_card":
+        return ProductCard(
+            set_id=row["set_id"],
+            version=row["version"],
+            drug_name=row["drug_name"],
+            generic_name=row["generic_name"],
+            manufacturer=row["manufacturer"],
+            dosage_form=row["dosage_form"],
+            route=row["route"],
+            active_ingredients=row["active_ingredients"],
+            inactive_ingredients=row["inactive_ingredients"],
+            ndcs=row["ndcs"],
+            appearance=dict(row["appearance"]),
+            text=row["text"],
+        )
+    return SectionRecord(
+        set_id=row["set_id"],
+        version=row["version"],
+        drug_name=row["drug_name"],
+        loinc=row["loinc"],
+        section_title=row["section_title"],
+        text=row["text"],
+        is_patient_facing=row["is_patient_facing"],
+    )
+
+
+class ParseCache:
+    """
+    XML-hash → parsed records, persisted as Parquet shards under `root/v{PARSE_CACHE_VERSION}`.
+    """
+
+    def __init__(self, root: str | Path, flush_every: int = 1000):
+        self.dir = Path(root) / f"v{PARSE_CACHE_VERSION}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._shard_of: dict[str, Path] = {}
+        self._pending: dict[str, list[ProductCard | SectionRecord]] = {}
+        # Lookups arrive in archive order and shards were written in archive order, so holding
+        # the most recently read shard turns a rebuild into a sequential scan of the cache.
+        self._loaded: tuple[Path, dict[str, list[dict]]] | None = None
+        for shard in sorted(self.dir.glob("*.parquet")):
+            for key in pq.read_table(shard, columns=["xml_sha256"]).column(0).to_pylist():
+                self._shard_of[key] = shard
+        logger.info(f"Parse cache {self.dir}: {len(self._shard_of)} SPLs")
+
+    def __enter__(self) -> "ParseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._shard_of) + len(self._pending)
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key: str) -> list[ProductCard | SectionRecord] | None:
+        """
+        Cached records for an XML hash, or None on a miss.
+        """
+        records = self._pending.get(key)
+        if records is None:
+            shard = self._shard_of.get(key)
+            if shard is None:
+                self.misses += 1
+                return None
+            records = [_from_row(row) for row in self._rows_in(shard)[key]]
+        self.hits += 1
+        return records
+
+    def put(self, key: str, records: list[ProductCard | SectionRecord]) -> None:
+        if not records or key in self._shard_of:
+            return
+        self._pending[key] = records
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write buffered SPLs out as a new shard.
+        """
+        if not self._pending:
+            return
+        rows = [_to_row(key, r) for key, records in self._pending.items() for r in records]
+        shard = self.dir / f"part-{uuid.uuid4().hex}.parquet"
+        tmp = self.dir / f".{shard.stem}.tmp"
+        pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMA), tmp)
+        tmp.rename(shard)  # atomic: a crash never leaves a half-written shard behind
+        for key in self._pending:
+            self._shard_of[key] = shard
+        logger.debug(f"Parse cache: wrote {len(self._pending)} SPLs to {shard.name}")
+        self._pending = {}
+
+    def close(self) -> None:
+        self.flush()
+        total = self.hits + self.misses
+        if total:
+            logger.info(f"Parse cache: {self.hits}/{total} hits ({self.hits / total:.0%})")
+
+    def dataset(self) -> ds.Dataset:
+        """
+        All flushed shards as one pyarrow dataset.
+        """
+        return ds.dataset(self.dir, format="parquet", schema=SCHEMA)
+
+    def _rows_in(self, shard: Path) -> dict[str, list[dict]]:
+        if self._loaded is None or self._loaded[0] != shard:
+            grouped: dict[str, list[dict]] = {}
+            for row in pq.read_table(shard).to_pylist():
+                grouped.setdefault(row["xml_sha256"], []).append(row)
+            self._loaded = (shard, grouped)
+        return self._loaded[1]
@@ -8,17 +8,31 @@ Emits two kinds of records per drug:
 Records are plain dataclasses, so the indexer doesn't depend on LlamaIndex.
 """
 
+import io
+import mmap
+import multiprocessing
 import re
+import struct
+import threading
+import time
 import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from dataclasses import dataclass, field
 from html import unescape
 from io import BytesIO
 from pathlib import Path
-from typing import Iterable
+from typing import IO, TYPE_CHECKING, Iterable, Iterator, cast
 
 from bs4 import BeautifulSoup, Tag
 from loguru import logger
 
+from medirag.core.metrics import METRICS
+
+if TYPE_CHECKING:
+    from medirag.core.catalog import SplCatalog
+    from medirag.core.parse_cache import ParseCache
+
 
 def _find(parent: Tag | BeautifulSoup, name: str, *, recursive: bool = True) -> Tag | None:
     """
@@ -68,6 +82,11 @@ SKIP_LOINCS: frozenset[str] = frozenset(
     }
 )
 
+NDC_CODE_SYSTEM = "2.16.840.1.113883.6.69"  # FDA NDC code system
+
+# Parser engines accepted by parse_spl(): a BeautifulSoup tree, or a single lxml iterparse pass.
+ENGINES: tuple[str, ...] = ("soup", "iterparse")
+
 
 @dataclass
 class ProductCard:
@@ -112,14 +131,20 @@ class SectionRecord:
         return "section"
 
 
+# Seconds spent in _clean during the current parse_spl call, reported once per document as the "clean" stage.
+_clean_time = threading.local()
+
+
 def _clean(text: str) -> str:
     """
     Whitespace-normalize, preserve punctuation/numbers/units.
     """
     if not text:
         return ""
+    t0 = time.perf_counter()
     text = unescape(text)
     text = re.sub(r"\s+", " ", text).strip()
+    _clean_time.seconds = getattr(_clean_time, "seconds", 0.0) + time.perf_counter() - t0
     return text
 
 
@@ -232,7 +257,7 @@ def _extract_product_metadata(doc: BeautifulSoup) -> tuple[ProductCard | None, T
 
     ndcs: list[str] = []
     for code in _find_all(product, "code"):
-        if _attr(code, "codeSystem") == "2.16.840.1.113883.6.69":  # FDA NDC code system
+        if _attr(code, "codeSystem") == NDC_CODE_SYSTEM:
             ndc = _attr(code, "code")
             if ndc and ndc not in ndcs:
                 ndcs.append(ndc)
@@ -389,12 +414,28 @@ def _extract_sections(
         )
 
 
-def parse_spl(source: str | Path | bytes) -> list[ProductCard | SectionRecord]:
+def parse_spl(source: str | Path | bytes, engine: str = "soup") -> list[ProductCard | SectionRecord]:
     """
     Parse one SPL XML file into a list of records (product card + sections).
 
-    Accepts a file path or raw bytes.
+    Accepts a file path or raw bytes. `engine="iterparse"` walks the document once with lxml instead of building a
+    BeautifulSoup tree (see `medirag.core.iterparse`); both engines emit identical records.
     """
+    _clean_time.seconds = 0.0
+    try:
+        return _parse_spl(source, engine)
+    finally:
+        METRICS.add_time("clean", _clean_time.seconds)
+
+
+def _parse_spl(source: str | Path | bytes, engine: str) -> list[ProductCard | SectionRecord]:
+    if engine == "iterparse":
+        from medirag.core.iterparse import parse_spl_iterparse
+
+        return parse_spl_iterparse(source)
+    if engine != "soup":
+        raise ValueError(f"Unknown parser engine {engine!r}, expected one of {ENGINES}")
+
     if isinstance(source, (str, Path)):
         with open(source, "rb") as f:
             data = f.read()
@@ -420,23 +461,274 @@ def parse_spl(source: str | Path | bytes) -> list[ProductCard | SectionRecord]:
     return records
 
 
-def parse_spl_zip(zip_path: str | Path) -> Iterable[list[ProductCard | SectionRecord]]:
+_LOCAL_FILE_HEADER = struct.Struct("<4s2B4HL2L2H")  # zip local file header, up to the variable-length fields
+
+
+class _MemberWindow(io.RawIOBase):
+    """
+    Read-only, seekable view of one byte range of a memory-mapped file.
+
+    Lets zipfile open a STORED inner zip where it sits in the outer archive; only the
+    bytes zipfile actually reads (central directory, the XML's compressed data) are copied.
+    """
+
+    def __init__(self, buf: mmap.mmap, start: int, size: int):
+        self._buf = buf
+        self._start = start
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def read(self, size: int | None = -1) -> bytes:
+        end = self._size if size is None or size < 0 else min(self._size, self._pos + size)
+        if end <= self._pos:
+            return b""
+        data = self._buf[self._start + self._pos : self._start + end]
+        self._pos = end
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+def _open_inner_zip(outer: zipfile.ZipFile, buf: mmap.mmap, info: zipfile.ZipInfo) -> IO[bytes]:
+    """
+    Seekable file over an inner zip member.
+
+    STORED members are windowed straight out of the mapped outer file. Anything else
+    (DEFLATED, encrypted) is decompressed into memory: zipfile needs random access, and
+    seeking inside a deflate stream means re-inflating from the start.
+    """
+    if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+        header = _LOCAL_FILE_HEADER.unpack_from(buf, info.header_offset)
+        if header[0] == b"PK\x03\x04":
+            name_len, extra_len = header[10], header[11]
+            start = info.header_offset + _LOCAL_FILE_HEADER.size + name_len + extra_len
+            return cast(IO[bytes], _MemberWindow(buf, start, info.compress_size))
+    with outer.open(info) as f:
+        return BytesIO(f.read())
+
+
+def _read_xml(f) -> bytes:
+    with METRICS.time("unzip"):
+        data = f.read()
+    METRICS.count("xml_bytes", len(data))
+    return data
+
+
+def iter_spl_xml(
+    zip_path: str | Path, start_after: str | None = None, shard: tuple[int, int] | None = None
+) -> Iterator[tuple[str, bytes]]:
+    """
+    Yield (member, xml_bytes) for every SPL XML inside a DailyMed zip, descending into nested zips.
+
+    `member` is the entry's path inside the bundle: "name.xml" for top-level XMLs, "spl.zip/name.xml" for XMLs
+    inside an inner zip. With `start_after`, members up to and including that one are skipped without being read.
+    With `shard=(index, count)`, only every count-th XML (in archive order, starting at `index`) is read, so `count`
+    processes can split one bundle between them.
+    """
+    skipping = start_after is not None
+    seen = 0
+
+    def wanted(member: str) -> bool:
+        nonlocal skipping, seen
+        if skipping:
+            skipping = member != start_after
+            return False
+        seen += 1
+        return shard is None or (seen - 1) % shard[1] == shard[0]
+
+    with open(zip_path, "rb") as raw, zipfile.ZipFile(raw, "r") as outer:
+        with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for info in outer.infolist():
+                name = info.filename
+                if name.endswith(".xml"):
+                    if wanted(name):
+                        with outer.open(info) as f:
+                            yield name, _read_xml(f)
+                elif name.endswith(".zip"):
+                    with _open_inner_zip(outer, buf, info) as inner_file, zipfile.ZipFile(inner_file) as inner:
+                        for inner_name in inner.namelist():
+                            if inner_name.endswith(".xml") and wanted(f"{name}/{inner_name}"):
+                                with inner.open(inner_name) as f:
+                                    yield f"{name}/{inner_name}", _read_xml(f)
+    if skipping:
+        logger.warning(f"{zip_path}: member {start_after} not found, nothing read")
+
+
+def _parse_timed(data: bytes, engine: str) -> list[ProductCard | SectionRecord]:
+    with METRICS.time("parse"):
+        return parse_spl(data, engine=engine)
+
+
+def _parse_in_worker(data: bytes, engine: str) -> tuple[list[ProductCard | SectionRecord], dict]:
+    """
+    Pool task: the records, plus the worker's metrics since its last task for the parent to merge.
+    """
+    records = _parse_timed(data, engine)
+    return records, METRICS.drain()
+
+
+def _parse_cached(data: bytes, engine: str, cache: "ParseCache | None") -> list[ProductCard | SectionRecord]:
+    if cache is None:
+        return _parse_timed(data, engine)
+    key = cache.key(data)
+    records = cache.get(key)
+    if records is None:
+        records = _parse_timed(data, engine)
+        cache.put(key, records)
+    else:
+        METRICS.count("parse_cache_hits")
+    return records
+
+
+def _collect(
+    pending: deque[tuple[str, str | None, Future]], ordered: bool, cache: "ParseCache | None"
+) -> Iterator[tuple[str, list[ProductCard | SectionRecord]]]:
+    """
+    Yield finished parses: the oldest one (ordered), or whichever complete first.
+
+    Fresh parses (those with a cache key) are written back to the cache as they are collected, and the worker
+    metrics that came back with them are merged into this process's.
+    """
+    if ordered:
+        finished = [pending.popleft()]
+    else:
+        done, _ = wait([fut for _, _, fut in pending], return_when=FIRST_COMPLETED)
+        finished = [item for item in pending if item[2] in done]
+        for item in finished:
+            pending.remove(item)
+    for member, key, fut in finished:
+        records, worker_metrics = fut.result()
+        if worker_metrics is not None:
+            METRICS.merge(worker_metrics)
+        if key is not None and cache is not None:
+            cache.put(key, records)
+        yield member, records
+
+
+def _parse_parallel(
+    xmls: Iterable[tuple[str, bytes]],
+    engine: str,
+    workers: int,
+    ordered: bool,
+    max_in_flight: int,
+    cache: "ParseCache | None",
+) -> Iterator[tuple[str, list[ProductCard | SectionRecord]]]:
+    """
+    Fan XML bytes out to a process pool, keeping at most `max_in_flight` parses queued or running.
+    """
+    # spawn, not fork: the runner process has torch loaded and forking it is unsafe.
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    pending: deque[tuple[str, str | None, Future]] = deque()
+    try:
+        for member, data in xmls:
+            key = cache.key(data) if cache is not None else None
+            cached = cache.get(key) if cache is not None and key is not None else None
+            if cached is not None:
+                # Cache hits skip the pool but keep their place in line.
+                hit: Future = Future()
+                hit.set_result((cached, None))
+                pending.append((member, None, hit))
+                METRICS.count("parse_cache_hits")
+            else:
+                pending.append((member, key, pool.submit(_parse_in_worker, data, engine)))
+            METRICS.gauge("queue.parse_in_flight", len(pending))
+            while len(pending) >= max_in_flight:
+                yield from _collect(pending, ordered, cache)
+        while pending:
+            yield from _collect(pending, ordered, cache)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def parse_spl_zip_members(
+    zip_path: str | Path,
+    engine: str = "soup",
+    workers: int = 1,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    cache: "ParseCache | None" = None,
+    start_after: str | None = None,
+    shard: tuple[int, int] | None = None,
+) -> Iterator[tuple[str, list[ProductCard | SectionRecord]]]:
+    """
+    `parse_spl_zip`, yielding (member, records) so callers can tell which archive entry each SPL came from.
+
+    With `start_after` (a member name from an earlier pass), everything up to and including it is skipped. `shard`
+    restricts the parse to one slice of the bundle (see `iter_spl_xml`).
+    """
+    xmls = iter_spl_xml(zip_path, start_after=start_after, shard=shard)
+    if workers <= 1:
+        for member, data in xmls:
+            yield member, _parse_cached(data, engine, cache)
+        return
+    yield from _parse_parallel(xmls, engine, workers, ordered, max_in_flight or 4 * workers, cache)
+
+
+def parse_spl_zip(
+    zip_path: str | Path,
+    engine: str = "soup",
+    workers: int = 1,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    cache: "ParseCache | None" = None,
+) -> Iterable[list[ProductCard | SectionRecord]]:
     """
     Stream-parse every XML inside an SPL zip (handles nested zips).
 
     DailyMed bundles are zips-of-zips: each outer zip contains per-SPL zips, each
     containing one XML. Yields one list[ProductCard|SectionRecord] per SPL.
+
+    With `workers > 1` the zip is still read in this process but parsing runs in a
+    process pool. At most `max_in_flight` SPLs (default: 4 per worker) are queued or
+    being parsed, so a slow consumer throttles the zip reader. `ordered=False` yields
+    each SPL as soon as it is parsed instead of in archive order.
+
+    With a `cache` (see `medirag.core.parse_cache`), XMLs already parsed on an earlier
+    run are served from it and `parse_spl` is skipped.
     """
-    with zipfile.ZipFile(zip_path, "r") as outer:
-        for name in outer.namelist():
-            if name.endswith(".xml"):
-                with outer.open(name) as f:
-                    yield parse_spl(f.read())
-            elif name.endswith(".zip"):
-                with outer.open(name) as inner_zip_bytes:
-                    inner_data = inner_zip_bytes.read()
-                with zipfile.ZipFile(BytesIO(inner_data)) as inner:
-                    for inner_name in inner.namelist():
-                        if inner_name.endswith(".xml"):
-                            with inner.open(inner_name) as f:
-                                yield parse_spl(f.read())
+    for _, records in parse_spl_zip_members(zip_path, engine, workers, ordered, max_in_flight, cache):
+        yield records
+
+
+def parse_spl_by_set_id(
+    catalog: "str | Path | SplCatalog",
+    set_id: str,
+    version: str | None = None,
+    engine: str = "soup",
+) -> list[ProductCard | SectionRecord]:
+    """
+    Parse one label straight out of its DailyMed zip, located through a catalog (see `medirag.core.catalog`).
+
+    Reads only that SPL's bytes instead of scanning the bundle. Parses the newest cataloged version unless `version`
+    is given; raises KeyError if the catalog has no such SPL.
+    """
+    from medirag.core.catalog import SplCatalog, read_spl_xml
+
+    if not isinstance(catalog, SplCatalog):
+        catalog = SplCatalog(catalog)
+    return parse_spl(read_spl_xml(catalog.find(set_id, version)), engine=engine)
@@ -0,0 +1,183 @@
+"""
+Recall-vs-latency report for ANN settings on a built LanceDB index.
+
+Every setting is scored against an exact flat scan over the same queries: recall@k is the share of the flat scan's
+top-k rows the ANN search also returns, and latency is wall time per query (p50/p99). For each `--index-type` the
+vector index is rebuilt, then every `--nprobes` × `--refine-factor` combination is queried. The index left on the
+table afterwards is the last one built, so point this at a scratch copy of a production index.
+
+Usage:
+    # Held-out questions, one per line
+    uv run python -m medirag.index.ann_report --db ./lance_db --queries questions.txt \\
+        --index-type IVF_HNSW_SQ IVF_PQ --nprobes 10 20 50 --refine-factor 1 10
+
+    # No question file: 200 random stored rows serve as queries (each query's own row is left out of the scores)
+    uv run python -m medirag.index.ann_report --db ./lance_db --sample 200 --json ann_report.json
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from medirag.index.lance import DEFAULT_TABLE, VECTOR_INDEX_TYPES, LanceIndexer, tune_search
+
+
+@dataclass
+class Query:
+    vector: np.ndarray
+    exclude: int | None = None  # row id of the row the query was sampled from
+
+
+@dataclass
+class SettingResult:
+    setting: str
+    recall: float
+    p50_ms: float
+    p99_ms: float
+
+
+def _load_queries(indexer: LanceIndexer, path: str | None, sample: int, seed: int) -> list[Query]:
+    if path:
+        lines = [line.strip() for line in Path(path).read_text().splitlines() if line.strip()]
+        return [Query(vector=v) for v in indexer._encode_queries(lines)]
+    table = indexer.table
+    rng = np.random.default_rng(seed)
+    offsets = rng.choice(table.count_rows(), size=min(sample, table.count_rows()), replace=False)
+    rows = table.take_offsets(sorted(int(o) for o in offsets)).select(["vector"]).with_row_id().to_arrow()
+    return [
+        Query(vector=np.asarray(v, dtype=np.float32), exclude=rid)
+        for v, rid in zip(rows.column("vector").to_pylist(), rows.column("_rowid").to_pylist())
+    ]
+
+
+def _search(
+    indexer: LanceIndexer,
+    queries: list[Query],
+    top_k: int,
+    flat: bool = False,
+    nprobes: int | None = None,
+    refine_factor: int | None = None,
+) -> tuple[list[list[int]], np.ndarray]:
+    """
+    Row ids of the top_k hits per query (own row dropped), and per-query latency in ms.
+    """
+    ids: list[list[int]] = []
+    latencies = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        search = indexer.table.search(q.vector, query_type="vector").select([]).with_row_id(True)
+        if flat:
+            search = search.bypass_vector_index()
+        else:
+            search = tune_search(search, nprobes, refine_factor)
+        t0 = time.perf_counter()
+        rows = search.limit(top_k + (q.exclude is not None)).to_arrow()
+        latencies[i] = (time.perf_counter() - t0) * 1000
+        hit_ids = [rid for rid in rows.column("_rowid").to_pylist() if rid != q.exclude]
+        ids.append(hit_ids[:top_k])
+    return ids, latencies
+
+
+def _recall(truth: list[list[int]], found: list[list[int]]) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    total = sum(len(t) for t in truth)
+    return hits / total if total else 0.0
+
+
+def _result(setting: str, truth: list[list[int]], found: list[list[int]], latencies: np.ndarray) -> SettingResult:
+    return SettingResult(
+        setting=setting,
+        recall=_recall(truth, found),
+        p50_ms=float(np.percentile(latencies, 50)),
+        p99_ms=float(np.percentile(latencies, 99)),
+    )
+
+
+def run_report(
+    indexer: LanceIndexer,
+    queries: list[Query],
+    index_types: list[str],
+    nprobes: list[int],
+    refine_factors: list[int],
+    top_k: int = 10,
+    num_partitions: int | None = None,
+    num_sub_vectors: int | None = None,
+) -> list[SettingResult]:
+    """
+    Score the flat scan and every ANN setting; the flat scan is the recall reference (1.0 by definition).
+    """
+    truth, flat_latencies = _search(indexer, queries, top_k, flat=True)
+    results = [_result("flat", truth, truth, flat_latencies)]
+    for index_type in index_types:
+        logger.info(f"Building {index_type} index…")
+        t0 = time.perf_counter()
+        if not indexer.create_vector_index(index_type, num_partitions=num_partitions, num_sub_vectors=num_sub_vectors):
+            continue
+        logger.info(f"Built {index_type} in {time.perf_counter() - t0:.1f}s")
+        for n, rf in itertools.product(nprobes, refine_factors):
+            found, latencies = _search(indexer, queries, top_k, nprobes=n, refine_factor=rf)
+            results.append(_result(f"{index_type} nprobes={n} refine={rf}", truth, found, latencies))
+    return results
+
+
+def _format(results: list[SettingResult], top_k: int) -> str:
+    width = max(len(r.setting) for r in results)
+    lines = [f"{'setting':<{width}}  recall@{top_k}  p50 ms  p99 ms"]
+    for r in results:
+        lines.append(f"{r.setting:<{width}}  {r.recall:>8.3f}  {r.p50_ms:>6.1f}  {r.p99_ms:>6.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="LanceDB directory")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help=f"Table name (default: {DEFAULT_TABLE})")
+    parser.add_argument("--queries", default=None, help="Text file of held-out questions, one per line")
+    parser.add_argument("--sample", type=int, default=200, help="Without --queries: stored rows to use (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --sample (default: 0)")
+    parser.add_argument("--top-k", type=int, default=10, help="k for recall@k (default: 10)")
+    parser.add_argument(
+        "--index-type",
+        nargs="+",
+        choices=VECTOR_INDEX_TYPES,
+        default=list(VECTOR_INDEX_TYPES),
+        help="ANN index types to build and score (default: all)",
+    )
+    parser.add_argument("--num-partitions", type=int, default=None, help="IVF partitions (default: Lance's choice)")
+    parser.add_argument("--num-sub-vectors", type=int, default=None, help="PQ sub-vectors (default: Lance's choice)")
+    parser.add_argument("--nprobes", nargs="+", type=int, default=[10, 20, 50], help="nprobes values to try")
+    parser.add_argument("--refine-factor", nargs="+", type=int, default=[1, 5], help="refine factors to try")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    indexer = LanceIndexer(db_path=args.db, table_name=args.table)
+    if indexer.table is None:
+        logger.error(f"No table {args.table} in {args.db}")
+        return 1
+
+    queries = _load_queries(indexer, args.queries, args.sample, args.seed)
+    logger.info(f"Scoring {len(queries)} queries against {indexer.table.count_rows()} rows")
+    results = run_report(
+        indexer,
+        queries,
+        index_types=args.index_type,
+        nprobes=args.nprobes,
+        refine_factors=args.refine_factor,
+        top_k=args.top_k,
+        num_partitions=args.num_partitions,
+        num_sub_vectors=args.num_sub_vectors,
+    )
+    print(_format(results, args.top_k))
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in results], indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
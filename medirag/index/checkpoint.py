@@ -0,0 +1,84 @@
+"""
+Checkpoint manifests for resumable index builds.
+
+The runner rewrites `<db>/<table>.checkpoint.json` after every committed insert batch with the source being indexed,
+the archive member of the last SPL in that batch and the Lance table version the batch produced. `--resume` rolls the
+table back to that version — dropping any batch that was committed after the manifest was last written — and picks
+the build up at the member after the recorded one.
+
+Members are tracked in archive order, so checkpoints are only kept for ordered builds (not `--unordered`).
+"""
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from medirag.index.lance import LanceIndexer
+
+
+def checkpoint_path(db_path: str | Path, table_name: str) -> Path:
+    return Path(db_path) / f"{table_name}.checkpoint.json"
+
+
+@dataclass
+class Checkpoint:
+    table_version: int | None  # None: the table did not exist when the build started
+    done: list[str] = field(default_factory=list)  # sources fully indexed
+    part: str | None = None  # source being indexed
+    member: str | None = None  # last SPL member committed from `part`
+    spls: int = 0
+    records: int = 0
+    complete: bool = False
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint | None":
+        if not path.exists():
+            return None
+        return cls(**json.loads(path.read_text()))
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=2))
+        tmp.rename(path)  # atomic: a crash leaves either the old manifest or the new one
+
+    def start_after(self, source: str) -> str | None:
+        """
+        Member to resume `source` after, or None to index it from the start.
+        """
+        return self.member if source == self.part else None
+
+    def commit(self, path: Path, indexer: LanceIndexer, source: str, member: str, spls: int, records: int) -> None:
+        """
+        Record a committed batch whose last SPL was `member`.
+        """
+        self.part = source
+        self.member = member
+        self.spls += spls
+        self.records += records
+        self.table_version = indexer.table.version
+        self.save(path)
+
+    def finish_part(self, path: Path, indexer: LanceIndexer, source: str) -> None:
+        self.done.append(source)
+        self.part = None
+        self.member = None
+        if indexer.table is not None:
+            self.table_version = indexer.table.version
+        self.save(path)
+
+
+def rollback(indexer: LanceIndexer, checkpoint: Checkpoint) -> None:
+    """
+    Return the table to the version recorded in `checkpoint`, discarding batches committed after it.
+    """
+    table = indexer.table
+    if table is None:
+        return
+    if checkpoint.table_version is None:
+        logger.warning(f"Checkpoint predates table {indexer.table_name}; dropping it")
+        indexer.drop_table()
+    elif table.version > checkpoint.table_version:
+        logger.warning(f"Rolling {indexer.table_name} back from version {table.version} to {checkpoint.table_version}")
+        table.restore(checkpoint.table_version)
@@ -0,0 +1,129 @@
+"""
+Incremental indexing from DailyMed update bundles.
+
+DailyMed publishes daily and weekly update zips alongside the full release, laid out like the release parts (outer
+zip → one zip per SPL → XML), each holding the labels that changed in that window. `apply_updates` folds one into an
+existing table: SPLs whose version is already indexed (or older) are skipped without embedding anything; for the
+rest, every row of the superseded version is deleted and the new version's rows are inserted.
+
+Update zips must be applied oldest first, so an older bundle never overwrites a newer label; a re-applied bundle is a
+no-op.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Iterable
+
+from loguru import logger
+
+from medirag.core.metrics import METRICS
+from medirag.core.reader import ProductCard, SectionRecord
+from medirag.index.lance import LanceIndexer
+
+
+DAILYMED_UPDATES_BASE = "https://dailymed-data.nlm.nih.gov/public-release-files"
+
+
+def daily_update_url(day: date) -> str:
+    return f"{DAILYMED_UPDATES_BASE}/dm_spl_daily_update_{day:%m%d%Y}.zip"
+
+
+def weekly_update_url(start: date, end: date) -> str:
+    return f"{DAILYMED_UPDATES_BASE}/dm_spl_weekly_update_{start:%m%d%Y}_{end:%m%d%Y}.zip"
+
+
+def is_newer(incoming: str | None, indexed: str | None) -> bool:
+    """
+    True if SPL version `incoming` supersedes `indexed`.
+
+    Versions are `versionNumber` values (integers as strings); anything non-numeric only counts as newer if it differs.
+    """
+    if incoming is not None and indexed is not None and incoming.isdigit() and indexed.isdigit():
+        return int(incoming) > int(indexed)
+    return incoming != indexed
+
+
+@dataclass
+class DeltaStats:
+    added: int = 0  # SPLs not previously indexed
+    updated: int = 0  # SPLs whose indexed version was replaced
+    unchanged: int = 0  # SPLs skipped because their version was already indexed
+    records: int = 0  # rows inserted
+
+    def __iadd__(self, other: "DeltaStats") -> "DeltaStats":
+        self.added += other.added
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.records += other.records
+        return self
+
+
+def _apply_batch(spls: list[list[ProductCard | SectionRecord]], indexer: LanceIndexer) -> DeltaStats:
+    # If a bundle carries several versions of one label, only the newest is kept.
+    latest: dict[str, list[ProductCard | SectionRecord]] = {}
+    for records in spls:
+        head = records[0]
+        held = latest.get(head.set_id)
+        if held is None or is_newer(head.version, held[0].version):
+            latest[head.set_id] = records
+
+    stats = DeltaStats(unchanged=len(spls) - len(latest))
+    indexed = indexer.spl_versions(latest)
+    changed: list[str] = []
+    rows: list[ProductCard | SectionRecord] = []
+    for set_id, records in latest.items():
+        if set_id in indexed and not is_newer(records[0].version, indexed[set_id]):
+            stats.unchanged += 1
+            continue
+        if set_id in indexed:
+            stats.updated += 1
+            changed.append(set_id)
+        else:
+            stats.added += 1
+        rows.extend(records)
+
+    if rows:
+        stats.records = indexer.replace_spls(rows, changed)
+    METRICS.count("batches")
+    METRICS.count("spls", len(spls))
+    METRICS.count("records", stats.records)
+    return stats
+
+
+def apply_updates(
+    stream: Iterable[tuple[str, list[ProductCard | SectionRecord]]],
+    indexer: LanceIndexer,
+    batch_size: int = 512,
+    on_commit: Callable[[str, int, int], None] | None = None,
+) -> DeltaStats:
+    """
+    Upsert (member, records) pairs, one per SPL, into `indexer`, `batch_size` records per version lookup + write.
+
+    `on_commit(member, spls, records)` is called after each write with the last SPL member in the batch, as the
+    runner's plain inserts do, so a delta run can be checkpointed and resumed.
+    """
+    stats = DeltaStats()
+    pending: list[list[ProductCard | SectionRecord]] = []
+    n_records = 0
+    member = ""
+
+    def flush() -> DeltaStats:
+        batch = _apply_batch(pending, indexer)
+        if on_commit is not None:
+            on_commit(member, len(pending), batch.records)
+        return batch
+
+    for member, records in stream:
+        pending.append(records)
+        n_records += len(records)
+        if n_records >= batch_size:
+            stats += flush()
+            logger.info(
+                f"  applied batch — totals: {stats.added} added, {stats.updated} updated, "
+                f"{stats.unchanged} unchanged, {stats.records} records"
+            )
+            pending = []
+            n_records = 0
+    if pending:
+        stats += flush()
+    return stats
@@ -0,0 +1,162 @@
+"""
+On-disk embedding cache keyed by a hash of (model name, text).
+
+Most section texts are unchanged between DailyMed releases, and many are shared verbatim across generic labels from
+different manufacturers, so a rebuild mostly re-embeds text it has embedded before. EmbeddingCache keeps every vector
+it has seen in a memory-mapped float32 file with a parallel file of 16-byte BLAKE2b digests; the digest → slot index
+is rebuilt from the digest file on open.
+
+Layout under `root/<model slug>/`:
+
+    meta.json     model, dim, capacity, next slot to write
+    keys.bin      capacity × 16-byte digests (all-zero = empty slot)
+    vectors.f32   capacity × dim float32
+
+The cache is a ring buffer of `max_entries` slots, evicting first in, first out: once full, each new vector
+overwrites the oldest-written one, however recently it was read, since a hit does not move an entry. Recency is not
+tracked because rebuilds read texts in release order, the order they were written in; size the cache to hold a full
+release. Both files are created sparse, so disk use grows with the number of entries actually written. Call
+`close()` (or use the cache as a context manager) to flush; entries written after the last flush may be lost on a
+crash.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Literal
+
+import numpy as np
+from loguru import logger
+
+
+_KEY_BYTES = 16
+_EMPTY_KEY = bytes(_KEY_BYTES)
+
+
+class EmbeddingCache:
+    """
+    (model, text) → vector, persisted as memory-mapped arrays under `root`.
+    """
+
+    def __init__(self, root: str | Path, model: str, dim: int, max_entries: int = 1_000_000):
+        self.model = model
+        self.dim = dim
+        self.dir = Path(root) / model.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        meta_path = self.dir / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta["dim"] != dim:
+                raise ValueError(f"Embedding cache {self.dir} holds {meta['dim']}d vectors, expected {dim}d")
+            if meta["capacity"] != max_entries:
+                logger.warning(
+                    f"Embedding cache {self.dir} was created with capacity {meta['capacity']}; "
+                    f"ignoring max_entries={max_entries}"
+                )
+            self.capacity = meta["capacity"]
+            self._next = meta["next"]
+            mode: Literal["r+", "w+"] = "r+"
+        else:
+            self.capacity = max_entries
+            self._next = 0
+            mode = "w+"
+
+        self._keys = np.memmap(str(self.dir / "keys.bin"), dtype=f"S{_KEY_BYTES}", mode=mode, shape=(self.capacity,))
+        self._vectors = np.memmap(
+            str(self.dir / "vectors.f32"), dtype=np.float32, mode=mode, shape=(self.capacity, dim)
+        )
+        self._slot_of: dict[bytes, int] = {}
+        for slot, key in enumerate(self._keys):
+            if key:  # numpy strips trailing NULs, so an empty slot reads back as b""
+                self._slot_of[key.ljust(_KEY_BYTES, b"\0")] = slot
+        self._write_meta()
+        logger.info(f"Embedding cache {self.dir}: {len(self._slot_of)}/{self.capacity} vectors")
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def key(self, text: str) -> bytes:
+        h = hashlib.blake2b(digest_size=_KEY_BYTES)
+        h.update(self.model.encode())
+        h.update(b"\0")
+        h.update(text.encode())
+        return h.digest()
+
+    def get(self, text: str) -> np.ndarray | None:
+        slot = self._slot_of.get(self.key(text))
+        if slot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.array(self._vectors[slot])
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        self._store(self.key(text), vector)
+
+    def embed(self, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """
+        Vectors for `texts`, calling `encode` only on texts not in the cache (each distinct text once).
+        """
+        keys = [self.key(t) for t in texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing: dict[bytes, list[int]] = {}
+        for i, key in enumerate(keys):
+            slot = self._slot_of.get(key)
+            if slot is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                out[i] = self._vectors[slot]
+        # A miss is a text sent to the encoder; repeats within the batch count as hits.
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+
+        if missing:
+            vectors = encode([texts[rows[0]] for rows in missing.values()])
+            for (key, rows), vec in zip(missing.items(), vectors):
+                out[rows] = vec
+                self._store(key, vec)
+        return out
+
+    def flush(self) -> None:
+        self._vectors.flush()
+        self._keys.flush()
+        self._write_meta()
+
+    def close(self) -> None:
+        self.flush()
+        total = self.hits + self.misses
+        if total:
+            logger.info(f"Embedding cache: {self.hits}/{total} hits ({self.hit_rate:.0%}), {len(self)} vectors stored")
+
+    def _store(self, key: bytes, vector: np.ndarray) -> None:
+        if key in self._slot_of:
+            return
+        slot = self._next
+        evicted = self._keys[slot]
+        if evicted:
+            self._slot_of.pop(evicted.ljust(_KEY_BYTES, b"\0"), None)
+        self._keys[slot] = _EMPTY_KEY
+        self._vectors[slot] = vector
+        self._keys[slot] = key
+        self._slot_of[key] = slot
+        self._next = (slot + 1) % self.capacity
+
+    def _write_meta(self) -> None:
+        meta = {"model": self.model, "dim": self.dim, "capacity": self.capacity, "next": self._next}
+        tmp = self.dir / ".meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        tmp.rename(self.dir / "meta.json")
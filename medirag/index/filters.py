@@ -0,0 +1,81 @@
+"""
+Typed metadata prefilters for `LanceIndexer.retrieve`, backed by scalar indexes.
+
+`SCALAR_INDEXES` lists the index built on each filterable column: BTREE for high-cardinality strings, BITMAP for
+low-cardinality ones and LABEL_LIST for the list columns. SplFilter only ever emits predicates Lance can answer from
+those indexes (`col = v`, `col IN (...)`, `array_has_any(col, [...])`), so a filtered search resolves matching row ids
+from the index and skips fragments that hold none, instead of scanning every row's metadata.
+"""
+
+from dataclasses import dataclass
+from typing import Sequence
+
+from lancedb.index import Bitmap, BTree, LabelList
+
+
+SCALAR_INDEXES: dict[str, BTree | Bitmap | LabelList] = {
+    "set_id": BTree(),
+    "drug_name": BTree(),
+    "loinc": Bitmap(),
+    "kind": Bitmap(),
+    "is_patient_facing": Bitmap(),
+    "ndcs": LabelList(),
+    "active_ingredient_uniis": LabelList(),
+    "active_ingredient_names": LabelList(),
+}
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _equals_any(column: str, values: Sequence[str]) -> str:
+    if len(values) == 1:
+        return f"{column} = {_quote(values[0])}"
+    return f"{column} IN ({', '.join(_quote(v) for v in values)})"
+
+
+def _has_any(column: str, values: Sequence[str]) -> str:
+    return f"array_has_any({column}, [{', '.join(_quote(v) for v in values)}])"
+
+
+@dataclass(frozen=True)
+class SplFilter:
+    """
+    Conditions on indexed metadata columns. Set fields are ANDed; multi-valued fields match any of their values.
+
+    `ndcs` and the active-ingredient fields are only populated on product cards, so filtering on them alone returns
+    product cards (see `LanceIndexer.retrieve_for_ndc` to search a whole label by NDC).
+    """
+
+    set_ids: Sequence[str] = ()
+    drug_names: Sequence[str] = ()
+    loincs: Sequence[str] = ()
+    kind: str | None = None  # "product_card" | "section"
+    patient_facing: bool | None = None
+    ndcs: Sequence[str] = ()
+    active_ingredient_uniis: Sequence[str] = ()
+    active_ingredient_names: Sequence[str] = ()
+
+    def to_sql(self) -> str | None:
+        """
+        The filter as a Lance SQL predicate, or None if no condition is set.
+        """
+        clauses = []
+        if self.set_ids:
+            clauses.append(_equals_any("set_id", self.set_ids))
+        if self.drug_names:
+            clauses.append(_equals_any("drug_name", self.drug_names))
+        if self.loincs:
+            clauses.append(_equals_any("loinc", self.loincs))
+        if self.kind is not None:
+            clauses.append(_equals_any("kind", [self.kind]))
+        if self.patient_facing is not None:
+            clauses.append(f"is_patient_facing = {str(self.patient_facing).lower()}")
+        if self.ndcs:
+            clauses.append(_has_any("ndcs", self.ndcs))
+        if self.active_ingredient_uniis:
+            clauses.append(_has_any("active_ingredient_uniis", self.active_ingredient_uniis))
+        if self.active_ingredient_names:
+            clauses.append(_has_any("active_ingredient_names", self.active_ingredient_names))
+        return " AND ".join(clauses) or None
@@ -0,0 +1,195 @@
+"""
+Finalize a LanceDB table after loading: compact fragments, rebuild indexes, prune old versions.
+
+Every insert batch becomes its own fragment and table version, so a full build leaves thousands of small fragments
+and a long version history. Both slow scans down and bloat the directory `medirag.index.publisher` syncs. The runner
+calls `finalize()` as its last stage; this module's CLI does the same for a table that already exists. After a delta
+run, which only touches a few thousand rows, the runner calls the incremental `optimize()` instead.
+
+Usage:
+    uv run python -m medirag.index.finalize --db ./lance_db
+
+    # Keep a day of history for readers still on older versions
+    uv run python -m medirag.index.finalize --db ./lance_db --keep-versions-hours 24
+
+Pruning with `--keep-versions-hours 0` (the default) deletes every version but the latest, so run it when no other
+process is reading or writing the table.
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from loguru import logger
+
+from medirag.index.lance import DEFAULT_TABLE, VECTOR_INDEX_TYPES, LanceIndexer
+
+
+# lancedb's IndexConfig.index_type names for the vector indexes the runner builds
+_VECTOR_INDEX_NAMES = {"IvfPq": "IVF_PQ", "IvfHnswSq": "IVF_HNSW_SQ"}
+
+
+@dataclass
+class TableFootprint:
+    rows: int
+    fragments: int
+    small_fragments: int
+    versions: int
+    disk_bytes: int  # everything under the table directory: data, indexes, manifests
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows} rows in {self.fragments} fragments ({self.small_fragments} small), "
+            f"{self.versions} versions, {self.disk_bytes / 1e6:.1f} MB on disk"
+        )
+
+
+def footprint(indexer: LanceIndexer) -> TableFootprint:
+    table = indexer.table
+    stats = table.stats()
+    table_dir = Path(indexer.db_path) / f"{indexer.table_name}.lance"
+    return TableFootprint(
+        rows=stats["num_rows"],
+        fragments=stats["fragment_stats"]["num_fragments"],
+        small_fragments=stats["fragment_stats"]["num_small_fragments"],
+        versions=len(table.list_versions()),
+        disk_bytes=sum(f.stat().st_size for f in table_dir.rglob("*") if f.is_file()),
+    )
+
+
+def existing_vector_index(indexer: LanceIndexer) -> str | None:
+    """
+    Type of the vector index currently on the table (one of VECTOR_INDEX_TYPES), or None.
+    """
+    for index in indexer.table.list_indices():
+        if "vector" in index.columns:
+            return _VECTOR_INDEX_NAMES.get(index.index_type)
+    return None
+
+
+def _compact(indexer: LanceIndexer, target_rows_per_fragment: int | None) -> None:
+    table = indexer.table
+    if target_rows_per_fragment is not None:
+        try:
+            table.compact_files(target_rows_per_fragment=target_rows_per_fragment)
+            return
+        except ImportError:
+            logger.warning("A custom fragment size needs the `pylance` package; using Lance's default (1M rows)")
+    # optimize() compacts to Lance's default fragment size; its 7-day prune never touches this build's versions.
+    table.optimize()
+
+
+def build_indexes(
+    indexer: LanceIndexer,
+    vector_index: str | None = None,
+    num_partitions: int | None = None,
+    num_sub_vectors: int | None = None,
+) -> None:
+    """
+    (Re)build the FTS and scalar indexes, plus a `vector_index` ANN index if one is named.
+    """
+    logger.info("Creating FTS index for hybrid search…")
+    indexer.create_fts_index()
+    logger.info("Creating scalar indexes for metadata filters…")
+    indexer.create_scalar_indexes()
+    if vector_index is not None:
+        logger.info(f"Creating {vector_index} vector index…")
+        indexer.create_vector_index(vector_index, num_partitions=num_partitions, num_sub_vectors=num_sub_vectors)
+
+
+def finalize(
+    indexer: LanceIndexer,
+    target_rows_per_fragment: int | None = None,
+    keep_versions: timedelta = timedelta(0),
+    vector_index: str | None = None,
+    num_partitions: int | None = None,
+    num_sub_vectors: int | None = None,
+) -> tuple[TableFootprint, TableFootprint]:
+    """
+    Compact, rebuild the FTS, scalar and vector indexes, then drop versions older than `keep_versions`.
+
+    `vector_index` names the ANN index to build; None rebuilds whichever type the table already has (if any).
+    Returns the table footprint (before, after).
+    """
+    before = footprint(indexer)
+    logger.info(f"Before finalize: {before}")
+    if vector_index is None:
+        vector_index = existing_vector_index(indexer)
+
+    t0 = time.perf_counter()
+    _compact(indexer, target_rows_per_fragment)
+    logger.info(f"Compacted in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    build_indexes(indexer, vector_index, num_partitions=num_partitions, num_sub_vectors=num_sub_vectors)
+    logger.info(f"Rebuilt indexes in {time.perf_counter() - t0:.1f}s")
+
+    indexer.table.optimize(cleanup_older_than=keep_versions)
+    after = footprint(indexer)
+    logger.info(f"After finalize: {after}")
+    return before, after
+
+
+def optimize(
+    indexer: LanceIndexer, keep_versions: timedelta = timedelta(hours=24)
+) -> tuple[TableFootprint, TableFootprint]:
+    """
+    Incremental counterpart to `finalize` for a table that took an update: compact, add the new rows to the existing
+    indexes without retraining them, then drop versions older than `keep_versions`.
+
+    Returns the table footprint (before, after).
+    """
+    before = footprint(indexer)
+    t0 = time.perf_counter()
+    indexer.table.optimize(cleanup_older_than=keep_versions)
+    after = footprint(indexer)
+    logger.info(f"Optimized in {time.perf_counter() - t0:.1f}s: {after}")
+    return before, after
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="LanceDB directory")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help=f"Table name (default: {DEFAULT_TABLE})")
+    parser.add_argument(
+        "--target-rows-per-fragment",
+        type=int,
+        default=None,
+        help="Fragment size to compact to (default: Lance's, 1M rows; other values need pylance)",
+    )
+    parser.add_argument(
+        "--keep-versions-hours",
+        type=float,
+        default=0,
+        help="Keep table versions newer than this; 0 keeps only the latest (default: 0)",
+    )
+    parser.add_argument(
+        "--vector-index",
+        choices=VECTOR_INDEX_TYPES,
+        default=None,
+        help="ANN index to build (default: rebuild the table's current one, if any)",
+    )
+    parser.add_argument("--num-partitions", type=int, default=None, help="IVF partitions (default: Lance's choice)")
+    parser.add_argument("--num-sub-vectors", type=int, default=None, help="PQ sub-vectors (default: Lance's choice)")
+    args = parser.parse_args(argv)
+
+    indexer = LanceIndexer(db_path=args.db, table_name=args.table)
+    if indexer.table is None:
+        logger.error(f"No table {args.table} in {args.db}")
+        return 1
+    finalize(
+        indexer,
+        target_rows_per_fragment=args.target_rows_per_fragment,
+        keep_versions=timedelta(hours=args.keep_versions_hours),
+        vector_index=args.vector_index,
+        num_partitions=args.num_partitions,
+        num_sub_vectors=args.num_sub_vectors,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,60 @@
 """
 LanceDB-backed indexer for SPL records.
 
-Uses LanceDB's native sentence-transformers embedding registry with NeuML/pubmedbert-base-embeddings (768d). Stores full
-metadata for filtering and supports hybrid (vector + BM25) search.
+Embeds with NeuML/pubmedbert-base-embeddings (768d), resolved through the process-wide model registry
+(`medirag.core.models`). Default-format tables still declare LanceDB's sentence-transformers embedding function in their
+schema, so other LanceDB clients can search them by text. Stores full metadata for filtering and supports hybrid
+(vector + BM25) search.
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Sequence, cast
 
 import lancedb
-import torch
+import numpy as np
+import pyarrow as pa
 from lancedb.embeddings import get_registry
 from lancedb.pydantic import LanceModel, Vector
+from lancedb.query import AsyncHybridQuery, AsyncVectorQuery
+from lancedb.types import VectorIndexType
 from loguru import logger
 from sentence_transformers import SentenceTransformer
 
+from medirag.core.batching import MicroBatchEncoder
+from medirag.core.columnar import ROW_SCHEMA, to_record_batch, with_vectors
+from medirag.core.metrics import METRICS
+from medirag.core.models import MODELS, default_device
 from medirag.core.reader import ProductCard, SectionRecord
+from medirag.index.embed_cache import EmbeddingCache
+from medirag.index.filters import SCALAR_INDEXES, SplFilter
+from medirag.index.query_cache import QueryEmbeddingCache
+from medirag.index.rerank import CrossEncoderReranker
+from medirag.index.vector_format import VectorFormat
 
 
 EMBED_MODEL = "NeuML/pubmedbert-base-embeddings"
 EMBED_DIM = 768
 DEFAULT_TABLE = "spl"
 
+VECTOR_INDEX_TYPES = ("IVF_PQ", "IVF_HNSW_SQ")
+# Below this many rows a flat scan is already fast, and IVF/PQ training has too little data to work with.
+MIN_ROWS_FOR_VECTOR_INDEX = 10_000
 
-def _build_schema(embed_model_name: str = EMBED_MODEL):
+
+def _build_schema(embed_model_name: str, vector_format: VectorFormat, model_dim: int):
     """
-    Build the LanceDB Pydantic schema with an embedding function attached.
+    Build the LanceDB Pydantic schema, with an embedding function attached for the default vector format.
+
+    `LanceIndexer.add` always attaches vectors itself, so Lance never runs the embedding function (or loads its model);
+    it is recorded for other clients of the table. A `vector_format` other than full float32 can't be produced by it,
+    so those tables declare plain vectors.
     """
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    embedder = get_registry().get("sentence-transformers").create(name=embed_model_name, device=device)
+    embedder = get_registry().get("sentence-transformers").create(name=embed_model_name, device=default_device())
+    vector_format = vector_format.normalized(model_dim)
 
     class SplRecord(LanceModel):
         # identity
@@ -39,8 +64,14 @@ def _build_schema(embed_model_name: str = EMBED_MODEL):
         kind: str  # "product_card" | "section"
 
         # the searchable text — source field for the embedding
-        text: str = embedder.SourceField()
-        vector: Vector(embedder.ndims()) = embedder.VectorField()  # type: ignore[valid-type] # noqa: F821
+        if vector_format.is_default:
+            text: str = embedder.SourceField()
+            vector: Vector(model_dim) = embedder.VectorField()  # type: ignore[valid-type] # noqa: F821
+        else:
+            text: str  # type: ignore[no-redef]
+            vector: Vector(  # type: ignore[valid-type,no-redef] # noqa: F821
+                vector_format.ndims(model_dim), value_type=vector_format.arrow_type
+            )
 
         # section metadata (empty strings for product_card)
         loinc: str = ""
@@ -57,10 +88,15 @@ def _build_schema(embed_model_name: str = EMBED_MODEL):
         inactive_ingredient_names: list[str] = []
         ndcs: list[str] = []
 
-    return SplRecord, embedder
+    return SplRecord
 
 
-@dataclass
+# The columns retrieve() reads to build RetrievalHits. Searches select only these, so neither the vector nor the
+# product-metadata lists leave Lance.
+HIT_COLUMNS = ("text", "drug_name", "set_id", "kind", "loinc", "section_title", "is_patient_facing")
+
+
+@dataclass(slots=True)
 class RetrievalHit:
     text: str
     drug_name: str
@@ -82,55 +118,226 @@ class LanceIndexer:
         db_path: str | Path,
         table_name: str = DEFAULT_TABLE,
         embed_model: str = EMBED_MODEL,
+        embed_cache: EmbeddingCache | None = None,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+        vector_format: VectorFormat | None = None,
+        query_cache: QueryEmbeddingCache | None = None,
+        query_batcher: MicroBatchEncoder | None = None,
+        reranker: CrossEncoderReranker | None = None,
     ):
+        if query_cache is not None and query_cache.model != embed_model:
+            raise ValueError(f"Query cache holds {query_cache.model} vectors, not {embed_model}")
+        if query_batcher is not None and query_batcher.model_name != embed_model:
+            raise ValueError(f"Query batcher encodes with {query_batcher.model_name}, not {embed_model}")
         self.db_path = str(db_path)
         self.table_name = table_name
         self.embed_model = embed_model
-        self._schema, self._embedder = _build_schema(embed_model)
+        # Optional (model, text) → vector cache. When set, add() embeds rows itself so reused texts skip the model.
+        self.embed_cache = embed_cache
+        # Optional LRU of recent query vectors; retrieval skips the encoder for questions it has seen.
+        self.query_cache = query_cache
+        # Optional shared micro-batching encoder (`MODELS.batcher`); concurrent query encodes share forward passes.
+        self.query_batcher = query_batcher
+        # Optional second stage for retrieve(with_reranker=True): over-fetch, then rescore with a cross-encoder.
+        self.reranker = reranker
+        # Default ANN query knobs for retrieve(); None leaves Lance's own defaults.
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
         self._db = lancedb.connect(self.db_path)
         self._table = None
         if table_name in _list_table_names(self._db):
             self._table = self._db.open_table(table_name)
-        # CPU-pinned query encoder. Used at search time to bypass the embedder
-        # baked into the table (which can call `.cuda()` on CPU-only deploys).
-        # Indexing still uses the table's stored embedder via `add()`.
-        self._query_encoder: SentenceTransformer | None = None
+        # Vector storage format: an existing table's own, else `vector_format` (default: full float32). Resolving it
+        # needs the model's dimension, so it waits for first use unless a format was asked for and has to be checked.
+        self._stored_format = (
+            VectorFormat.of_field(self._table.schema.field("vector")) if self._table is not None else None
+        )
+        self._requested_format = vector_format
+        self._vector_format: VectorFormat | None = None
+        if vector_format is not None:
+            _ = self.vector_format
+        # For aretrieve(): threads that run query encodes off the event loop, and an async table handle. One thread
+        # encodes directly; with a batcher, enough threads wait on it to fill a batch.
+        self._query_executor = ThreadPoolExecutor(
+            max_workers=query_batcher.max_batch_size if query_batcher is not None else 1,
+            thread_name_prefix="query-encode",
+        )
+        self._async_table: lancedb.AsyncTable | None = None
+        self._async_table_lock = asyncio.Lock()  # concurrent first requests open one handle, not one each
 
     @property
     def table(self):
         return self._table
 
+    @property
+    def vector_format(self) -> VectorFormat:
+        if self._vector_format is None:
+            model_dim = MODELS.dimension(self.embed_model)
+            fmt = (self._stored_format or self._requested_format or VectorFormat()).normalized(model_dim)
+            requested = self._requested_format
+            if requested is not None and requested.normalized(model_dim) != fmt:
+                raise ValueError(f"Table {self.table_name} stores {fmt} vectors, not {requested}")
+            self._vector_format = fmt
+        return self._vector_format
+
     def _ensure_table(self):
         if self._table is None:
+            model_dim = MODELS.dimension(self.embed_model)
             self._table = self._db.create_table(
                 self.table_name,
-                schema=self._schema,  # type: ignore[arg-type]
+                schema=_build_schema(self.embed_model, self.vector_format, model_dim),  # type: ignore[arg-type]
                 mode="create",
             )
         return self._table
 
-    def add(self, records: Iterable[ProductCard | SectionRecord]) -> int:
+    def drop_table(self) -> None:
+        if self.table_name in _list_table_names(self._db):
+            self._db.drop_table(self.table_name)
+        self._table = None
+        if self._async_table is not None:
+            self._async_table.close()
+            self._async_table = None
+
+    def close(self) -> None:
+        """
+        Stop the threads behind aretrieve() and close its async table handle. The caches, batcher and reranker were
+        passed in by the caller, who closes them.
+        """
+        self._query_executor.shutdown(wait=True)
+        if self._async_table is not None:
+            self._async_table.close()
+            self._async_table = None
+
+    def add(self, records: Iterable[ProductCard | SectionRecord] | pa.RecordBatch) -> int:
         """
         Insert records.
 
-        Lance computes embeddings automatically.
+        Records go to Lance as a RecordBatch in the `medirag.core.columnar` layout, with vectors attached here via
+        `embed()` (the registry's model, plus the embedding cache if there is one), so Lance's embedding function
+        never loads a second copy of the model. The two are recorded as the "embed" and "write" stages.
         """
-        rows = [_record_to_row(r) for r in records]
-        if not rows:
+        if not isinstance(records, pa.RecordBatch):
+            records = to_record_batch(records)
+        if records.num_rows == 0:
             return 0
+        if "vector" not in records.schema.names:
+            records = with_vectors(records, self.embed(records.column("text").to_pylist()))
+        table = self._ensure_table()
+        with METRICS.time("write"):
+            table.add(records)
+        return records.num_rows
+
+    def add_batches(self, batches: pa.RecordBatchReader) -> int:
+        """
+        Append a stream of rows that already carry vectors in one write, i.e. one new table version. Returns the rows
+        added.
+        """
         table = self._ensure_table()
-        table.add(rows)
-        return len(rows)
-
-    def _encode_query(self, query: str):
-        encoder = self._query_encoder
-        if encoder is None:
-            encoder = SentenceTransformer(self.embed_model, device="cpu")
-            self._query_encoder = encoder
-        # LanceDB's sentence-transformers wrapper normalizes by default; match
-        # that so query and indexed vectors live in the same space.
-        vec = encoder.encode([query], show_progress_bar=False, normalize_embeddings=True)
-        return vec[0]
+        before = table.count_rows()
+        with METRICS.time("commit"):
+            table.add(batches)
+        return table.count_rows() - before
+
+    def spl_versions(self, set_ids: Iterable[str]) -> dict[str, str | None]:
+        """
+        Indexed version of each SPL in `set_ids`; SPLs not in the table are absent from the result.
+        """
+        set_ids = list(set_ids)
+        if self._table is None or not set_ids:
+            return {}
+        rows = (
+            self._table.search()
+            .where(_predicate(SplFilter(set_ids=set_ids)))
+            .select(["set_id", "version"])
+            .limit(None)
+            .to_arrow()
+        )
+        return dict(zip(rows.column("set_id").to_pylist(), rows.column("version").to_pylist()))
+
+    def replace_spls(self, records: Iterable[ProductCard | SectionRecord] | pa.RecordBatch, set_ids: list[str]) -> int:
+        """
+        Delete every row of the SPLs in `set_ids`, then insert `records` in their place.
+
+        A label's section list can change between versions, so rows are swapped per SPL rather than matched one by one.
+        """
+        if self._table is not None and set_ids:
+            self._table.delete(_predicate(SplFilter(set_ids=set_ids)))
+        return self.add(records)
+
+    def embed(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        encode: Callable[[list[str]], np.ndarray] | None = None,
+    ) -> np.ndarray:
+        """
+        Vectors for `texts` in the table's vector format, served from the embedding cache where possible.
+
+        Cache misses go to `encode` (default: `self.encode`); the cache holds full model output, so one cache serves
+        every format. For callers that attach vectors themselves (see `medirag.index.pipeline`).
+        """
+        if encode is None:
+            encode = partial(self.encode, batch_size=batch_size)
+        vectors = encode(texts) if self.embed_cache is None else self.embed_cache.embed(texts, encode)
+        return self.vector_format.apply(vectors)
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Encode texts with the indexing embedder, exactly as Lance's embedding function would. Bypasses the embedding
+        cache.
+        """
+        model = MODELS.get(self.embed_model)
+        with METRICS.time("embed"):
+            # LanceDB's sentence-transformers function normalizes by default; match it.
+            vectors = model.encode(
+                texts,
+                batch_size=batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        METRICS.count("embed_calls")
+        METRICS.count("embed_texts", len(texts))
+        METRICS.count("embed_tokens", _token_count(model, texts))
+        return vectors
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        The query's full-dimension, normalized embedding, through the query cache if there is one.
+
+        Pass it back as `query_vector` to retrieve under the same query without encoding it again, e.g. after using it
+        for a semantic cache lookup.
+        """
+        return self.encode_queries([query])[0]
+
+    def encode_queries(self, queries: list[str], batch_size: int = 32) -> np.ndarray:
+        encode = partial(self._run_query_encoder, batch_size=batch_size)
+        return encode(queries) if self.query_cache is None else self.query_cache.encode(queries, encode)
+
+    async def aencode_query(self, query: str) -> np.ndarray:
+        """
+        `encode_query` on this indexer's encoder threads, leaving the event loop free.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._query_executor, self.encode_query, query)
+
+    def _encode_query(self, query: str) -> np.ndarray:
+        return self._encode_queries([query])[0]
+
+    def _encode_queries(self, queries: list[str], batch_size: int = 32) -> np.ndarray:
+        # Truncated to the table's dimension; Lance casts float32 queries to a float16 column itself. Encoding first
+        # means the format's model dimension is read off the query encoder, not a second load of the model.
+        vectors = self.encode_queries(queries, batch_size=batch_size)
+        return self.vector_format.truncate(vectors)
+
+    def _run_query_encoder(self, queries: list[str], batch_size: int = 32) -> np.ndarray:
+        # Queries are encoded on CPU: one short text doesn't need a GPU, and a search-only deploy never loads the
+        # model anywhere else. On a CPU-only node this is the same instance that embeds for indexing.
+        if self.query_batcher is not None:
+            return self.query_batcher.encode(queries)
+        encoder = MODELS.get(self.embed_model, "cpu")
+        return encoder.encode(queries, batch_size=batch_size, show_progress_bar=False, normalize_embeddings=True)
 
     def create_fts_index(self) -> None:
         """
@@ -140,23 +347,172 @@ class LanceIndexer:
             return
         self._table.create_fts_index("text", replace=True)
 
+    def create_scalar_indexes(self) -> None:
+        """
+        Build (or replace) the scalar indexes SplFilter relies on; see `medirag.index.filters.SCALAR_INDEXES`.
+        """
+        if self._table is None:
+            return
+        for column, config in SCALAR_INDEXES.items():
+            self._table.create_index(column, config=config, replace=True)
+
+    def create_vector_index(
+        self,
+        index_type: str = "IVF_HNSW_SQ",
+        num_partitions: int | None = None,
+        num_sub_vectors: int | None = None,
+    ) -> bool:
+        """
+        Build (or replace) an ANN index on `vector`. Returns False if the table is too small to bother.
+
+        `num_partitions` is the IVF list count (Lance default: about sqrt(rows)); `num_sub_vectors` only applies to
+        IVF_PQ and must divide the embedding dimension. The metric is L2, which retrieve() queries with; on the
+        normalized embeddings it ranks the same as cosine.
+        """
+        if index_type not in VECTOR_INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type {index_type!r}; expected one of {VECTOR_INDEX_TYPES}")
+        if self._table is None:
+            return False
+        rows = self._table.count_rows()
+        if rows < MIN_ROWS_FOR_VECTOR_INDEX:
+            logger.info(f"Skipping {index_type} index: {rows} rows is below {MIN_ROWS_FOR_VECTOR_INDEX}")
+            return False
+        self._table.create_index(
+            metric="l2",
+            index_type=cast(VectorIndexType, index_type),
+            num_partitions=num_partitions,
+            num_sub_vectors=num_sub_vectors if index_type == "IVF_PQ" else None,
+            replace=True,
+        )
+        return True
+
     def retrieve(
         self,
         query: str,
         top_k: int = 5,
         with_reranker: bool = False,
         hybrid: bool = False,
-        where: str | None = None,
+        where: str | SplFilter | None = None,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+        query_vector: np.ndarray | None = None,
     ) -> list[RetrievalHit]:
         """
         Vector (default) or hybrid (vector + BM25) retrieval.
 
-        `where` is a SQL filter (e.g. "is_patient_facing = true").
+        `where` is a SplFilter or a raw SQL filter (e.g. "is_patient_facing = true"); prefer SplFilter, which only
+        emits predicates the scalar indexes can answer. With an ANN index on the table, `nprobes` (IVF
+        partitions searched) and `refine_factor` (re-rank `top_k * refine_factor` candidates on full vectors) trade
+        latency for recall; they default to the values the indexer was created with. `query_vector`, from
+        `encode_query(query)`, skips encoding the query again.
+
+        `with_reranker` retrieves extra candidates and lets the indexer's reranker pick the `top_k`, whose scores are
+        then the reranker's (higher is better). That recovers precision lost to cheap ANN settings.
         """
         if self._table is None:
             return []
+        if query_vector is None:
+            query_vec = self._encode_query(query)
+        else:
+            query_vec = self.vector_format.truncate(query_vector)
+        fetch_k = self._fetch_k(top_k, with_reranker)
+        rows = self._search(query, query_vec, fetch_k, hybrid, where, nprobes, refine_factor, HIT_COLUMNS)
+        return self._rerank(query, _to_hits(rows), top_k, with_reranker)
 
-        query_vec = self._encode_query(query)
+    def retrieve_arrow(
+        self,
+        query: str,
+        top_k: int = 5,
+        hybrid: bool = False,
+        where: str | SplFilter | None = None,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+        query_vector: np.ndarray | None = None,
+        columns: Sequence[str] = HIT_COLUMNS,
+    ) -> pa.Table:
+        """
+        `retrieve`, returning the hits as an Arrow table of `columns` plus a float32 `score` column (distance for
+        vector search, relevance for hybrid) instead of RetrievalHits.
+
+        For callers that score or aggregate many hits (reranking, evaluation): only `columns` are read from the
+        table, and no per-hit Python objects are built.
+        """
+        if self._table is None:
+            return _empty_hits(columns)
+        if query_vector is None:
+            query_vec = self._encode_query(query)
+        else:
+            query_vec = self.vector_format.truncate(query_vector)
+        return self._search(query, query_vec, top_k, hybrid, where, nprobes, refine_factor, columns)
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 5,
+        with_reranker: bool = False,
+        hybrid: bool = False,
+        where: str | SplFilter | Sequence[str | SplFilter | None] | None = None,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+        batch_size: int = 32,
+        max_workers: int = 8,
+    ) -> list[list[RetrievalHit]]:
+        """
+        `retrieve` for many queries: one batched encoder pass, then the searches on up to `max_workers` threads.
+
+        `where` is one filter shared by every query, or a list with one filter (or None) per query. Returns each
+        query's hits, in query order.
+        """
+        queries = list(queries)
+        if isinstance(where, (str, SplFilter)) or where is None:
+            wheres = [where] * len(queries)
+        else:
+            wheres = list(where)
+            if len(wheres) != len(queries):
+                raise ValueError(f"got {len(wheres)} filters for {len(queries)} queries")
+        if self._table is None or not queries:
+            return [[] for _ in queries]
+
+        vectors = self._encode_queries(queries, batch_size=batch_size)
+        fetch_k = self._fetch_k(top_k, with_reranker)
+
+        def search(query: str, query_vec: np.ndarray, where: str | SplFilter | None) -> list[RetrievalHit]:
+            rows = self._search(query, query_vec, fetch_k, hybrid, where, nprobes, refine_factor, HIT_COLUMNS)
+            return self._rerank(query, _to_hits(rows), top_k, with_reranker)
+
+        # Lance releases the GIL while it searches, so threads overlap the searches themselves.
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries)), thread_name_prefix="retrieve") as pool:
+            futures = [pool.submit(search, q, vec, w) for q, vec, w in zip(queries, vectors, wheres)]
+            return [f.result() for f in futures]
+
+    def _fetch_k(self, top_k: int, with_reranker: bool) -> int:
+        if with_reranker and self.reranker is not None:
+            return self.reranker.candidates_for(top_k)
+        return top_k
+
+    def _rerank(self, query: str, hits: list[RetrievalHit], top_k: int, with_reranker: bool) -> list[RetrievalHit]:
+        if not with_reranker:
+            return hits
+        if self.reranker is None:
+            logger.debug("Reranker requested but none configured; returning retrieval order")
+            return hits
+        return self.reranker.rerank(query, hits, top_k)
+
+    def _search(
+        self,
+        query: str,
+        query_vec: np.ndarray,
+        top_k: int,
+        hybrid: bool,
+        where: str | SplFilter | None,
+        nprobes: int | None,
+        refine_factor: int | None,
+        columns: Sequence[str],
+    ) -> pa.Table:
+        if self._table is None:
+            return _empty_hits(columns)
+        if isinstance(where, SplFilter):
+            where = where.to_sql()
         if hybrid:
             # Hybrid: set vector and text explicitly so lancedb never invokes
             # its stored embedder (which can call `.cuda()` on CPU-only deploys).
@@ -165,27 +521,156 @@ class LanceIndexer:
             search = self._table.search(query_vec, query_type="vector")
         if where:
             search = search.where(where, prefilter=True)
-        results = search.limit(top_k).to_list()
-
-        hits = []
-        for r in results:
-            score = float(r.get("_relevance_score") or r.get("_distance") or 0.0)
-            hits.append(
-                RetrievalHit(
-                    text=r["text"],
-                    drug_name=r["drug_name"],
-                    set_id=r["set_id"],
-                    kind=r["kind"],
-                    loinc=r.get("loinc", ""),
-                    section_title=r.get("section_title", ""),
-                    score=score,
-                    is_patient_facing=bool(r.get("is_patient_facing", False)),
-                )
-            )
+        search = tune_search(search, nprobes or self.nprobes, refine_factor or self.refine_factor)
+        return _with_score(search.select(_projection(columns, hybrid)).limit(top_k).to_arrow())
+
+    async def _open_async_table(self) -> lancedb.AsyncTable:
+        table = self._async_table
+        if table is None:
+            async with self._async_table_lock:
+                if self._async_table is None:
+                    db = await lancedb.connect_async(self.db_path)
+                    self._async_table = await db.open_table(self.table_name)
+                table = self._async_table
+        return table
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        with_reranker: bool = False,
+        hybrid: bool = False,
+        where: str | SplFilter | None = None,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+        query_vector: np.ndarray | None = None,
+    ) -> list[RetrievalHit]:
+        """
+        `retrieve` for async callers, without blocking the event loop.
 
-        if with_reranker:
-            logger.debug("Reranker requested but not yet wired up; returning vector results")
-        return hits
+        The query is encoded on this indexer's dedicated encoder thread (unless `query_vector` is given) and searched
+        through LanceDB's async API, on a table handle opened on first use (it sees the table as of that moment, like
+        the sync handle does). Reranking, if asked for, runs on a worker thread.
+        """
+        if self._table is None:
+            return []
+        if query_vector is None:
+            query_vector = await self.aencode_query(query)
+        query_vec = self.vector_format.truncate(query_vector)
+        table = await self._open_async_table()
+
+        if isinstance(where, SplFilter):
+            where = where.to_sql()
+        # Prefilters are the async API's default.
+        vector_search = table.query().nearest_to(query_vec)
+        search: AsyncVectorQuery | AsyncHybridQuery = vector_search.nearest_to_text(query) if hybrid else vector_search
+        if where:
+            search = search.where(where)
+        search = tune_search(search, nprobes or self.nprobes, refine_factor or self.refine_factor)
+        search = search.select(_projection(HIT_COLUMNS, hybrid)).limit(self._fetch_k(top_k, with_reranker))
+        rows = await search.to_arrow()
+        hits = _to_hits(_with_score(rows))
+        if with_reranker and self.reranker is not None:
+            return await asyncio.to_thread(self._rerank, query, hits, top_k, with_reranker)
+        return self._rerank(query, hits, top_k, with_reranker)
+
+    def retrieve_for_drug(self, query: str, drug_name: str, top_k: int = 5, **kwargs) -> list[RetrievalHit]:
+        """
+        Search only the labels of one drug (exact `drug_name` match, as stored).
+        """
+        return self.retrieve(query, top_k=top_k, where=SplFilter(drug_names=[drug_name]), **kwargs)
+
+    def retrieve_for_ndc(self, query: str, ndc: str, top_k: int = 5, **kwargs) -> list[RetrievalHit]:
+        """
+        Search every row of the label(s) whose product card lists `ndc`.
+
+        NDCs live on product cards only, so this resolves them to set_ids first; both lookups are index-only.
+        """
+        if self._table is None:
+            return []
+        cards = (
+            self._table.search()
+            .where(_predicate(SplFilter(ndcs=[ndc], kind="product_card")))
+            .select(["set_id"])
+            .limit(None)
+            .to_arrow()
+        )
+        set_ids = sorted(set(cards.column("set_id").to_pylist()))
+        if not set_ids:
+            return []
+        return self.retrieve(query, top_k=top_k, where=SplFilter(set_ids=set_ids), **kwargs)
+
+    def retrieve_patient_facing(
+        self, query: str, set_id: str | None = None, top_k: int = 5, **kwargs
+    ) -> list[RetrievalHit]:
+        """
+        Search patient-facing sections only (patient info, medication guides), optionally within one label.
+        """
+        where = SplFilter(set_ids=[set_id] if set_id else (), patient_facing=True)
+        return self.retrieve(query, top_k=top_k, where=where, **kwargs)
+
+
+def _projection(columns: Sequence[str], hybrid: bool) -> list[str]:
+    # Vector searches name `_distance` explicitly, as Lance will soon require. Hybrid searches can't: the projection
+    # is shared with the full-text sub-query, and LanceDB adds both scores itself.
+    return list(columns) if hybrid else [*columns, "_distance"]
+
+
+def _with_score(rows: pa.Table) -> pa.Table:
+    """
+    Lance's `_relevance_score` (hybrid) or `_distance` (vector) as one float32 `score` column, with the other
+    underscore columns Lance adds dropped.
+    """
+    score = next((rows.column(c) for c in ("_relevance_score", "_distance") if c in rows.column_names), None)
+    score = score.cast(pa.float32()) if score is not None else pa.array(np.zeros(rows.num_rows, dtype=np.float32))
+    rows = rows.drop_columns([c for c in rows.column_names if c.startswith("_")])
+    return rows.append_column("score", score)
+
+
+def _empty_hits(columns: Sequence[str]) -> pa.Table:
+    fields = [ROW_SCHEMA.field(c) if c in ROW_SCHEMA.names else pa.field(c, pa.null()) for c in columns]
+    return pa.schema([*fields, pa.field("score", pa.float32())]).empty_table()
+
+
+def _to_hits(rows: pa.Table) -> list[RetrievalHit]:
+    """
+    RetrievalHits from a `_with_score` table of HIT_COLUMNS, column by column rather than through per-row dicts.
+    """
+    columns = [rows.column(name).to_pylist() for name in (*HIT_COLUMNS, "score")]
+    return [
+        RetrievalHit(
+            text=text,
+            drug_name=drug_name,
+            set_id=set_id,
+            kind=kind,
+            loinc=loinc or "",
+            section_title=section_title or "",
+            score=score or 0.0,
+            is_patient_facing=bool(is_patient_facing),
+        )
+        for text, drug_name, set_id, kind, loinc, section_title, is_patient_facing, score in zip(*columns)
+    ]
+
+
+def _token_count(model: SentenceTransformer, texts: list[str]) -> int:
+    """
+    Tokens the model actually sees for `texts`, i.e. after truncation to its max sequence length.
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None or not texts:
+        return 0
+    encoded = tokenizer(texts, truncation=True, max_length=model.max_seq_length, add_special_tokens=True)
+    return sum(len(ids) for ids in encoded["input_ids"])
+
+
+def _predicate(spl_filter: SplFilter) -> str:
+    """
+    SQL for a filter the caller knows sets at least one condition.
+    """
+    sql = spl_filter.to_sql()
+    if sql is None:
+        raise ValueError("SplFilter sets no condition")
+    return sql
 
 
 def _list_table_names(db) -> list[str]:
@@ -198,44 +683,12 @@ def _list_table_names(db) -> list[str]:
     return list(result)
 
 
-def _record_to_row(r: ProductCard | SectionRecord) -> dict:
-    """
-    Flatten a dataclass record into the LanceDB row dict.
-    """
-    if isinstance(r, ProductCard):
-        return {
-            "set_id": r.set_id,
-            "version": r.version,
-            "drug_name": r.drug_name,
-            "kind": r.kind,
-            "text": r.text,
-            "loinc": "",
-            "section_title": "",
-            "is_patient_facing": False,
-            "generic_name": r.generic_name or "",
-            "manufacturer": r.manufacturer or "",
-            "dosage_form": r.dosage_form or "",
-            "route": r.route or "",
-            "active_ingredient_uniis": r.active_ingredient_uniis,
-            "active_ingredient_names": r.active_ingredient_names,
-            "inactive_ingredient_names": r.inactive_ingredients,
-            "ndcs": r.ndcs,
-        }
-    return {
-        "set_id": r.set_id,
-        "version": r.version,
-        "drug_name": r.drug_name,
-        "kind": r.kind,
-        "text": r.text,
-        "loinc": r.loinc,
-        "section_title": r.section_title,
-        "is_patient_facing": r.is_patient_facing,
-        "generic_name": "",
-        "manufacturer": "",
-        "dosage_form": "",
-        "route": "",
-        "active_ingredient_uniis": [],
-        "active_ingredient_names": [],
-        "inactive_ingredient_names": [],
-        "ndcs": [],
-    }
+def tune_search(search, nprobes: int | None, refine_factor: int | None):
+    """
+    Apply ANN query knobs to a vector or hybrid search builder.
+    """
+    if nprobes:
+        search = search.nprobes(nprobes)
+    if refine_factor:
+        search = search.refine_factor(refine_factor)
+    return search
@@ -0,0 +1,333 @@
+"""
+Three-stage indexing pipeline: parse → embed → write, overlapped on threads.
+
+`LanceIndexer.add` embeds inside `table.add()`, so the default runner parses, embeds and writes strictly in turn. Here
+each stage runs on its own thread with a bounded queue in between: the parse stage (the zip reader, optionally feeding
+a process pool) fills RecordBatches, the embed stage runs the SentenceTransformer on them in length-sorted chunks, and
+the writer appends batches that already carry vectors so Lance never calls its embedder. On a CPU box embedding
+dominates, and this hides parsing and Lance I/O behind it. Torch and Lance both release the GIL in their hot loops.
+
+The sequential path's stages live here too: `stream_records` reads a zip's SPLs and `insert_records` adds them batch
+by batch. The runner uses them in-process and the sharded build's workers use them on their slice of each zip.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, Full, Queue
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pyarrow as pa
+from loguru import logger
+
+from medirag.core.columnar import RecordBatchBuilder, with_vectors
+from medirag.core.metrics import METRICS
+from medirag.core.parse_cache import ParseCache
+from medirag.core.reader import ProductCard, SectionRecord, parse_spl_zip_members
+from medirag.index.lance import LanceIndexer
+
+
+_DONE = object()
+
+# on_commit(member, spls, records): called after each insert batch is committed to Lance.
+CommitHook = Callable[[str, int, int], None]
+
+
+@dataclass
+class Chunk:
+    """
+    One write batch moving through the pipeline.
+    """
+
+    rows: pa.RecordBatch
+    spls: int  # SPLs whose records are all in `rows`
+    last_member: str = ""  # archive member of the last of those SPLs
+
+
+def stream_records(
+    zip_path: Path,
+    limit: int | None = None,
+    engine: str = "iterparse",
+    workers: int = 1,
+    ordered: bool = True,
+    parse_cache: ParseCache | None = None,
+    start_after: str | None = None,
+    shard: tuple[int, int] | None = None,
+) -> Iterable[tuple[str, list[ProductCard | SectionRecord]]]:
+    """
+    Yield (member, records) for each SPL in the zip (or in one `shard` of it), optionally capped.
+    """
+    n = 0
+    for member, records in parse_spl_zip_members(
+        zip_path,
+        engine=engine,
+        workers=workers,
+        ordered=ordered,
+        cache=parse_cache,
+        start_after=start_after,
+        shard=shard,
+    ):
+        if not records:
+            continue
+        yield member, records
+        n += 1
+        if limit is not None and n >= limit:
+            logger.info(f"Reached --limit {limit}, stopping for this part")
+            return
+
+
+def insert_records(
+    stream: Iterable[tuple[str, list[ProductCard | SectionRecord]]],
+    indexer: LanceIndexer,
+    batch_size: int,
+    columnar: bool,
+    on_commit: CommitHook | None = None,
+) -> tuple[int, int]:
+    """
+    Insert records batch by batch, embedding each batch as it is added. Returns (spl_count, record_count).
+
+    `on_commit(member, spls, records)` is called after each add with the last SPL member in the batch.
+    """
+    spl_count = 0
+    record_count = 0
+    batch: list[ProductCard | SectionRecord] = []
+    batch_spls = 0
+    member = ""
+    columns = RecordBatchBuilder() if columnar else None
+
+    def flush() -> int:
+        nonlocal batch, batch_spls
+        n = indexer.add(columns.finish() if columns is not None else batch)
+        METRICS.count("batches")
+        METRICS.count("spls", batch_spls)
+        METRICS.count("records", n)
+        if on_commit is not None:
+            on_commit(member, batch_spls, n)
+        batch = []
+        batch_spls = 0
+        return n
+
+    for member, records in stream:
+        spl_count += 1
+        batch_spls += 1
+        if columns is not None:
+            columns.extend(records)
+            pending = len(columns)
+        else:
+            batch.extend(records)
+            pending = len(batch)
+        if pending >= batch_size:
+            n = flush()
+            record_count += n
+            logger.info(f"  inserted batch ({n} records) — totals: {spl_count} SPLs, {record_count} records")
+
+    if batch_spls:
+        record_count += flush()
+    return spl_count, record_count
+
+
+def chunk_records(stream: Iterable[tuple[str, list[ProductCard | SectionRecord]]], batch_size: int) -> Iterator[Chunk]:
+    """
+    Group (member, records) pairs into RecordBatches of at least `batch_size` rows, never splitting an SPL.
+    """
+    builder = RecordBatchBuilder()
+    spls = 0
+    member = ""
+    for member, records in stream:
+        builder.extend(records)
+        spls += 1
+        if len(builder) >= batch_size:
+            yield Chunk(rows=builder.finish(), spls=spls, last_member=member)
+            spls = 0
+    if len(builder):
+        yield Chunk(rows=builder.finish(), spls=spls, last_member=member)
+
+
+class BatchSizeTuner:
+    """
+    Hill-climbs the encode batch size on measured throughput.
+
+    Throughput is characters per second, so length-sorted chunks of short and long texts compare fairly. Each size is
+    timed over `probe_calls` encodes; the size doubles while that improves throughput by at least `min_gain`, and
+    settles on the best size seen as soon as it doesn't.
+    """
+
+    def __init__(self, start: int = 16, max_size: int = 256, probe_calls: int = 3, min_gain: float = 0.05):
+        self.size = start
+        self.max_size = max_size
+        self.probe_calls = probe_calls
+        self.min_gain = min_gain
+        self.settled = False
+        self._best: tuple[float, int] = (0.0, start)
+        self._chars = 0
+        self._seconds = 0.0
+        self._calls = 0
+
+    def record(self, chars: int, seconds: float) -> None:
+        if self.settled:
+            return
+        self._chars += chars
+        self._seconds += seconds
+        self._calls += 1
+        if self._calls < self.probe_calls:
+            return
+
+        throughput = self._chars / max(self._seconds, 1e-9)
+        best_throughput, best_size = self._best
+        self._chars, self._seconds, self._calls = 0, 0.0, 0
+        if throughput >= best_throughput * (1 + self.min_gain) and self.size < self.max_size:
+            self._best = (throughput, self.size)
+            self.size = min(self.size * 2, self.max_size)
+            return
+        if throughput > best_throughput:
+            self._best = (throughput, self.size)
+        self.size = self._best[1]
+        self.settled = True
+        logger.info(f"Embed batch size settled at {self.size} ({self._best[0]:.0f} chars/s)")
+
+
+class BatchEmbedder:
+    """
+    Encodes a write batch's texts in length-sorted chunks to keep padding low.
+
+    Only texts missing from the indexer's embedding cache (if any) reach the encoder.
+
+    With `batch_size=None` the chunk size is autotuned by BatchSizeTuner.
+    """
+
+    def __init__(self, indexer: LanceIndexer, batch_size: int | None = None):
+        self.indexer = indexer
+        self.batch_size = batch_size
+        self.tuner = BatchSizeTuner() if batch_size is None else None
+
+    def _chunk_size(self) -> int:
+        if self.tuner is not None:
+            return self.tuner.size
+        return self.batch_size  # type: ignore[return-value]
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        return self.indexer.embed(texts, encode=self._encode_sorted)
+
+    def _encode_sorted(self, texts: list[str]) -> np.ndarray:
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        order = np.argsort(lengths, kind="stable")
+        out: np.ndarray | None = None
+        start = 0
+        while start < len(texts):
+            idx = order[start : start + self._chunk_size()]
+            t0 = time.perf_counter()
+            vecs = self.indexer.encode([texts[i] for i in idx], batch_size=len(idx))
+            if self.tuner is not None:
+                self.tuner.record(int(lengths[idx].sum()), time.perf_counter() - t0)
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+            start += len(idx)
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+
+def _put(queue: Queue, item: object, stop: threading.Event) -> bool:
+    """
+    Blocking put that gives up once the pipeline is stopping. Returns False if it gave up.
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _get(queue: Queue, stop: threading.Event) -> object:
+    while not stop.is_set():
+        try:
+            return queue.get(timeout=0.1)
+        except Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(
+    chunks: Iterable[Chunk],
+    indexer: LanceIndexer,
+    embedder: BatchEmbedder,
+    queue_size: int = 2,
+    on_write: Callable[[Chunk], None] | None = None,
+) -> tuple[int, int]:
+    """
+    Drive `chunks` through embed and write stages; the calling thread does the writing.
+
+    At most `queue_size` batches wait between stages. An exception in any stage stops the others and is re-raised
+    here. `on_write` is called after each batch is committed. Returns (spl_count, record_count).
+    """
+    to_embed: Queue = Queue(maxsize=queue_size)
+    to_write: Queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: list[BaseException] = []
+
+    def parse_stage() -> None:
+        try:
+            for chunk in chunks:
+                METRICS.gauge("queue.to_embed", to_embed.qsize())
+                if not _put(to_embed, chunk, stop):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            _put(to_embed, _DONE, stop)
+
+    def embed_stage() -> None:
+        try:
+            while (chunk := _get(to_embed, stop)) is not _DONE:
+                assert isinstance(chunk, Chunk)
+                vectors = embedder(chunk.rows.column("text").to_pylist())
+                chunk.rows = with_vectors(chunk.rows, vectors)
+                METRICS.gauge("queue.to_write", to_write.qsize())
+                if not _put(to_write, chunk, stop):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(to_write, _DONE, stop)
+
+    threads = [
+        threading.Thread(target=parse_stage, name="medirag-parse", daemon=True),
+        threading.Thread(target=embed_stage, name="medirag-embed", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    spl_count = 0
+    record_count = 0
+    try:
+        while (chunk := _get(to_write, stop)) is not _DONE:
+            assert isinstance(chunk, Chunk)
+            n = indexer.add(chunk.rows)
+            record_count += n
+            spl_count += chunk.spls
+            METRICS.count("batches")
+            METRICS.count("spls", chunk.spls)
+            METRICS.count("records", n)
+            logger.info(
+                f"  inserted batch ({chunk.rows.num_rows} records) — totals: {spl_count} SPLs, {record_count} records"
+            )
+            if on_write is not None:
+                on_write(chunk)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return spl_count, record_count
@@ -0,0 +1,162 @@
+"""
+Query embedding cache: skips the encoder for questions `LanceIndexer` has embedded recently.
+
+Popular questions come back again and again, and one request can retrieve the same text more than once; on a
+CPU-only node each encode is a PubMedBERT forward pass before the first token can stream. QueryEmbeddingCache is an
+in-memory LRU of up to `max_entries` vectors, each dropped `ttl` seconds after it was encoded. Keys are the model name
+plus the query with Unicode and whitespace normalized, which the tokenizer would ignore anyway.
+
+With `persistent` (an `EmbeddingCache`), vectors also go to disk, so a restarted replica starts warm: a memory miss
+checks the disk tier before encoding. The disk tier keeps vectors until its ring buffer wraps; TTL only bounds the
+memory tier.
+
+Both tiers hold full model output; `LanceIndexer` truncates to the table's vector format after lookup.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+from loguru import logger
+
+from medirag.index.embed_cache import EmbeddingCache
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe (model, normalized query) → vector LRU with a TTL and an optional on-disk tier.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_entries: int = 10_000,
+        ttl: float | None = 24 * 3600.0,
+        persistent: EmbeddingCache | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if persistent is not None and persistent.model != model:
+            raise ValueError(f"Persistent cache holds {persistent.model} vectors, not {model}")
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent = persistent
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()  # key → (expires at, vector)
+        self.hits = 0  # served from memory
+        self.disk_hits = 0  # served from the persistent tier
+        self.misses = 0  # sent to the encoder
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self),
+        }
+
+    def get(self, query: str) -> np.ndarray | None:
+        """
+        The cached vector for `query`, or None. Doesn't count as a hit or a miss.
+        """
+        with self._lock:
+            return self._lookup(normalize_query(query))
+
+    def put(self, query: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._store(normalize_query(query), np.asarray(vector, dtype=np.float32))
+
+    def encode(self, queries: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """
+        Vectors for `queries`, calling `encode` once for the distinct queries found in neither tier.
+        """
+        keys = [normalize_query(q) for q in queries]
+        found: dict[str, np.ndarray] = {}
+        missing: dict[str, str] = {}  # key → first query with that key
+        with self._lock:
+            for key, query in zip(keys, queries):
+                if key in found or key in missing:
+                    self.hits += 1  # a repeat within the batch, as EmbeddingCache counts it
+                    continue
+                entry = self._entries.get(key)
+                in_memory = entry is not None and entry[0] > self._clock()
+                cached = self._lookup(key)
+                if cached is None:
+                    missing[key] = query
+                else:
+                    found[key] = cached
+                    if in_memory:
+                        self.hits += 1
+                    else:
+                        self.disk_hits += 1
+            self.misses += len(missing)
+
+        # Encode outside the lock: a concurrent miss on the same query costs one extra encode, not a stall.
+        if missing:
+            vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for key, vec in zip(missing, vectors):
+                    self._store(key, vec)
+                    found[key] = vec
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def clear(self) -> None:
+        """
+        Empty the memory tier; the persistent tier is left alone.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        total = self.hits + self.disk_hits + self.misses
+        if total:
+            logger.info(
+                f"Query embedding cache: {self.hits} memory + {self.disk_hits} disk hits of {total} "
+                f"({self.hit_rate:.0%})"
+            )
+        if self.persistent is not None:
+            self.persistent.close()
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, vec = entry
+            if expires > self._clock():
+                self._entries.move_to_end(key)
+                return vec
+            del self._entries[key]
+        if self.persistent is not None:
+            stored = self.persistent.get(key)
+            if stored is not None:
+                self._remember(key, stored)
+                return stored
+        return None
+
+    def _store(self, key: str, vector: np.ndarray) -> None:
+        self._remember(key, vector)
+        if self.persistent is not None:
+            self.persistent.put(key, vector)
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        expires = self._clock() + self.ttl if self.ttl is not None else float("inf")
+        self._entries[key] = (expires, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,154 @@
+"""
+Latency-budgeted cross-encoder reranking for `LanceIndexer.retrieve(with_reranker=True)`.
+
+A bi-encoder ranks passages by one vector each, so the right section often sits just below the cut, and finding
+it by vector search alone means exhaustive search (high `nprobes`, `refine_factor`). Instead the indexer retrieves
+`top_k * overfetch` candidates with cheap ANN settings, and a cross-encoder, which reads the query and passage
+together, rescores them and keeps the best `top_k`.
+
+Cross-encoder cost grows with the candidate count, so the reranker works to a per-query budget:
+
+- It keeps a running estimate of the cost of one (query, passage) pair and, before each query, caps the new pairs
+  it scores at what fits in `budget_ms`. It never scores fewer than `top_k`.
+- Pairs are scored in batches of `batch_size`. Once at least `top_k` candidates have a score, scoring stops at the
+  first batch boundary past the budget. Candidates left unscored rank after the scored ones, in retrieval order,
+  with a score of `UNSCORED` so they can't be mistaken for cross-encoder scores.
+- Scores are cached per (normalized query, passage text) in an LRU, because a cross-encoder score depends on
+  nothing else. Cached pairs cost nothing against the budget, so a repeated question can rerank every candidate.
+
+`stats()` reports cache hits and histograms of candidates scored and rerank latency.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from medirag.core.metrics import Histogram
+from medirag.core.models import MODELS
+from medirag.index.query_cache import normalize_query
+
+if TYPE_CHECKING:
+    from medirag.index.lance import RetrievalHit
+
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+UNSCORED = float("-inf")  # `score` of a candidate the budget left unscored
+
+CANDIDATE_BOUNDS = (5, 10, 20, 40, 80, 160)
+LATENCY_MS_BOUNDS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class CrossEncoderReranker:
+    """
+    Thread-safe reranker over a cross-encoder from the model registry, loaded on the first rerank.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL,
+        device: str | None = "cpu",
+        overfetch: int = 4,
+        budget_ms: float | None = 150.0,
+        batch_size: int = 16,
+        cache_size: int = 50_000,
+    ):
+        if overfetch < 1:
+            raise ValueError(f"overfetch must be at least 1, got {overfetch}")
+        self.model_name = model_name
+        self.device = device
+        self.overfetch = overfetch
+        self.budget_ms = budget_ms  # None: score every candidate
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._scores: OrderedDict[tuple[str, bytes], float] = OrderedDict()
+        self._ms_per_pair: float | None = None  # moving average; None until the first batch is timed
+        self.hits = 0
+        self.misses = 0
+        self.candidates = Histogram(CANDIDATE_BOUNDS)
+        self.latency_ms = Histogram(LATENCY_MS_BOUNDS)
+
+    def candidates_for(self, top_k: int) -> int:
+        """
+        How many hits to retrieve for a final `top_k`.
+        """
+        return top_k * self.overfetch
+
+    def rerank(self, query: str, hits: list["RetrievalHit"], top_k: int) -> list["RetrievalHit"]:
+        """
+        The best `top_k` of `hits` (in retrieval order) by cross-encoder score, which replaces each hit's `score`
+        (higher is better; `UNSCORED` for a hit the budget left unscored).
+        """
+        if not hits:
+            return []
+        model = MODELS.cross_encoder(self.model_name, self.device)  # loads outside the timed section
+        t0 = time.perf_counter()
+        qkey = normalize_query(query)
+        keys = [(qkey, hashlib.blake2b(h.text.encode(), digest_size=16).digest()) for h in hits]
+
+        scores: list[float | None] = [None] * len(hits)
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached_score = self._scores.get(key)
+                if cached_score is not None:
+                    self._scores.move_to_end(key)
+                    scores[i] = cached_score
+            missing = [i for i, s in enumerate(scores) if s is None]
+            cached = len(hits) - len(missing)
+            self.hits += cached
+            missing = missing[: self._affordable(top_k, cached)]
+            self.misses += len(missing)
+
+        deadline = t0 + self.budget_ms / 1000 if self.budget_ms is not None else None
+        for start in range(0, len(missing), self.batch_size):
+            # The budget only cuts scoring short once top_k candidates have a score.
+            if cached + start >= top_k and deadline is not None and time.perf_counter() > deadline:
+                break
+            batch = missing[start : start + self.batch_size]
+            t_batch = time.perf_counter()
+            predicted = model.predict(
+                [(query, hits[i].text) for i in batch], batch_size=len(batch), show_progress_bar=False
+            )
+            self._observe_cost((time.perf_counter() - t_batch) * 1000 / len(batch))
+            with self._lock:
+                for i, score in zip(batch, np.asarray(predicted, dtype=np.float32).tolist()):
+                    scores[i] = score
+                    self._scores[keys[i]] = score
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+
+        scored = sorted(((s, i) for i, s in enumerate(scores) if s is not None), key=lambda pair: -pair[0])
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        self.candidates.observe(len(scored))
+        self.latency_ms.observe((time.perf_counter() - t0) * 1000)
+        ranked = [replace(hits[i], score=s) for s, i in scored] + [replace(hits[i], score=UNSCORED) for i in unscored]
+        return ranked[:top_k]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / total if total else 0.0,
+            "ms_per_pair": self._ms_per_pair,
+            "candidates": self.candidates.snapshot(),
+            "latency_ms": self.latency_ms.snapshot(),
+        }
+
+    def _affordable(self, top_k: int, cached: int) -> int:
+        # New pairs that fit the budget at the current cost estimate, topping the candidates up to at least top_k.
+        if self.budget_ms is None or self._ms_per_pair is None:
+            return self.candidates_for(top_k)
+        return max(int(self.budget_ms / max(self._ms_per_pair, 1e-3)), top_k - cached)
+
+    def _observe_cost(self, ms_per_pair: float) -> None:
+        with self._lock:
+            if self._ms_per_pair is None:
+                self._ms_per_pair = ms_per_pair
+            else:
+                self._ms_per_pair = 0.8 * self._ms_per_pair + 0.2 * ms_per_pair
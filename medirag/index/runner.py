@@ -2,8 +2,9 @@
 Build a LanceDB index from DailyMed SPL bundles.
 
 Streams one part at a time, batches records, deletes the source zip after each
-part so the peak disk stays small. Publishing to Hugging Face is a separate step
-— see `medirag.index.publisher`.
+part so the peak disk stays small. The next part downloads in the background
+while the current one is indexed (see `medirag.core.download`). Publishing to
+Hugging Face is a separate step — see `medirag.index.publisher`.
 
 Usage examples:
     # Index one local zip into ./lance_db
@@ -14,20 +15,75 @@ Usage examples:
 
     # Limit each part to N SPLs (smoke test)
     uv run python -m medirag.index.runner --source part1.zip --db ./lance_db --limit 50
+
+    # Parse with 16 worker processes
+    uv run python -m medirag.index.runner --all --db ./lance_db --workers 16
+
+    # Keep parsed SPLs in a Parquet cache; a rerun only parses new or changed labels
+    uv run python -m medirag.index.runner --all --db ./lance_db --parse-cache ./parse_cache
+
+    # Reuse vectors for texts embedded by an earlier build
+    uv run python -m medirag.index.runner --all --db ./lance_db --embed-cache ./embed_cache
+
+    # Build an IVF_PQ vector index instead of the default IVF_HNSW_SQ (see medirag.index.ann_report to compare)
+    uv run python -m medirag.index.runner --all --db ./lance_db --vector-index IVF_PQ --num-partitions 1024 \\
+        --num-sub-vectors 96
+
+    # Pick up an interrupted build where its last committed batch left off
+    uv run python -m medirag.index.runner --all --db ./lance_db --resume
+
+    # Fold DailyMed update bundles (oldest first) into an existing index; its indexes are updated, not rebuilt
+    uv run python -m medirag.index.runner --db ./lance_db --daily-update 2026-10-16 --daily-update 2026-10-17
+    uv run python -m medirag.index.runner --db ./lance_db --delta --source dm_spl_weekly_update_10052026_10112026.zip
+
+    # Re-index single labels, read straight from their zips through a catalog (see medirag.core.catalog)
+    uv run python -m medirag.index.runner --db ./lance_db --catalog spl_catalog.parquet \\
+        --set-id BE27854A-A805-4300-9729-ACCD1B7F226F
+
+    # Overlap parsing, embedding and Lance writes on separate threads
+    uv run python -m medirag.index.runner --all --db ./lance_db --workers 8 --pipeline
+
+    # Half-size index: float16 vectors (check recall first with medirag.index.vector_bench)
+    uv run python -m medirag.index.runner --all --db ./lance_db --vector-format float16
+
+    # Embed in 8 worker processes, each on its own slice of every part; one commit at the end
+    uv run python -m medirag.index.runner --all --db ./lance_db --shards 8
+
+    # Per-stage timings, byte/SPL/record/token counts and queue depths: logged every minute, kept as JSON
+    uv run python -m medirag.index.runner --all --db ./lance_db --metrics build_metrics.json --progress-every 60
 """
 
 import argparse
 import sys
 import tempfile
 import time
+from datetime import date, timedelta
+from functools import partial
 from pathlib import Path
-from typing import Iterable
 
-import requests
 from loguru import logger
 
-from medirag.core.reader import ProductCard, SectionRecord, parse_spl_zip
-from medirag.index.lance import LanceIndexer
+from medirag.core.download import Downloader, prefetch
+from medirag.core.metrics import METRICS, MetricsReporter
+from medirag.core.parse_cache import ParseCache
+from medirag.core.catalog import SplCatalog
+from medirag.core.reader import ENGINES, ProductCard, SectionRecord, parse_spl_by_set_id
+from medirag.index.checkpoint import Checkpoint, checkpoint_path, rollback
+from medirag.index.delta import apply_updates, daily_update_url
+from medirag.index.embed_cache import EmbeddingCache
+from medirag.index.finalize import build_indexes, existing_vector_index, finalize, optimize
+from medirag.index.lance import EMBED_DIM, EMBED_MODEL, VECTOR_INDEX_TYPES, LanceIndexer
+from medirag.index.pipeline import (
+    BatchEmbedder,
+    Chunk,
+    CommitHook,
+    chunk_records,
+    insert_records,
+    run_pipeline,
+    stream_records,
+)
+from medirag.index.sharded import ShardedBuild
+from medirag.index.vector_format import VectorFormat
 
 
 DAILYMED_BASE = "https://dailymed-data.nlm.nih.gov/public-release-files"
@@ -38,82 +94,94 @@ def _is_url(source: str) -> bool:
     return source.startswith("http://") or source.startswith("https://")
 
 
-def _download(url: str, dest: Path) -> Path:
-    logger.info(f"Downloading {url} → {dest}")
-    t0 = time.time()
-    with requests.get(url, stream=True, timeout=60) as r:
-        r.raise_for_status()
-        total = int(r.headers.get("Content-Length", 0))
-        written = 0
-        with open(dest, "wb") as f:
-            for chunk in r.iter_content(chunk_size=1 << 20):  # 1 MiB
-                if chunk:
-                    f.write(chunk)
-                    written += len(chunk)
-        if total and written != total:
-            logger.warning(f"download size mismatch: expected {total}, got {written}")
-    logger.info(f"Downloaded {written / 1e6:.1f} MB in {time.time() - t0:.1f}s")
-    return dest
-
-
-def _stream_records(zip_path: Path, limit: int | None = None) -> Iterable[list[ProductCard | SectionRecord]]:
+def _fetch_part(source: str, work_dir: Path, downloader: Downloader) -> tuple[Path, bool]:
     """
-    Yield record-lists for each SPL in the zip, optionally capped.
+    Local zip for `source`, downloading it into `work_dir` if it is a URL. Returns (zip_path, downloaded).
     """
-    n = 0
-    for records in parse_spl_zip(zip_path):
-        if not records:
-            continue
-        yield records
-        n += 1
-        if limit is not None and n >= limit:
-            logger.info(f"Reached --limit {limit}, stopping for this part")
-            return
+    if _is_url(source):
+        return downloader.fetch(source, work_dir / Path(source).name), True
+    zip_path = Path(source)
+    if not zip_path.exists():
+        raise FileNotFoundError(zip_path)
+    return zip_path, False
+
+
+def _reindex_set_ids(
+    catalog: SplCatalog, set_ids: list[str], indexer: LanceIndexer, engine: str = "iterparse"
+) -> tuple[int, int]:
+    """
+    Re-parse the newest cataloged version of each SPL in `set_ids` and swap it into the table.
+
+    Returns (spl_count, record_count).
+    """
+    records: list[ProductCard | SectionRecord] = []
+    for set_id in set_ids:
+        records.extend(parse_spl_by_set_id(catalog, set_id, engine=engine))
+    return len(set_ids), indexer.replace_spls(records, set_ids)
 
 
 def _index_part(
-    source: str,
+    zip_path: Path,
     indexer: LanceIndexer,
     batch_size: int,
     limit: int | None,
     keep_zip: bool,
-    work_dir: Path,
+    downloaded: bool,
+    engine: str = "iterparse",
+    workers: int = 1,
+    ordered: bool = True,
+    parse_cache: ParseCache | None = None,
+    columnar: bool = False,
+    pipeline: bool = False,
+    embed_batch_size: int | None = None,
+    delta: bool = False,
+    start_after: str | None = None,
+    on_commit: CommitHook | None = None,
+    sharded: ShardedBuild | None = None,
 ) -> tuple[int, int]:
     """
-    Process one source (URL or local zip).
+    Process one local zip; `downloaded` marks a fetched copy, deleted afterwards unless `keep_zip`.
+
+    With `delta`, the source is an update bundle whose SPLs replace older indexed versions of the same labels. With
+    `sharded`, the zip is embedded by its shard workers into staging tables, committed later by the caller.
+    `start_after` and `on_commit` carry checkpoint state: see `medirag.index.checkpoint`.
 
     Returns (spl_count, record_count).
     """
-    if _is_url(source):
-        zip_path = work_dir / Path(source).name
-        if not zip_path.exists():
-            _download(source, zip_path)
-        else:
-            logger.info(f"Using cached download {zip_path}")
-        downloaded = True
+    if sharded is not None:
+        logger.info(f"Parsing {zip_path} on {len(sharded.table_names)} shard workers")
+        spl_count, record_count = sharded.index_part(zip_path)
     else:
-        zip_path = Path(source)
-        if not zip_path.exists():
-            raise FileNotFoundError(zip_path)
-        downloaded = False
-
-    spl_count = 0
-    record_count = 0
-    batch: list[ProductCard | SectionRecord] = []
-
-    logger.info(f"Parsing {zip_path}")
-    for records in _stream_records(zip_path, limit=limit):
-        spl_count += 1
-        batch.extend(records)
-        if len(batch) >= batch_size:
-            indexer.add(batch)
-            record_count += len(batch)
-            logger.info(f"  inserted batch ({len(batch)} records) — totals: {spl_count} SPLs, {record_count} records")
-            batch = []
-
-    if batch:
-        indexer.add(batch)
-        record_count += len(batch)
+        logger.info(f"Parsing {zip_path} ({workers} worker{'s' if workers > 1 else ''})")
+        if start_after is not None:
+            logger.info(f"Resuming after {start_after}")
+        stream = stream_records(
+            zip_path,
+            limit=limit,
+            engine=engine,
+            workers=workers,
+            ordered=ordered,
+            parse_cache=parse_cache,
+            start_after=start_after,
+        )
+        if delta:
+            stats = apply_updates(stream, indexer, batch_size, on_commit=on_commit)
+            spl_count, record_count = stats.added + stats.updated + stats.unchanged, stats.records
+            logger.info(
+                f"Applied {zip_path.name}: {stats.added} added, {stats.updated} updated, {stats.unchanged} unchanged"
+            )
+        elif pipeline:
+            embedder = BatchEmbedder(indexer, batch_size=embed_batch_size)
+            on_write = None
+            if on_commit is not None:
+
+                def on_write(chunk: Chunk) -> None:
+                    on_commit(chunk.last_member, chunk.spls, chunk.rows.num_rows)
+
+            chunks = chunk_records(stream, batch_size)
+            spl_count, record_count = run_pipeline(chunks, indexer, embedder, on_write=on_write)
+        else:
+            spl_count, record_count = insert_records(stream, indexer, batch_size, columnar, on_commit=on_commit)
 
     logger.info(f"Finished {zip_path.name}: {spl_count} SPLs, {record_count} records")
 
@@ -129,24 +197,214 @@ def main(argv: list[str] | None = None) -> int:
     src = parser.add_mutually_exclusive_group(required=True)
     src.add_argument("--source", action="append", help="URL or local path to a DailyMed zip (repeatable)")
     src.add_argument("--all", action="store_true", help="Index all 6 DailyMed parts from official URLs")
+    src.add_argument(
+        "--set-id",
+        action="append",
+        help="Re-index just this SPL, read from its zip through --catalog (repeatable)",
+    )
+    src.add_argument(
+        "--daily-update",
+        action="append",
+        type=date.fromisoformat,
+        metavar="YYYY-MM-DD",
+        help="Apply the DailyMed daily update bundle for this date (repeatable; implies --delta)",
+    )
 
     parser.add_argument("--db", required=True, help="LanceDB directory")
     parser.add_argument("--table", default="spl", help="Table name (default: spl)")
     parser.add_argument("--batch-size", type=int, default=512, help="Records per LanceDB insert batch (default: 512)")
     parser.add_argument("--limit", type=int, default=None, help="Stop after N SPLs per part (smoke testing)")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="iterparse",
+        help="SPL parser: single-pass lxml iterparse (default) or a BeautifulSoup tree",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parser processes; >1 parses SPLs in a process pool (default: 1)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="With --workers > 1, insert SPLs as they finish parsing instead of in zip order",
+    )
+    parser.add_argument(
+        "--parse-cache",
+        default=None,
+        help="Directory for the Parquet parse cache; SPLs parsed on an earlier run are not re-parsed",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Build Arrow RecordBatches directly instead of per-row dicts for each insert",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap parsing, embedding and Lance writes on separate threads (implies --columnar)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Worker processes that each embed a slice of every part; their rows are committed to the table in one "
+        "write at the end (default: 1, no sharding). --limit then caps each shard; each shard parses in its own "
+        "process, so --workers does not apply.",
+    )
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=None,
+        help="Texts per encoder call with --pipeline (default: autotuned)",
+    )
+    parser.add_argument(
+        "--embed-cache",
+        default=None,
+        help="Directory for the on-disk embedding cache; texts embedded on an earlier run are not re-embedded",
+    )
+    parser.add_argument(
+        "--embed-cache-size",
+        type=int,
+        default=1_000_000,
+        help="Max vectors kept in the embedding cache, oldest overwritten first (default: 1000000)",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Treat sources as update bundles: upsert SPLs by set_id, skipping versions already indexed. The table "
+        "is then optimized incrementally rather than finalized, unless --vector-index asks for a rebuild",
+    )
+    parser.add_argument(
+        "--vector-format",
+        type=VectorFormat.parse,
+        default=None,
+        metavar="DTYPE[:DIM]",
+        help="Vector storage for a new table: float32 or float16, optionally truncated to DIM leading components, "
+        "e.g. float16:384 (default: float32, or an existing table's format). See medirag.index.vector_bench.",
+    )
+    parser.add_argument(
+        "--vector-index",
+        choices=(*VECTOR_INDEX_TYPES, "none"),
+        default=None,
+        help="ANN index to build on `vector` after loading (default: the table's current one, or IVF_HNSW_SQ for a "
+        "table this build creates; skipped for small tables)",
+    )
+    parser.add_argument("--num-partitions", type=int, default=None, help="IVF partitions (default: Lance's choice)")
+    parser.add_argument(
+        "--num-sub-vectors",
+        type=int,
+        default=None,
+        help="PQ sub-vectors for IVF_PQ; must divide the embedding dimension (default: Lance's choice)",
+    )
+    parser.add_argument(
+        "--no-finalize",
+        action="store_true",
+        help="Only build indexes at the end; skip compaction and version pruning",
+    )
+    parser.add_argument(
+        "--target-rows-per-fragment",
+        type=int,
+        default=None,
+        help="Fragment size to compact to when finalizing (default: Lance's, 1M rows; other values need pylance)",
+    )
+    parser.add_argument(
+        "--keep-versions-hours",
+        type=float,
+        default=None,
+        help="When finalizing, keep table versions newer than this; 0 keeps only the latest (default: 0, or 24 with "
+        "--delta, whose table is usually being served while it is updated)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted build from its checkpoint, rolling back any batch written after it",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="SPL catalog (see medirag.core.catalog) that locates each --set-id; its zips are looked up in "
+        "--work-dir if given",
+    )
     parser.add_argument("--keep-zip", action="store_true", help="Don't delete downloaded zips after processing")
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=1,
+        help="Parts to download ahead of the one being indexed; 0 downloads each part just before indexing it "
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "--download-segments",
+        type=int,
+        default=4,
+        help="Parallel range requests per download, if the server accepts ranges (default: 4)",
+    )
     parser.add_argument(
         "--work-dir",
         default=None,
         help="Where to download zips to (default: a temp dir, removed on exit)",
     )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Write per-stage timers, counters and queue gauges to this JSON file, refreshed with each progress log "
+        "(see medirag.core.metrics)",
+    )
+    parser.add_argument(
+        "--progress-every",
+        type=float,
+        default=30,
+        help="Seconds between progress log lines (default: 30)",
+    )
 
     args = parser.parse_args(argv)
 
-    sources = DAILYMED_PARTS if args.all else args.source
+    delta = args.delta or bool(args.daily_update)
+    if delta and args.pipeline:
+        parser.error("--pipeline cannot be combined with --delta")
+    if args.resume and args.unordered:
+        parser.error("--resume needs archive order; drop --unordered")
+    if args.shards > 1:
+        for flag, set_ in (
+            ("--delta", delta),
+            ("--pipeline", args.pipeline),
+            ("--resume", args.resume),
+            ("--workers", args.workers > 1),
+            ("--unordered", args.unordered),
+        ):
+            if set_:
+                parser.error(f"--shards cannot be combined with {flag}")
+        if args.embed_cache:
+            parser.error("--shards cannot share one --embed-cache between worker processes")
+    keep_versions_hours = args.keep_versions_hours
+    if keep_versions_hours is None:
+        keep_versions_hours = 24 if delta else 0
+    if args.daily_update:
+        sources = [daily_update_url(day) for day in sorted(args.daily_update)]
+    else:
+        sources = DAILYMED_PARTS if args.all else args.source
     db_path = Path(args.db).resolve()
     db_path.mkdir(parents=True, exist_ok=True)
 
+    if args.set_id:
+        if not args.catalog:
+            parser.error("--set-id needs --catalog")
+        catalog = SplCatalog(args.catalog, zip_dir=args.work_dir)
+        indexer = LanceIndexer(db_path=db_path, table_name=args.table)
+        spls, records = _reindex_set_ids(catalog, args.set_id, indexer, engine=args.engine)
+        logger.info(f"Re-indexed {spls} SPLs ({records} records)")
+        return 0
+
+    # A finished build needs nothing opened, so check before creating the work dir and caches.
+    ckpt_path = checkpoint_path(db_path, args.table)
+    checkpoint = Checkpoint.load(ckpt_path) if args.resume else None
+    if checkpoint is not None and checkpoint.complete:
+        logger.info(f"{ckpt_path} records a finished build; nothing to resume")
+        return 0
+
     if args.work_dir:
         work_dir = Path(args.work_dir).resolve()
         work_dir.mkdir(parents=True, exist_ok=True)
@@ -159,32 +417,125 @@ def main(argv: list[str] | None = None) -> int:
     logger.info(f"Work dir: {work_dir}")
     logger.info(f"Sources: {sources}")
 
-    indexer = LanceIndexer(db_path=db_path, table_name=args.table)
+    embed_cache = (
+        EmbeddingCache(args.embed_cache, EMBED_MODEL, EMBED_DIM, max_entries=args.embed_cache_size)
+        if args.embed_cache
+        else None
+    )
+    indexer = LanceIndexer(
+        db_path=db_path, table_name=args.table, embed_cache=embed_cache, vector_format=args.vector_format
+    )
+    # Shard workers open their own parse caches on the directory.
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache and args.shards == 1 else None
 
     total_spls = 0
     total_records = 0
     t_start = time.time()
-
+    METRICS.reset()
+
+    if checkpoint is not None:
+        rollback(indexer, checkpoint)
+        sources = [s for s in sources if s not in checkpoint.done]
+        total_spls, total_records = checkpoint.spls, checkpoint.records
+        logger.info(f"Resuming: {len(checkpoint.done)} sources done, {total_spls} SPLs already indexed")
+    elif not args.unordered and args.shards == 1:
+        if args.resume:
+            logger.warning(f"No checkpoint at {ckpt_path}; starting from the beginning")
+        checkpoint = Checkpoint(table_version=indexer.table.version if indexer.table is not None else None)
+        checkpoint.save(ckpt_path)
+    # A resumed build may have created the table before it was interrupted; its checkpoint says so.
+    creates_table = checkpoint.table_version is None if checkpoint is not None else indexer.table is None
+
+    sharded = (
+        ShardedBuild(
+            db_path,
+            args.table,
+            args.shards,
+            batch_size=args.batch_size,
+            engine=args.engine,
+            columnar=args.columnar,
+            limit=args.limit,
+            vector_format=indexer.vector_format,
+            parse_cache=args.parse_cache,
+        )
+        if args.shards > 1
+        else None
+    )
+    downloader = Downloader(segments=args.download_segments)
+    parts = prefetch(sources, partial(_fetch_part, work_dir=work_dir, downloader=downloader), ahead=args.prefetch)
+    reporter = MetricsReporter(METRICS, args.metrics, every=args.progress_every)
     try:
-        for source in sources:
+        for source, (zip_path, downloaded) in parts:
+            on_commit = partial(checkpoint.commit, ckpt_path, indexer, source) if checkpoint is not None else None
             spls, records = _index_part(
-                source=source,
+                zip_path=zip_path,
                 indexer=indexer,
                 batch_size=args.batch_size,
                 limit=args.limit,
                 keep_zip=args.keep_zip,
-                work_dir=work_dir,
+                downloaded=downloaded,
+                engine=args.engine,
+                workers=args.workers,
+                ordered=not args.unordered,
+                parse_cache=parse_cache,
+                columnar=args.columnar,
+                pipeline=args.pipeline,
+                embed_batch_size=args.embed_batch_size,
+                delta=delta,
+                start_after=checkpoint.start_after(source) if checkpoint is not None else None,
+                on_commit=on_commit,
+                sharded=sharded,
             )
             total_spls += spls
             total_records += records
+            if checkpoint is not None:
+                checkpoint.finish_part(ckpt_path, indexer, source)
 
-        logger.info("Creating FTS index for hybrid search…")
-        indexer.create_fts_index()
+        if sharded is not None:
+            sharded.commit(indexer)
+        if args.vector_index is None:
+            vector_index = "IVF_HNSW_SQ" if creates_table else existing_vector_index(indexer)
+        else:
+            vector_index = None if args.vector_index == "none" else args.vector_index
+        if indexer.table is None:
+            logger.warning("Nothing was indexed; skipping index build")
+        elif args.no_finalize:
+            with METRICS.time("finalize"):
+                build_indexes(
+                    indexer, vector_index, num_partitions=args.num_partitions, num_sub_vectors=args.num_sub_vectors
+                )
+        elif delta and not creates_table and args.vector_index is None:
+            # An update touches a sliver of the table: fold it into the existing indexes instead of rebuilding them.
+            with METRICS.time("finalize"):
+                optimize(indexer, keep_versions=timedelta(hours=keep_versions_hours))
+        else:
+            with METRICS.time("finalize"):
+                finalize(
+                    indexer,
+                    target_rows_per_fragment=args.target_rows_per_fragment,
+                    keep_versions=timedelta(hours=keep_versions_hours),
+                    vector_index=vector_index,
+                    num_partitions=args.num_partitions,
+                    num_sub_vectors=args.num_sub_vectors,
+                )
+        if checkpoint is not None:
+            checkpoint.complete = True
+            checkpoint.save(ckpt_path)
     finally:
+        # Stop any prefetch still downloading before the work dir is removed under it.
+        downloader.close()
+        parts.close()
+        if sharded is not None:
+            sharded.close()
+        if parse_cache is not None:
+            parse_cache.close()
+        if embed_cache is not None:
+            embed_cache.close()
         if cleanup_work_dir:
             import shutil
 
             shutil.rmtree(work_dir, ignore_errors=True)
+        reporter.close()
 
     elapsed = time.time() - t_start
     logger.info(
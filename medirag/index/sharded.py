@@ -0,0 +1,166 @@
+"""
+Sharded index builds: worker processes embed disjoint slices of every part, one commit publishes them all.
+
+A single LanceIndexer process embeds with one PyTorch process's worth of CPU. With `--shards N` the runner starts N
+worker processes, each pinned to `cpu_count // N` torch threads. For every part, worker `i` parses and embeds every
+N-th SPL of the bundle (see `iter_spl_xml(shard=...)`) and writes the rows, vectors included, to its own staging table
+under `<db>/<table>.shards/`. Workers never touch the target table. After the last part, `commit()` streams every
+staging table into the target table as one write, so readers see either none of the build or all of it, and the
+staging directory is removed.
+
+The commit copies rows rather than relinking fragment files (that needs the `pylance` package), but it never
+re-embeds: rows arrive with their vectors, so it costs sequential I/O against the embedding time saved.
+
+With a `parse_cache` directory, each worker keeps its own ParseCache on it and flushes it after every part; cache
+shards have unique names, so the workers never write the same file.
+"""
+
+import itertools
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import lancedb
+import pyarrow as pa
+from loguru import logger
+
+from medirag.core.metrics import METRICS
+from medirag.core.parse_cache import ParseCache
+from medirag.index.lance import EMBED_MODEL, LanceIndexer, _list_table_names
+from medirag.index.pipeline import insert_records, stream_records
+from medirag.index.vector_format import VectorFormat
+
+
+_worker_indexer: LanceIndexer | None = None
+_worker_parse_cache: ParseCache | None = None
+
+
+def staging_dir(db_path: str | Path, table_name: str) -> Path:
+    return Path(db_path) / f"{table_name}.shards"
+
+
+def _init_worker(
+    staging: str,
+    table_name: str,
+    embed_model: str,
+    vector_format: VectorFormat | None,
+    threads: int,
+    parse_cache: str | None,
+) -> None:
+    import torch
+
+    global _worker_indexer, _worker_parse_cache
+    torch.set_num_threads(threads)
+    _worker_indexer = LanceIndexer(
+        db_path=staging, table_name=table_name, embed_model=embed_model, vector_format=vector_format
+    )
+    _worker_parse_cache = ParseCache(parse_cache) if parse_cache is not None else None
+
+
+def _index_slice(
+    zip_path: str, shard: tuple[int, int], batch_size: int, engine: str, columnar: bool, limit: int | None
+) -> tuple[int, int, dict]:
+    if _worker_indexer is None:
+        raise RuntimeError("shard worker was not initialized")
+    stream = stream_records(Path(zip_path), limit=limit, engine=engine, parse_cache=_worker_parse_cache, shard=shard)
+    spls, records = insert_records(stream, _worker_indexer, batch_size, columnar)
+    if _worker_parse_cache is not None:
+        _worker_parse_cache.flush()
+    return spls, records, METRICS.drain()
+
+
+class ShardedBuild:
+    """
+    `shards` single-process pools, one per staging table, kept alive across parts so each loads its model once.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        table_name: str,
+        shards: int,
+        batch_size: int,
+        engine: str = "iterparse",
+        columnar: bool = False,
+        limit: int | None = None,
+        embed_model: str = EMBED_MODEL,
+        vector_format: VectorFormat | None = None,
+        parse_cache: str | Path | None = None,
+    ):
+        if shards < 2:
+            raise ValueError(f"a sharded build needs at least 2 shards, got {shards}")
+        self.staging = staging_dir(db_path, table_name)
+        if self.staging.exists():
+            logger.warning(f"Discarding staging tables left by an earlier sharded build in {self.staging}")
+            shutil.rmtree(self.staging)
+        self.table_names = [f"{table_name}_shard{i}" for i in range(shards)]
+        self.batch_size = batch_size
+        self.engine = engine
+        self.columnar = columnar
+        self.limit = limit
+        threads = max(1, (os.cpu_count() or 1) // shards)
+        logger.info(f"Starting {shards} shard workers, {threads} torch thread{'s' if threads > 1 else ''} each")
+        # spawn, not fork: this process has torch loaded and forking it is unsafe.
+        ctx = multiprocessing.get_context("spawn")
+        self._pools = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(
+                    str(self.staging),
+                    name,
+                    embed_model,
+                    vector_format,
+                    threads,
+                    str(parse_cache) if parse_cache is not None else None,
+                ),
+            )
+            for name in self.table_names
+        ]
+
+    def index_part(self, zip_path: Path) -> tuple[int, int]:
+        """
+        Embed every slice of one zip into the staging tables. Returns (spl_count, record_count) across shards.
+
+        The workers' stage metrics are merged into this process's METRICS.
+        """
+        n = len(self._pools)
+        futures = [
+            pool.submit(_index_slice, str(zip_path), (i, n), self.batch_size, self.engine, self.columnar, self.limit)
+            for i, pool in enumerate(self._pools)
+        ]
+        results = [f.result() for f in futures]
+        for name, (spls, records, worker_metrics) in zip(self.table_names, results):
+            METRICS.merge(worker_metrics)
+            logger.info(f"  {name}: {spls} SPLs, {records} records")
+        return sum(r[0] for r in results), sum(r[1] for r in results)
+
+    def commit(self, indexer: LanceIndexer) -> int:
+        """
+        Append every staging table to `indexer`'s table in one write. Returns the rows committed.
+        """
+        db = lancedb.connect(self.staging)
+        existing = set(_list_table_names(db))  # a shard that got no SPLs never created its table
+        staged = [db.open_table(name) for name in self.table_names if name in existing]
+        staged = [t for t in staged if t.count_rows()]
+        if not staged:
+            return 0
+        schema = staged[0].schema
+        batches = itertools.chain.from_iterable(t.search().limit(None).to_batches() for t in staged)
+        n = indexer.add_batches(pa.RecordBatchReader.from_batches(schema, batches))
+        logger.info(f"Committed {n} rows from {len(staged)} shards as version {indexer.table.version}")
+        return n
+
+    def close(self) -> None:
+        for pool in self._pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def __enter__(self) -> "ShardedBuild":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
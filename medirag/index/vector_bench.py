@@ -0,0 +1,179 @@
+"""
+Benchmark compact vector formats against the float32 baseline: size on disk, cold-load time and recall.
+
+Every `--formats` entry gets a copy of the table in `--scratch`, with each stored vector converted the way
+`LanceIndexer` would have written it (truncated and re-normalized, then cast), so nothing is re-embedded. Each copy is
+then measured:
+
+  - MB on disk (data files only: the copies carry no indexes or old versions)
+  - cold load: connect, open the table and answer one query on a fresh connection (the OS page cache stays warm, so
+    this is a lower bound for a freshly downloaded index)
+  - recall@k of exact flat search against the float32 copy's flat search, plus p50 query latency
+
+Flat search isolates what the storage format costs; see `medirag.index.ann_report` for ANN index settings on top.
+
+Usage:
+    uv run python -m medirag.index.vector_bench --db ./lance_db --scratch ./vector_bench \\
+        --formats float16 float16:384 float16:256
+
+    # Held-out questions instead of 200 sampled rows
+    uv run python -m medirag.index.vector_bench --db ./lance_db --scratch ./vector_bench --queries questions.txt
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from loguru import logger
+
+from medirag.index.ann_report import Query, _load_queries, _recall
+from medirag.index.lance import DEFAULT_TABLE, LanceIndexer
+from medirag.index.vector_format import VectorFormat
+
+# Row id of the source row, carried into every copy so hits can be compared across tables.
+_SOURCE_ROWID = "source_rowid"
+
+
+@dataclass
+class FormatResult:
+    format: str
+    mb_on_disk: float
+    cold_load_ms: float
+    recall: float
+    p50_ms: float
+
+
+def _converted(indexer: LanceIndexer, fmt: VectorFormat) -> Iterator[pa.RecordBatch]:
+    batches = indexer.table.search().with_row_id(True).limit(None).to_batches()
+    for batch in batches:
+        # flatten() honours the batch's slice offset, unlike .values; no per-vector Python lists.
+        flat_in = batch.column("vector").flatten().to_numpy(zero_copy_only=False)
+        vectors = flat_in.astype(np.float32, copy=False).reshape(batch.num_rows, -1)
+        stored = fmt.apply(vectors)
+        flat = pa.array(stored.reshape(-1))
+        column = pa.FixedSizeListArray.from_arrays(flat, stored.shape[1])
+        batch = batch.set_column(batch.schema.get_field_index("vector"), "vector", column)
+        i = batch.schema.get_field_index("_rowid")
+        yield batch.set_column(i, _SOURCE_ROWID, batch.column(i))
+
+
+def _copy(indexer: LanceIndexer, fmt: VectorFormat, db: lancedb.DBConnection, name: str) -> None:
+    batches = _converted(indexer, fmt)
+    first = next(batches)
+    reader = pa.RecordBatchReader.from_batches(first.schema, itertools.chain([first], batches))
+    db.create_table(name, data=reader, mode="overwrite")
+
+
+def _search(table, fmt: VectorFormat, queries: list[Query], top_k: int) -> tuple[list[list[int]], np.ndarray]:
+    ids: list[list[int]] = []
+    latencies = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        search = table.search(fmt.truncate(q.vector), query_type="vector").select([_SOURCE_ROWID])
+        t0 = time.perf_counter()
+        rows = search.limit(top_k + (q.exclude is not None)).to_arrow()
+        latencies[i] = (time.perf_counter() - t0) * 1000
+        hit_ids = [rid for rid in rows.column(_SOURCE_ROWID).to_pylist() if rid != q.exclude]
+        ids.append(hit_ids[:top_k])
+    return ids, latencies
+
+
+def _cold_load_ms(scratch: Path, name: str, fmt: VectorFormat, query: Query) -> float:
+    t0 = time.perf_counter()
+    table = lancedb.connect(scratch).open_table(name)
+    table.search(fmt.truncate(query.vector), query_type="vector").select([_SOURCE_ROWID]).limit(1).to_arrow()
+    return (time.perf_counter() - t0) * 1000
+
+
+def run_bench(
+    indexer: LanceIndexer, queries: list[Query], formats: list[VectorFormat], scratch: Path, top_k: int = 10
+) -> list[FormatResult]:
+    """
+    Copy the table once per format into `scratch` and measure each copy; recall is against full float32.
+    """
+    baseline = VectorFormat()
+    model_dim = indexer.table.schema.field("vector").type.list_size
+    formats = [baseline] + [f for f in formats if f.normalized(model_dim) != baseline]
+    db = lancedb.connect(scratch)
+    truth: list[list[int]] = []
+    results = []
+    for fmt in formats:
+        name = f"{indexer.table_name}_{str(fmt).replace(':', '_')}"
+        logger.info(f"Writing {fmt} copy…")
+        _copy(indexer, fmt, db, name)
+        table_dir = scratch / f"{name}.lance"
+        disk_bytes = sum(f.stat().st_size for f in table_dir.rglob("*") if f.is_file())
+        cold_ms = _cold_load_ms(scratch, name, fmt, queries[0])
+        found, latencies = _search(db.open_table(name), fmt, queries, top_k)
+        if fmt == baseline:
+            truth = found
+        results.append(
+            FormatResult(
+                format=str(fmt),
+                mb_on_disk=disk_bytes / 1e6,
+                cold_load_ms=cold_ms,
+                recall=_recall(truth, found),
+                p50_ms=float(np.percentile(latencies, 50)),
+            )
+        )
+    return results
+
+
+def _format(results: list[FormatResult], top_k: int) -> str:
+    width = max(len("format"), *(len(r.format) for r in results))
+    lines = [f"{'format':<{width}}  MB on disk  cold load ms  recall@{top_k}  p50 ms"]
+    for r in results:
+        lines.append(
+            f"{r.format:<{width}}  {r.mb_on_disk:>10.1f}  {r.cold_load_ms:>12.1f}  {r.recall:>8.3f}  {r.p50_ms:>6.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="LanceDB directory holding a full float32 table")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help=f"Table name (default: {DEFAULT_TABLE})")
+    parser.add_argument("--scratch", required=True, help="Directory for the per-format copies")
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        type=VectorFormat.parse,
+        default=[VectorFormat.parse(s) for s in ("float16", "float16:384", "float16:256")],
+        metavar="DTYPE[:DIM]",
+        help="Formats to compare with float32 (default: float16 float16:384 float16:256)",
+    )
+    parser.add_argument("--queries", default=None, help="Text file of held-out questions, one per line")
+    parser.add_argument("--sample", type=int, default=200, help="Without --queries: stored rows to use (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --sample (default: 0)")
+    parser.add_argument("--top-k", type=int, default=10, help="k for recall@k (default: 10)")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    indexer = LanceIndexer(db_path=args.db, table_name=args.table)
+    if indexer.table is None:
+        logger.error(f"No table {args.table} in {args.db}")
+        return 1
+    if not indexer.vector_format.is_default:
+        logger.error(f"{args.table} stores {indexer.vector_format} vectors; the baseline needs full float32")
+        return 1
+
+    scratch = Path(args.scratch)
+    scratch.mkdir(parents=True, exist_ok=True)
+    queries = _load_queries(indexer, args.queries, args.sample, args.seed)
+    logger.info(f"Scoring {len(queries)} queries against {indexer.table.count_rows()} rows")
+    results = run_bench(indexer, queries, args.formats, scratch, top_k=args.top_k)
+    print(_format(results, args.top_k))
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in results], indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Storage formats for the `vector` column: element type plus an optional truncated dimension.
+
+Full PubMedBERT vectors are 768 float32s, about 3 KB a row, which dominates the table's size on disk and in the HF
+bucket. `float16` halves that; a reduced `dim` keeps only the leading components of each vector, Matryoshka-style,
+and re-normalizes them. PubMedBERT was not trained with a Matryoshka loss, so truncation costs more recall than it
+would on an MRL model — measure a format with `medirag.index.vector_bench` before building with it.
+
+A format is written as "<dtype>[:<dim>]", e.g. "float16", "float16:384" or "float32:256". Tables record their format
+in the vector column's Arrow type, so `LanceIndexer` picks it up when opening an existing table and encodes queries
+to match.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+
+
+VECTOR_DTYPES: dict[str, tuple[type, pa.DataType]] = {
+    "float32": (np.float32, pa.float32()),
+    "float16": (np.float16, pa.float16()),
+}
+
+
+@dataclass(frozen=True)
+class VectorFormat:
+    dtype: str = "float32"
+    dim: int | None = None  # leading components kept; None keeps the model's full dimension
+
+    def __post_init__(self):
+        if self.dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype {self.dtype!r}, expected one of {tuple(VECTOR_DTYPES)}")
+        if self.dim is not None and self.dim < 1:
+            raise ValueError(f"Vector dim must be positive, got {self.dim}")
+
+    @classmethod
+    def parse(cls, spec: str) -> "VectorFormat":
+        dtype, _, dim = spec.partition(":")
+        return cls(dtype=dtype, dim=int(dim) if dim else None)
+
+    @classmethod
+    def of_field(cls, field: pa.Field) -> "VectorFormat":
+        """
+        Format of an existing fixed-size-list vector column.
+        """
+        for name, (_, arrow_type) in VECTOR_DTYPES.items():
+            if field.type.value_type == arrow_type:
+                return cls(dtype=name, dim=field.type.list_size)
+        raise ValueError(f"Unsupported vector column type {field.type}")
+
+    def __str__(self) -> str:
+        return self.dtype if self.dim is None else f"{self.dtype}:{self.dim}"
+
+    def normalized(self, model_dim: int) -> "VectorFormat":
+        """
+        The same format with `dim` dropped if it is the model's full dimension, so equal formats compare equal.
+        """
+        if self.dim is not None and self.dim > model_dim:
+            raise ValueError(f"Vector dim {self.dim} exceeds the model's {model_dim}")
+        return VectorFormat(self.dtype, None if self.dim == model_dim else self.dim)
+
+    @property
+    def is_default(self) -> bool:
+        """
+        Full-dimension float32: what Lance's embedding function writes on its own.
+        """
+        return self.dtype == "float32" and self.dim is None
+
+    @property
+    def arrow_type(self) -> pa.DataType:
+        return VECTOR_DTYPES[self.dtype][1]
+
+    def ndims(self, model_dim: int) -> int:
+        return self.dim or model_dim
+
+    def truncate(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Keep the leading `dim` components of each (row) vector and re-normalize; float32 out.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None or self.dim >= vectors.shape[-1]:
+            return vectors
+        vectors = vectors[..., : self.dim]
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Model output → stored vectors: truncated, then cast to `dtype`.
+        """
+        return self.truncate(vectors).astype(VECTOR_DTYPES[self.dtype][0], copy=False)
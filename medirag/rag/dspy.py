@@ -4,15 +4,20 @@ DSPy 3.x RAG module: input guard → retrieve → ChainOfThought → output guar
 The module owns the LanceIndexer directly — no global `dspy.settings.rm` dance,
 no `dspy.Retrieve` wrapper. Streaming is exposed via `dspy.streamify` with a
 StreamListener on the `answer` field.
+
+`forward` serves sync callers. `aforward` is the serving path: retrieval goes
+through `LanceIndexer.aretrieve` and the LM calls through `acall`, so one slow
+request never holds up the event loop other users' streams are running on.
 """
 
 from typing import Any, AsyncIterable, AsyncIterator, Callable
 
 import dspy
+import numpy as np
 
 from medirag.guardrail.input import InputGuardrail
 from medirag.guardrail.output import OutputGuardrail
-from medirag.index.lance import LanceIndexer
+from medirag.index.lance import LanceIndexer, RetrievalHit
 
 
 class GenerateAnswer(dspy.Signature):
@@ -33,24 +38,36 @@ class GenerateAnswer(dspy.Signature):
 
 
 class DspyRAG(dspy.Module):
-    def __init__(self, indexer: LanceIndexer, k: int = 5, hybrid: bool = True):
+    def __init__(self, indexer: LanceIndexer, k: int = 5, hybrid: bool = True, rerank: bool = False):
         super().__init__()
         self.indexer = indexer
         self.k = k
         self.hybrid = hybrid
+        self.rerank = rerank  # takes effect when the indexer has a reranker
         self.input_guard = dspy.Predict(InputGuardrail)
         self.output_guard = dspy.Predict(OutputGuardrail)
         self.generate_answer = dspy.ChainOfThought(GenerateAnswer)
 
-    def _retrieve(self, question: str) -> str:
-        hits = self.indexer.retrieve(question, top_k=self.k, hybrid=self.hybrid)
-        return "\n\n---\n\n".join(h.text for h in hits)
-
-    def forward(self, question: str) -> dspy.Prediction:
+    def _retrieve(self, question: str, query_vector: np.ndarray | None = None) -> str:
+        hits = self.indexer.retrieve(
+            question, top_k=self.k, with_reranker=self.rerank, hybrid=self.hybrid, query_vector=query_vector
+        )
+        return _join_context(hits)
+
+    async def _aretrieve(self, question: str, query_vector: np.ndarray | None = None) -> str:
+        hits = await self.indexer.aretrieve(
+            question, top_k=self.k, with_reranker=self.rerank, hybrid=self.hybrid, query_vector=query_vector
+        )
+        return _join_context(hits)
+
+    def forward(self, question: str, query_vector: np.ndarray | None = None) -> dspy.Prediction:
+        """
+        `query_vector`: the question's `indexer.encode_query` embedding, if the caller already has it.
+        """
         if self.input_guard(user_input=question).should_block:
             return dspy.Prediction(context="", answer="I'm sorry, I can't respond to that.")
 
-        context = self._retrieve(question)
+        context = self._retrieve(question, query_vector)
         prediction = self.generate_answer(context=context, question=question)
 
         blocked = self.output_guard(user_input=question, bot_response=prediction.answer).should_block
@@ -61,24 +78,46 @@ class DspyRAG(dspy.Module):
             )
         return dspy.Prediction(context=context, answer=prediction.answer)
 
+    async def aforward(self, question: str, query_vector: np.ndarray | None = None) -> dspy.Prediction:
+        if (await self.input_guard.acall(user_input=question)).should_block:
+            return dspy.Prediction(context="", answer="I'm sorry, I can't respond to that.")
+
+        context = await self._aretrieve(question, query_vector)
+        prediction = await self.generate_answer.acall(context=context, question=question)
+
+        verdict = await self.output_guard.acall(user_input=question, bot_response=prediction.answer)
+        if verdict.should_block:
+            return dspy.Prediction(
+                context=context,
+                answer="I'm sorry, I don't have relevant information to respond to that.",
+            )
+        return dspy.Prediction(context=context, answer=prediction.answer)
+
 
-async def stream_answer(rag: DspyRAG, question: str) -> AsyncIterator[str]:
+def _join_context(hits: list[RetrievalHit]) -> str:
+    return "\n\n---\n\n".join(h.text for h in hits)
+
+
+async def stream_answer(rag: DspyRAG, question: str, query_vector: np.ndarray | None = None) -> AsyncIterator[str]:
     """
     Async generator yielding answer chunks as the LM streams them.
 
+    `query_vector` is handed to retrieval (see `DspyRAG.forward`).
+
     Falls back to the final prediction if no chunks arrive (e.g. when the input guardrail blocks before the answer LM is
     invoked).
     """
     listener = dspy.streaming.StreamListener(signature_field_name="answer")
     # dspy.streamify is mistyped as Callable[..., Awaitable[Any]] but actually
     # returns an async generator. Launder through Any, then bind the real type
-    # so downstream code sees AsyncIterable.
-    raw: Any = dspy.streamify(rag, stream_listeners=[listener])
+    # so downstream code sees AsyncIterable. `is_async_program` runs `rag.acall`
+    # (→ aforward) on the event loop instead of `forward` on a worker thread.
+    raw: Any = dspy.streamify(rag, stream_listeners=[listener], is_async_program=True)
     streamed: Callable[..., AsyncIterable[Any]] = raw
 
     saw_chunk = False
     final_text = ""
-    async for event in streamed(question=question):
+    async for event in streamed(question=question, query_vector=query_vector):
         if isinstance(event, dspy.streaming.StreamResponse):
             saw_chunk = True
             yield event.chunk
@@ -3,8 +3,15 @@ Cache-layered streaming pipeline: cache lookup → DSPy RAG stream → cache sav
 
 Composes the RAG module with the semantic cache. Owns the caching policy
 (when to look up, when to save) but knows nothing about LLMs or DSPy internals.
+Cache lookups and saves encode the question, so they run on a worker thread
+to keep the event loop free.
+
+When the cache compares questions with the retriever's own embedding model,
+the question is embedded once, by the indexer, and that vector serves the
+cache lookup, retrieval and the cache save alike.
 """
 
+import asyncio
 from typing import AsyncIterator
 
 from loguru import logger
@@ -23,16 +30,20 @@ async def answer_stream(
     Stream an answer, serving from the semantic cache when possible.
 
     Cache hits are yielded as one chunk. Misses stream through the RAG and the accumulated answer is written back to the
-    cache on success.
+    cache on success. If the cache's `model_name` is the indexer's embedding model, the question is encoded once (with
+    the indexer's query cache) and the vector is shared by lookup, retrieval and save.
     """
-    cached = cache.lookup(question=query, cosine_threshold=cosine_threshold)
+    vector = None
+    if cache.model_name is not None and cache.model_name == rag.indexer.embed_model:
+        vector = await rag.indexer.aencode_query(query)
+    cached = await asyncio.to_thread(cache.lookup, question=query, cosine_threshold=cosine_threshold, vector=vector)
     if cached:
         yield cached
         return
 
     accumulated = ""
     try:
-        async for chunk in stream_answer(rag, query):
+        async for chunk in stream_answer(rag, query, query_vector=vector):
             accumulated += chunk
             yield chunk
     except Exception as e:
@@ -42,4 +53,4 @@ async def answer_stream(
         return
 
     if accumulated:
-        cache.save(query, accumulated)
+        await asyncio.to_thread(cache.save, query, accumulated, vector=vector)
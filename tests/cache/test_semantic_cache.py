@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pytest
 from medirag.cache.local import LocalSemanticCache
+from medirag.core.batching import MicroBatchEncoder
 
 
 # Fixture to initialize the SemanticCaching object
@@ -29,3 +33,59 @@ def test_save_and_lookup_in_cache(semantic_cache):
 
     # Cleanup: Clear the cache after test
     semantic_cache.clear()
+
+
+def _unit(*xs):
+    v = np.asarray(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_cache_keyed_on_external_vectors(tmp_path):
+    """
+    Without its own encoder the cache compares the vectors callers pass, e.g. the retriever's query embedding.
+    """
+    path = str(tmp_path / "cache.json")
+    cache = LocalSemanticCache(model_name="retriever/model", dimension=3, json_file=path, load_encoder=False)
+    assert cache.encoder is None
+    cache.save("what is aspirin?", "A painkiller.", vector=_unit(1, 0, 0))
+
+    assert cache.lookup("aspirin?", cosine_threshold=0.9, vector=_unit(1, 0.1, 0)) == "A painkiller."
+    assert cache.lookup("ibuprofen?", cosine_threshold=0.9, vector=_unit(0, 1, 0)) is None
+    with pytest.raises(ValueError):
+        cache.lookup("aspirin?", cosine_threshold=0.9)
+
+    reopened = LocalSemanticCache(model_name="retriever/model", dimension=3, json_file=path, load_encoder=False)
+    assert reopened.lookup("aspirin?", cosine_threshold=0.9, vector=_unit(1, 0, 0)) == "A painkiller."
+    other_model = LocalSemanticCache(model_name="other/model", dimension=3, json_file=path, load_encoder=False)
+    assert other_model.lookup("aspirin?", cosine_threshold=0.9, vector=_unit(1, 0, 0)) is None
+
+
+def test_cache_encodes_through_a_batcher(tmp_path):
+    class FakeModel:
+        def encode(self, texts, **kwargs):
+            return np.stack([_unit(1, len(t) / 100, 0) for t in texts])
+
+    batcher = MicroBatchEncoder("fake/model", FakeModel)
+    path = str(tmp_path / "cache.json")
+    cache = LocalSemanticCache(model_name="fake/model", dimension=3, json_file=path, batcher=batcher)
+    cache.save("what is aspirin?", "A painkiller.")
+    assert cache.lookup("what is aspirin?", cosine_threshold=0.99) == "A painkiller."
+    batcher.close()
+    assert batcher.stats()["batch_size"]["count"] == 2
+
+    with pytest.raises(ValueError):
+        LocalSemanticCache(model_name="other/model", dimension=3, json_file=path, batcher=batcher)
+
+
+def test_concurrent_saves_keep_rows_aligned(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = LocalSemanticCache(model_name="retriever/model", dimension=3, json_file=path, load_encoder=False)
+    vectors = {i: _unit(1, i, i * i) for i in range(32)}
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        list(pool.map(lambda i: cache.save(f"q{i}", f"a{i}", vector=vectors[i]), vectors))
+
+    assert cache._matrix.shape[0] == len(cache._cache.response_text) == 32
+    for i, vector in vectors.items():
+        assert cache.lookup(f"q{i}", cosine_threshold=0.9999, vector=vector) == f"a{i}"
+    reopened = LocalSemanticCache(model_name="retriever/model", dimension=3, json_file=path, load_encoder=False)
+    assert len(reopened._cache.questions) == 32
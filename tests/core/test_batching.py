@@ -0,0 +1,71 @@
+"""Tests for the micro-batching encoder, against a stand-in model."""
+
+import numpy as np
+import pytest
+
+from medirag.core.batching import MicroBatchEncoder
+from medirag.core.metrics import Histogram
+
+
+class FakeModel:
+    def __init__(self, fail_on: str | None = None):
+        self.batches: list[list[str]] = []
+        self.fail_on = fail_on
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        if self.fail_on in texts:
+            raise RuntimeError("encoder failed")
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_requests_share_one_pass():
+    model = FakeModel()
+    encoder = MicroBatchEncoder("fake", lambda: model, max_batch_size=32, max_wait_ms=200)
+    texts = ["a", "bb", "ccc", "dddd"]
+    futures = [encoder.submit([t]) for t in texts]
+    results = [f.result(timeout=5) for f in futures]
+    encoder.close()
+
+    assert model.batches == [texts]
+    for t, vec in zip(texts, results):
+        assert vec.tolist() == [[len(t), 1.0]]
+    stats = encoder.stats()
+    assert stats["batch_size"]["count"] == 1 and stats["batch_size"]["max"] == 4
+    assert stats["latency_ms"]["count"] == 4
+
+
+def test_batches_respect_max_batch_size():
+    model = FakeModel()
+    encoder = MicroBatchEncoder("fake", lambda: model, max_batch_size=4, max_wait_ms=100)
+    futures = [encoder.submit([str(i)]) for i in range(3)] + [encoder.submit(["x", "y"]), encoder.submit(["z"])]
+    assert [len(f.result(timeout=5)) for f in futures] == [1, 1, 1, 2, 1]
+    encoder.close()
+
+    # The two-text request doesn't fit after three singles, so it opens the next batch.
+    assert model.batches == [["0", "1", "2"], ["x", "y", "z"]]
+
+
+def test_failure_reaches_every_caller_in_the_batch():
+    model = FakeModel(fail_on="bad")
+    encoder = MicroBatchEncoder("fake", lambda: model, max_wait_ms=100)
+    futures = [encoder.submit(["good"]), encoder.submit(["bad"])]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="encoder failed"):
+            f.result(timeout=5)
+
+    assert encoder.encode(["still serving"]).shape == (1, 2)
+    encoder.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        encoder.submit(["late"])
+
+
+def test_histogram_quantiles():
+    h = Histogram([1, 5, 10])
+    for v in (0.5, 2, 3, 4, 7, 50):
+        h.observe(v)
+    snap = h.snapshot()
+    assert snap["count"] == 6 and snap["max"] == 50
+    assert snap["p50"] == 5
+    assert snap["p99"] == 50  # beyond the last bound: the observed max
+    assert snap["buckets"] == {"<=1": 1, "<=5": 3, "<=10": 1, "+inf": 1}
@@ -0,0 +1,92 @@
+"""Tests for the SPL catalog and catalog-driven single-label parsing."""
+
+import io
+import zipfile
+
+import pytest
+
+from medirag.core.catalog import SplCatalog, build_catalog, main
+from medirag.core.reader import parse_spl, parse_spl_by_set_id
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+SET_ID = "BE27854A-A805-4300-9729-ACCD1B7F226F"
+
+
+def _variant(xml: bytes, set_id: str, version: str) -> bytes:
+    xml = xml.replace(SET_ID.encode(), set_id.encode())
+    return xml.replace(b'<versionNumber value="1"', f'<versionNumber value="{version}"'.encode())
+
+
+def _inner_zip(name: str, xml: bytes) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr(name, xml)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def bundle(data_dir, tmp_path):
+    """
+    An outer zip mixing a STORED inner zip, a DEFLATED inner zip, a top-level XML and, under directories, an inner zip
+    and an XML, plus a second part holding a newer version of the sample label.
+    """
+    xml = (data_dir / SAMPLE_XML).read_bytes()
+    part1 = tmp_path / "part1.zip"
+    with zipfile.ZipFile(part1, "w") as z:
+        z.writestr("a.zip", _inner_zip("a.xml", _variant(xml, "aaaa", "3")), compress_type=zipfile.ZIP_STORED)
+        z.writestr("b.zip", _inner_zip("b.xml", xml), compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("c.xml", _variant(xml, "cccc", "1"), compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("prescription/20240101_e.zip", _inner_zip("label.xml", _variant(xml, "eeee", "1")))
+        z.writestr("otc/f.xml", _variant(xml, "ffff", "1"))
+    part2 = tmp_path / "part2.zip"
+    with zipfile.ZipFile(part2, "w") as z:
+        z.writestr("d.zip", _inner_zip("d.xml", _variant(xml, SET_ID, "2")))
+    return xml, [part1, part2]
+
+
+def test_catalog_locates_every_spl(bundle, tmp_path):
+    _, parts = bundle
+    path = tmp_path / "catalog.parquet"
+    assert build_catalog(parts, path) == 6
+
+    catalog = SplCatalog(path)
+    assert [(e.version, e.path) for e in catalog.lookup(SET_ID)] == [("2", "d.zip/d.xml"), ("1", "b.zip/b.xml")]
+    assert catalog.lookup("aaaa")[0].path == "a.zip/a.xml"
+    assert catalog.lookup("cccc")[0].path == "c.xml"
+    nested, top_level = catalog.lookup("eeee")[0], catalog.lookup("ffff")[0]
+    assert (nested.member, nested.inner) == ("prescription/20240101_e.zip", "label.xml")
+    assert (top_level.member, top_level.inner) == ("otc/f.xml", None)
+    assert catalog.lookup("missing") == []
+
+
+@pytest.mark.parametrize("set_id", ["aaaa", "cccc", "eeee", "ffff"])
+def test_parse_by_set_id_matches_full_parse(bundle, tmp_path, set_id):
+    xml, parts = bundle
+    path = tmp_path / "catalog.parquet"
+    build_catalog(parts, path)
+    expected = parse_spl(_variant(xml, set_id, "3" if set_id == "aaaa" else "1"))
+    assert parse_spl_by_set_id(path, set_id) == expected
+
+
+def test_parse_by_set_id_picks_version(bundle, tmp_path):
+    xml, parts = bundle
+    path = tmp_path / "catalog.parquet"
+    build_catalog(parts, path)
+    catalog = SplCatalog(path)
+    assert {r.version for r in parse_spl_by_set_id(catalog, SET_ID)} == {"2"}
+    assert parse_spl_by_set_id(catalog, SET_ID, version="1") == parse_spl(xml)
+    with pytest.raises(KeyError):
+        parse_spl_by_set_id(catalog, SET_ID, version="9")
+
+
+def test_catalog_follows_moved_zips(bundle, tmp_path):
+    _, parts = bundle
+    path = tmp_path / "catalog.parquet"
+    assert main(["--catalog", str(path), "--build", *map(str, parts)]) == 0
+
+    moved = tmp_path / "moved"
+    moved.mkdir()
+    for part in parts:
+        part.rename(moved / part.name)
+    assert {r.set_id for r in parse_spl_by_set_id(SplCatalog(path, zip_dir=moved), "cccc")} == {"cccc"}
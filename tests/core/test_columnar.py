@@ -0,0 +1,80 @@
+from medirag.core.columnar import ROW_SCHEMA, RecordBatchBuilder, to_record_batch
+from medirag.core.reader import ProductCard, SectionRecord, parse_spl
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+
+
+def test_batch_rows_flatten_records():
+    card = ProductCard(
+        set_id="s1",
+        version="2",
+        drug_name="Cipro",
+        generic_name="ciprofloxacin",
+        manufacturer=None,
+        dosage_form="TABLET",
+        route="ORAL",
+        active_ingredients=[{"name": "CIPROFLOXACIN", "unii": "5E8K9I0O4U"}, {"name": "WATER"}],
+        inactive_ingredients=["STARCH"],
+        ndcs=["0001-0002"],
+        text="Cipro tablets",
+    )
+    section = SectionRecord(
+        set_id="s1",
+        version=None,
+        drug_name="Cipro",
+        loinc="34067-9",
+        section_title="INDICATIONS",
+        text="Urinary tract infections",
+        is_patient_facing=True,
+    )
+    batch = to_record_batch([card, section])
+    assert batch.schema == ROW_SCHEMA
+    assert batch.to_pylist() == [
+        {
+            "set_id": "s1",
+            "version": "2",
+            "drug_name": "Cipro",
+            "kind": "product_card",
+            "text": "Cipro tablets",
+            "loinc": "",
+            "section_title": "",
+            "is_patient_facing": False,
+            "generic_name": "ciprofloxacin",
+            "manufacturer": "",
+            "dosage_form": "TABLET",
+            "route": "ORAL",
+            "active_ingredient_uniis": ["5E8K9I0O4U"],
+            "active_ingredient_names": ["CIPROFLOXACIN", "WATER"],
+            "inactive_ingredient_names": ["STARCH"],
+            "ndcs": ["0001-0002"],
+        },
+        {
+            "set_id": "s1",
+            "version": None,
+            "drug_name": "Cipro",
+            "kind": "section",
+            "text": "Urinary tract infections",
+            "loinc": "34067-9",
+            "section_title": "INDICATIONS",
+            "is_patient_facing": True,
+            "generic_name": "",
+            "manufacturer": "",
+            "dosage_form": "",
+            "route": "",
+            "active_ingredient_uniis": [],
+            "active_ingredient_names": [],
+            "inactive_ingredient_names": [],
+            "ndcs": [],
+        },
+    ]
+
+
+def test_finish_resets_builder(data_dir):
+    records = parse_spl(data_dir / SAMPLE_XML)
+    builder = RecordBatchBuilder()
+    builder.extend(records)
+    assert len(builder) == len(records)
+    assert builder.finish().num_rows == len(records)
+    assert len(builder) == 0
+    assert builder.finish().num_rows == 0
@@ -0,0 +1,77 @@
+"""Tests for build metrics: timers, counters, gauges, worker merges and the progress reporter."""
+
+import json
+import zipfile
+
+import pytest
+
+from medirag.core.metrics import METRICS, Metrics, MetricsReporter
+from medirag.core.reader import parse_spl_zip
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+
+
+def test_metrics_snapshot():
+    m = Metrics()
+    with m.time("parse"):
+        pass
+    m.add_time("parse", 1.5)
+    m.count("spls", 3)
+    m.count("spls")
+    for depth in (2, 0, 1):
+        m.gauge("queue.to_embed", depth)
+
+    snap = m.snapshot()
+    assert snap["stages"]["parse"]["calls"] == 2
+    assert snap["stages"]["parse"]["seconds"] >= 1.5
+    assert snap["counters"] == {"spls": 4}
+    assert snap["rates_per_s"]["spls"] > 0
+    assert snap["gauges"]["queue.to_embed"] == {"last": 1, "max": 2, "mean": 1.0}
+    assert "4 spls" in m.summary() and "queue.to_embed 1.0" in m.summary()
+
+
+def test_drain_and_merge_move_a_workers_numbers():
+    worker, parent = Metrics(), Metrics()
+    worker.add_time("embed", 2.0, calls=4)
+    worker.count("records", 10)
+    parent.count("records", 5)
+
+    parent.merge(worker.drain())
+    parent.merge(worker.drain())  # nothing new since the first drain
+
+    snap = parent.snapshot()
+    assert snap["stages"]["embed"] == {"seconds": 2.0, "calls": 4}
+    assert snap["counters"]["records"] == 15
+    assert worker.snapshot()["counters"] == {}
+
+
+def test_reporter_writes_json_on_close(tmp_path):
+    m = Metrics()
+    m.count("spls", 7)
+    path = tmp_path / "metrics.json"
+    with MetricsReporter(m, path, every=3600):
+        m.count("records", 70)
+    written = json.loads(path.read_text())
+    assert written["counters"] == {"records": 70, "spls": 7}
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_zip_parse_records_unzip_parse_and_clean(data_dir, tmp_path, workers):
+    xml = (data_dir / SAMPLE_XML).read_bytes()
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w") as z:
+        for i in range(3):
+            z.writestr(f"spl_{i}.xml", xml)
+
+    METRICS.reset()
+    assert len(list(parse_spl_zip(bundle, engine="iterparse", workers=workers))) == 3
+    snap = METRICS.snapshot()
+    assert snap["counters"]["xml_bytes"] == 3 * len(xml)
+    assert snap["stages"]["unzip"]["calls"] == 3
+    # With workers, parse and clean happen in the pool and reach this process through merge(). Clean is timed
+    # inside parse and recorded once per SPL.
+    assert snap["stages"]["parse"]["calls"] == 3
+    assert snap["stages"]["clean"]["calls"] == 3
+    assert 0 < snap["stages"]["clean"]["seconds"] <= snap["stages"]["parse"]["seconds"]
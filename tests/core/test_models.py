@@ -0,0 +1,96 @@
+"""Tests for the model registry, with a stand-in for SentenceTransformer so no model is downloaded."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+import torch
+
+import medirag.core.models as models
+import medirag.index.lance as lance
+from medirag.core.models import ModelRegistry
+from medirag.core.reader import parse_spl
+from medirag.index.lance import LanceIndexer
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+DIM = 8
+
+
+class FakeModel:
+    loads: list[tuple[str, str]] = []
+
+    def __init__(self, name: str, device: str):
+        time.sleep(0.01)  # wide enough a window for concurrent get() calls to race
+        FakeModel.loads.append((name, device))
+        self.weight = torch.zeros(DIM, DIM)
+        self.encoded = 0
+        self.tokenizer = None
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        vectors = np.array([[hash(t) % 97 + 1, len(t), *([1.0] * (DIM - 2))] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def parameters(self):
+        return iter([self.weight])
+
+    def buffers(self):
+        return iter([torch.zeros(DIM)])
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    FakeModel.loads = []
+    monkeypatch.setattr(models, "SentenceTransformer", FakeModel)
+    return FakeModel.loads
+
+
+def test_each_model_and_device_loads_once(fake_models):
+    registry = ModelRegistry()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("m", "cpu"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert fake_models == [("m", "cpu")]
+    assert all(r is results[0] for r in results)
+    assert registry.get("m", "cuda") is not results[0]
+    assert registry.dimension("m") == DIM  # read off a loaded instance
+    assert fake_models == [("m", "cpu"), ("m", "cuda")]
+
+
+def test_warm_up_and_memory_report(fake_models):
+    registry = ModelRegistry()
+    assert registry.memory_report() == []
+    model = registry.warm_up("m", "cpu")
+    assert model.encoded == 1
+
+    (report,) = registry.memory_report()
+    assert (report.model, report.device, report.parameters) == ("m", "cpu", DIM * DIM)
+    assert report.bytes == (DIM * DIM + DIM) * 4
+
+
+def test_search_only_loads_the_query_encoder(fake_models, monkeypatch, data_dir, tmp_path):
+    monkeypatch.setattr(models, "default_device", lambda: "gpu")
+    monkeypatch.setattr(lance, "default_device", lambda: "gpu")
+
+    monkeypatch.setattr(lance, "MODELS", ModelRegistry())
+    indexer = LanceIndexer(db_path=tmp_path / "lance", embed_model="m")
+    assert fake_models == []  # nothing loads until something is encoded
+    indexer.add(parse_spl(data_dir / SAMPLE_XML))
+    assert fake_models == [("m", "gpu")]
+
+    # A fresh process opening the table for search: only the CPU query encoder loads.
+    fake_models.clear()
+    monkeypatch.setattr(lance, "MODELS", ModelRegistry())
+    reader = LanceIndexer(db_path=tmp_path / "lance", embed_model="m")
+    assert fake_models == []
+    assert reader.retrieve("urinary tract infection", top_k=2)
+    assert fake_models == [("m", "cpu")]
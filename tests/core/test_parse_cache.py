@@ -0,0 +1,61 @@
+import zipfile
+
+import pyarrow.dataset as ds
+import pytest
+
+from medirag.core import reader
+from medirag.core.parse_cache import ParseCache
+from medirag.core.reader import parse_spl, parse_spl_zip
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+
+
+@pytest.fixture
+def bundle(data_dir, tmp_path):
+    xml = (data_dir / SAMPLE_XML).read_bytes()
+    outer_zip = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(outer_zip, "w") as outer:
+        for i in range(3):
+            outer.writestr(f"spl_{i}.xml", xml.replace(b"BE27854A-A805-4300-9729-ACCD1B7F226F", f"SET-{i}".encode()))
+    return outer_zip
+
+
+def test_round_trip_through_parquet(data_dir, tmp_path):
+    data = (data_dir / SAMPLE_XML).read_bytes()
+    records = parse_spl(data)
+    key = ParseCache.key(data)
+
+    with ParseCache(tmp_path / "cache") as cache:
+        assert cache.get(key) is None
+        cache.put(key, records)
+
+    reopened = ParseCache(tmp_path / "cache")
+    assert len(reopened) == 1
+    assert reopened.get(key) == records
+    assert (reopened.hits, reopened.misses) == (1, 0)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rerun_skips_parse_on_hit(bundle, tmp_path, monkeypatch, workers):
+    with ParseCache(tmp_path / "cache") as cache:
+        first = list(parse_spl_zip(bundle, engine="iterparse", workers=workers, cache=cache))
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("parse_spl called on a cache hit")
+
+    monkeypatch.setattr(reader, "parse_spl", _fail)
+    with ParseCache(tmp_path / "cache") as cache:
+        second = list(parse_spl_zip(bundle, engine="iterparse", workers=workers, cache=cache))
+        assert cache.hits == 3
+    assert second == first
+
+
+def test_cache_is_a_columnar_corpus(bundle, tmp_path):
+    with ParseCache(tmp_path / "cache", flush_every=2) as cache:
+        list(parse_spl_zip(bundle, cache=cache))
+
+    corpus = ParseCache(tmp_path / "cache").dataset()
+    cards = corpus.to_table(filter=ds.field("kind") == "product_card", columns=["set_id", "version"])
+    assert sorted(cards.column("set_id").to_pylist()) == ["SET-0", "SET-1", "SET-2"]
+    assert set(cards.column("version").to_pylist()) == {"1"}
@@ -1,11 +1,48 @@
-from medirag.core.reader import ProductCard, SectionRecord, parse_spl
+import re
+import zipfile
+
+import pytest
+
+from medirag.core.reader import (
+    ENGINES,
+    ProductCard,
+    SectionRecord,
+    iter_spl_xml,
+    parse_spl,
+    parse_spl_zip,
+    parse_spl_zip_members,
+)
 
 
 SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
 
 
-def test_product_card_basic_identity(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    """
+    Run every extraction test against both parser engines.
+    """
+    return request.param
+
+
+def test_engines_emit_identical_records(data_dir):
+    soup = parse_spl(data_dir / SAMPLE_XML, engine="soup")
+    streamed = parse_spl((data_dir / SAMPLE_XML).read_bytes(), engine="iterparse")
+    assert streamed == soup
+
+
+def test_spl_without_set_id_is_skipped(data_dir, engine):
+    xml = re.sub(rb"<setId\b[^>]*/>", b"", (data_dir / SAMPLE_XML).read_bytes())
+    assert parse_spl(xml, engine=engine) == []
+
+
+def test_unknown_engine_rejected(data_dir):
+    with pytest.raises(ValueError):
+        parse_spl(data_dir / SAMPLE_XML, engine="regex")
+
+
+def test_product_card_basic_identity(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     cards = [r for r in records if isinstance(r, ProductCard)]
     assert len(cards) == 1
     card = cards[0]
@@ -17,8 +54,8 @@ def test_product_card_basic_identity(data_dir):
     assert card.route == "ORAL"
 
 
-def test_product_card_active_ingredients(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_product_card_active_ingredients(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     card = next(r for r in records if isinstance(r, ProductCard))
 
     ai_names = {a["name"].lower() for a in card.active_ingredients}
@@ -37,8 +74,8 @@ def test_product_card_active_ingredients(data_dir):
     assert ("50", "mg") in strengths
 
 
-def test_product_card_inactive_ingredients_for_allergy_queries(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_product_card_inactive_ingredients_for_allergy_queries(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     card = next(r for r in records if isinstance(r, ProductCard))
     lower = {n.lower() for n in card.inactive_ingredients}
     # important for allergy/diet questions
@@ -47,8 +84,8 @@ def test_product_card_inactive_ingredients_for_allergy_queries(data_dir):
     assert "magnesium stearate" in lower
 
 
-def test_product_card_physical_appearance(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_product_card_physical_appearance(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     card = next(r for r in records if isinstance(r, ProductCard))
     # the XML has two SPLCOLOR characteristics (Green, Yellow); last one wins
     assert card.appearance.get("SPLSHAPE") == "CAPSULE"
@@ -57,16 +94,16 @@ def test_product_card_physical_appearance(data_dir):
     assert "SPLCOLOR" in card.appearance
 
 
-def test_product_card_ndcs(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_product_card_ndcs(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     card = next(r for r in records if isinstance(r, ProductCard))
     assert "0049-0920" in card.ndcs
     assert "0049-0920-50" in card.ndcs
     assert "0049-0920-41" in card.ndcs
 
 
-def test_product_card_text_is_searchable_prose(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_product_card_text_is_searchable_prose(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     card = next(r for r in records if isinstance(r, ProductCard))
     text = card.text.lower()
     assert "urobiotic" in text
@@ -77,8 +114,8 @@ def test_product_card_text_is_searchable_prose(data_dir):
     assert "gelatin" in text
 
 
-def test_all_narrative_sections_extracted(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_all_narrative_sections_extracted(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     sections = [r for r in records if isinstance(r, SectionRecord)]
     loincs = {s.loinc for s in sections}
 
@@ -91,8 +128,8 @@ def test_all_narrative_sections_extracted(data_dir):
     assert "34069-5" in loincs  # How Supplied
 
 
-def test_section_text_preserves_dose_punctuation(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_section_text_preserves_dose_punctuation(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     sections = [r for r in records if isinstance(r, SectionRecord)]
     dosage = next(s for s in sections if s.loinc == "34068-7")
     # regression for old no_punct=True bug that turned "1 capsule" into mush
@@ -102,8 +139,8 @@ def test_section_text_preserves_dose_punctuation(data_dir):
     assert "sulfonamide" in contra.text.lower()
 
 
-def test_section_text_carries_drug_and_section_context(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_section_text_carries_drug_and_section_context(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     sections = [r for r in records if isinstance(r, SectionRecord)]
     for s in sections:
         # embedding-time context prefix
@@ -111,16 +148,16 @@ def test_section_text_carries_drug_and_section_context(data_dir):
         assert s.section_title in s.text
 
 
-def test_section_metadata_is_patient_facing_flag(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_section_metadata_is_patient_facing_flag(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     sections = [r for r in records if isinstance(r, SectionRecord)]
     # this XML predates the patient-counseling-section standard; no patient-facing sections
     # but the flag should exist on every record and be False here
     assert all(isinstance(s.is_patient_facing, bool) for s in sections)
 
 
-def test_skip_useless_sections(data_dir):
-    records = parse_spl(data_dir / SAMPLE_XML)
+def test_skip_useless_sections(data_dir, engine):
+    records = parse_spl(data_dir / SAMPLE_XML, engine=engine)
     sections = [r for r in records if isinstance(r, SectionRecord)]
     # principal display panel etc. should never appear
     assert "51945-4" not in {s.loinc for s in sections}
@@ -128,3 +165,57 @@ def test_skip_useless_sections(data_dir):
     for s in sections:
         body = s.text.split(":\n", 1)[1] if ":\n" in s.text else s.text
         assert body.strip()
+
+
+def _write_bundle(data_dir, tmp_path, n: int, compression: int = zipfile.ZIP_STORED):
+    """
+    DailyMed-shaped outer.zip → spl_i.zip → spl_i.xml, with a distinct setId per SPL.
+    """
+    xml = (data_dir / SAMPLE_XML).read_bytes()
+    outer_zip = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(outer_zip, "w", compression=compression) as outer:
+        for i in range(n):
+            spl = xml.replace(b"BE27854A-A805-4300-9729-ACCD1B7F226F", f"SET-{i:03d}".encode())
+            inner_zip = tmp_path / f"spl_{i}.zip"
+            with zipfile.ZipFile(inner_zip, "w", compression=zipfile.ZIP_DEFLATED) as inner:
+                inner.writestr(f"spl_{i}.xml", spl)
+            outer.write(inner_zip, arcname=inner_zip.name)
+    return outer_zip
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_iter_spl_xml_reads_nested_zips(data_dir, tmp_path, compression):
+    """
+    STORED inner zips are read in place from the mapped outer file; DEFLATED ones are buffered.
+    """
+    bundle = _write_bundle(data_dir, tmp_path, 3, compression=compression)
+    members = list(iter_spl_xml(bundle))
+    assert [m for m, _ in members] == [f"spl_{i}.zip/spl_{i}.xml" for i in range(3)]
+    assert all(data.startswith(b"<?xml") and f"SET-{i:03d}".encode() in data for i, (_, data) in enumerate(members))
+
+
+def test_parallel_zip_parse_matches_serial(data_dir, tmp_path):
+    bundle = _write_bundle(data_dir, tmp_path, 6)
+    serial = list(parse_spl_zip(bundle, engine="iterparse"))
+    parallel = list(parse_spl_zip(bundle, engine="iterparse", workers=2, max_in_flight=3))
+    assert parallel == serial
+    assert [records[0].set_id for records in parallel] == [f"SET-{i:03d}" for i in range(6)]
+
+    unordered = list(parse_spl_zip(bundle, engine="iterparse", workers=2, ordered=False))
+    assert sorted(r[0].set_id for r in unordered) == sorted(r[0].set_id for r in serial)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_zip_parse_resumes_after_member(data_dir, tmp_path, workers):
+    bundle = _write_bundle(data_dir, tmp_path, 4)
+    last = "spl_1.zip/spl_1.xml"
+    resumed = list(parse_spl_zip_members(bundle, engine="iterparse", workers=workers, start_after=last))
+    assert [member for member, _ in resumed] == ["spl_2.zip/spl_2.xml", "spl_3.zip/spl_3.xml"]
+    assert [records[0].set_id for _, records in resumed] == ["SET-002", "SET-003"]
+
+
+def test_zip_shards_partition_the_bundle(data_dir, tmp_path):
+    bundle = _write_bundle(data_dir, tmp_path, 7)
+    shards = [[m for m, _ in iter_spl_xml(bundle, shard=(i, 3))] for i in range(3)]
+    assert shards[0] == ["spl_0.zip/spl_0.xml", "spl_3.zip/spl_3.xml", "spl_6.zip/spl_6.xml"]
+    assert sorted(sum(shards, [])) == sorted(m for m, _ in iter_spl_xml(bundle))
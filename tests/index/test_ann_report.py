@@ -0,0 +1,20 @@
+"""Unit tests for the ANN recall-vs-latency report's scoring helpers."""
+
+import numpy as np
+
+from medirag.index.ann_report import _format, _recall, _result
+
+
+def test_recall_is_share_of_exact_hits_found():
+    truth = [[1, 2, 3, 4], [5, 6, 7, 8]]
+    found = [[1, 2, 9, 10], [8, 7, 6, 5]]
+    assert _recall(truth, found) == 0.75
+
+
+def test_result_reports_percentiles():
+    latencies = np.arange(1, 101, dtype=float)
+    result = _result("IVF_PQ nprobes=10 refine=1", [[1]], [[1]], latencies)
+    assert result.recall == 1.0
+    assert result.p50_ms == 50.5
+    assert round(result.p99_ms, 2) == 99.01
+    assert "IVF_PQ nprobes=10 refine=1" in _format([result], top_k=1)
@@ -0,0 +1,73 @@
+"""Unit tests for build checkpoint manifests, against a stand-in for LanceIndexer (no model download)."""
+
+from medirag.index.checkpoint import Checkpoint, checkpoint_path, rollback
+
+
+class FakeTable:
+    def __init__(self, version):
+        self.version = version
+        self.restored_to = None
+
+    def restore(self, version):
+        self.restored_to = version
+        self.version += 1  # restoring commits a new version with the old contents
+
+
+class FakeIndexer:
+    table_name = "spl"
+
+    def __init__(self, version=None):
+        self.table = FakeTable(version) if version is not None else None
+        self.dropped = False
+
+    def drop_table(self):
+        self.dropped = True
+        self.table = None
+
+
+def test_commits_round_trip(tmp_path):
+    path = checkpoint_path(tmp_path, "spl")
+    indexer = FakeIndexer(version=7)
+    checkpoint = Checkpoint(table_version=None)
+    checkpoint.commit(path, indexer, "part1.zip", "a.zip/a.xml", spls=3, records=30)
+    checkpoint.finish_part(path, indexer, "part1.zip")
+    indexer.table.version = 9
+    checkpoint.commit(path, indexer, "part2.zip", "b.zip/b.xml", spls=2, records=12)
+
+    loaded = Checkpoint.load(path)
+    assert loaded == checkpoint
+    assert (loaded.table_version, loaded.done, loaded.spls, loaded.records) == (9, ["part1.zip"], 5, 42)
+    assert loaded.start_after("part2.zip") == "b.zip/b.xml"
+    assert loaded.start_after("part3.zip") is None
+
+
+def test_missing_checkpoint_loads_as_none(tmp_path):
+    assert Checkpoint.load(checkpoint_path(tmp_path, "spl")) is None
+
+
+def test_rollback_restores_recorded_version():
+    indexer = FakeIndexer(version=5)
+    rollback(indexer, Checkpoint(table_version=4))
+    assert indexer.table.restored_to == 4
+
+    current = FakeIndexer(version=4)
+    rollback(current, Checkpoint(table_version=4))
+    assert current.table.restored_to is None
+
+
+def test_rollback_drops_table_created_after_checkpoint():
+    indexer = FakeIndexer(version=2)
+    rollback(indexer, Checkpoint(table_version=None))
+    assert indexer.dropped
+
+
+def test_resume_of_finished_build_opens_nothing(tmp_path):
+    from medirag.index.runner import main
+
+    path = checkpoint_path(tmp_path / "db", "spl")
+    path.parent.mkdir()
+    Checkpoint(table_version=3, complete=True).save(path)
+    argv = ["--source", "part1.zip", "--db", str(tmp_path / "db"), "--resume"]
+    argv += ["--embed-cache", str(tmp_path / "embed"), "--parse-cache", str(tmp_path / "parse")]
+    assert main(argv) == 0
+    assert not (tmp_path / "embed").exists() and not (tmp_path / "parse").exists()
@@ -0,0 +1,85 @@
+"""Unit tests for delta indexing, against an in-memory stand-in for LanceIndexer (no model download)."""
+
+from dataclasses import replace
+
+import pytest
+
+from medirag.core.reader import parse_spl
+from medirag.index.delta import apply_updates, is_newer
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+
+
+class MemoryIndexer:
+    def __init__(self):
+        self.rows = []
+
+    def spl_versions(self, set_ids):
+        wanted = set(set_ids)
+        return {r.set_id: r.version for r in self.rows if r.set_id in wanted}
+
+    def replace_spls(self, records, set_ids):
+        self.rows = [r for r in self.rows if r.set_id not in set_ids]
+        self.rows.extend(records)
+        return len(records)
+
+
+@pytest.fixture
+def sample(data_dir):
+    return parse_spl(data_dir / SAMPLE_XML)
+
+
+def _spl(records, set_id, version, drop_sections=0):
+    kept = records[: len(records) - drop_sections] if drop_sections else records
+    return f"{set_id}_{version}.zip/{set_id}.xml", [replace(r, set_id=set_id, version=version) for r in kept]
+
+
+def test_is_newer():
+    assert is_newer("10", "9")
+    assert not is_newer("9", "10")
+    assert not is_newer("3", "3")
+    assert is_newer("3", None)
+
+
+def test_new_spls_are_added(sample):
+    indexer = MemoryIndexer()
+    stats = apply_updates([_spl(sample, "a", "1"), _spl(sample, "b", "1")], indexer)
+    assert (stats.added, stats.updated, stats.unchanged) == (2, 0, 0)
+    assert stats.records == len(indexer.rows) == 2 * len(sample)
+
+
+def test_new_version_replaces_all_old_rows(sample):
+    indexer = MemoryIndexer()
+    apply_updates([_spl(sample, "a", "1"), _spl(sample, "b", "1")], indexer)
+
+    stats = apply_updates([_spl(sample, "a", "2", drop_sections=2)], indexer)
+    assert (stats.added, stats.updated, stats.unchanged) == (0, 1, 0)
+    rows_a = [r for r in indexer.rows if r.set_id == "a"]
+    assert len(rows_a) == len(sample) - 2
+    assert {r.version for r in rows_a} == {"2"}
+    assert sum(r.set_id == "b" for r in indexer.rows) == len(sample)
+
+
+def test_unchanged_and_older_versions_are_skipped(sample):
+    indexer = MemoryIndexer()
+    apply_updates([_spl(sample, "a", "5")], indexer)
+    before = list(indexer.rows)
+
+    stats = apply_updates([_spl(sample, "a", "5"), _spl(sample, "a", "4")], indexer, batch_size=1)
+    assert (stats.added, stats.updated, stats.unchanged, stats.records) == (0, 0, 2, 0)
+    assert indexer.rows == before
+
+
+def test_newest_version_in_one_bundle_wins(sample):
+    indexer = MemoryIndexer()
+    stats = apply_updates([_spl(sample, "a", "2"), _spl(sample, "a", "3"), _spl(sample, "a", "1")], indexer)
+    assert (stats.added, stats.unchanged) == (1, 2)
+    assert {r.version for r in indexer.rows} == {"3"}
+
+
+def test_each_write_reports_its_last_member(sample):
+    commits = []
+    spls = [_spl(sample, "a", "1"), _spl(sample, "b", "1"), _spl(sample, "c", "1")]
+    apply_updates(spls, MemoryIndexer(), batch_size=2 * len(sample), on_commit=lambda *args: commits.append(args))
+    assert commits == [("b_1.zip/b.xml", 2, 2 * len(sample)), ("c_1.zip/c.xml", 1, len(sample))]
@@ -0,0 +1,63 @@
+"""Unit tests for the on-disk (model, text) → vector cache."""
+
+import numpy as np
+import pytest
+
+from medirag.index.embed_cache import EmbeddingCache
+
+
+DIM = 4
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.seen: list[str] = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return np.array([[len(t), 0, 0, 1] for t in texts], dtype=np.float32)
+
+
+def test_reused_texts_skip_the_encoder(tmp_path):
+    encoder = CountingEncoder()
+    with EmbeddingCache(tmp_path, "m", DIM) as cache:
+        first = cache.embed(["aa", "bbb", "aa"], encoder)
+        second = cache.embed(["bbb", "c"], encoder)
+    assert encoder.seen == ["aa", "bbb", "c"]  # duplicates within a batch are encoded once
+    assert first[:, 0].tolist() == [2, 3, 2]
+    assert second[:, 0].tolist() == [3, 1]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_cache_persists_across_opens(tmp_path):
+    with EmbeddingCache(tmp_path, "m", DIM) as cache:
+        cache.embed(["label text"], CountingEncoder())
+
+    encoder = CountingEncoder()
+    reopened = EmbeddingCache(tmp_path, "m", DIM)
+    vectors = reopened.embed(["label text"], encoder)
+    assert encoder.seen == []
+    assert vectors[0].tolist() == [10, 0, 0, 1]
+    assert reopened.hit_rate == 1.0
+
+
+def test_model_name_is_part_of_the_key(tmp_path):
+    with EmbeddingCache(tmp_path, "model-a", DIM) as cache:
+        cache.put("same text", np.ones(DIM))
+    other = EmbeddingCache(tmp_path, "model-b", DIM)
+    assert other.get("same text") is None
+
+
+def test_size_cap_evicts_oldest(tmp_path):
+    cache = EmbeddingCache(tmp_path, "m", DIM, max_entries=2)
+    for text in ["a", "bb", "ccc"]:
+        cache.put(text, np.full(DIM, len(text)))
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("ccc")[0] == 3
+
+
+def test_dim_mismatch_rejected(tmp_path):
+    EmbeddingCache(tmp_path, "m", DIM).close()
+    with pytest.raises(ValueError):
+        EmbeddingCache(tmp_path, "m", DIM * 2)
@@ -0,0 +1,33 @@
+"""Unit tests for SplFilter's SQL rendering."""
+
+from medirag.index.filters import SCALAR_INDEXES, SplFilter
+
+
+def test_empty_filter_is_none():
+    assert SplFilter().to_sql() is None
+
+
+def test_conditions_are_anded_in_index_friendly_forms():
+    sql = SplFilter(set_ids=["a", "b"], kind="section", patient_facing=True, ndcs=["0049-0920"]).to_sql()
+    assert sql == (
+        "set_id IN ('a', 'b') AND kind = 'section' AND is_patient_facing = true "
+        "AND array_has_any(ndcs, ['0049-0920'])"
+    )
+
+
+def test_values_are_quoted():
+    assert SplFilter(drug_names=["St. John's Wort"]).to_sql() == "drug_name = 'St. John''s Wort'"
+
+
+def test_every_filter_column_is_indexed():
+    columns = {
+        "set_id",
+        "drug_name",
+        "loinc",
+        "kind",
+        "is_patient_facing",
+        "ndcs",
+        "active_ingredient_uniis",
+        "active_ingredient_names",
+    }
+    assert set(SCALAR_INDEXES) == columns
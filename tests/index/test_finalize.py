@@ -0,0 +1,45 @@
+"""Finalize stage: compaction, index rebuild and version pruning on a small real table.
+
+Downloads the PubMedBERT model on first run, like tests/index/test_lance.py.
+"""
+
+from dataclasses import replace
+
+from medirag.core.reader import parse_spl
+from medirag.index.finalize import finalize, optimize
+from medirag.index.lance import LanceIndexer
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+
+
+def test_finalize_compacts_and_prunes(data_dir, tmp_path):
+    records = parse_spl(data_dir / SAMPLE_XML)
+    indexer = LanceIndexer(db_path=tmp_path / "lance")
+    for i in range(3):
+        indexer.add([replace(r, set_id=f"SET-{i}") for r in records])
+
+    before, after = finalize(indexer)
+    assert before.fragments == 3
+    assert after.fragments == 1
+    assert after.rows == before.rows == 3 * len(records)
+    assert after.versions < before.versions
+
+    names = {i.name for i in indexer.table.list_indices()}
+    assert {"text_idx", "set_id_idx"} <= names
+    assert indexer.retrieve("urinary tract infection", top_k=2, hybrid=True)
+
+
+def test_optimize_updates_indexes_in_place(data_dir, tmp_path):
+    records = parse_spl(data_dir / SAMPLE_XML)
+    indexer = LanceIndexer(db_path=tmp_path / "lance")
+    indexer.add([replace(r, set_id="SET-0") for r in records])
+    finalize(indexer)
+    indexes = {i.name for i in indexer.table.list_indices()}
+
+    indexer.add([replace(r, set_id="SET-1") for r in records])
+    _, after = optimize(indexer)
+    assert after.rows == 2 * len(records)
+    assert after.versions > 1  # a day of history is kept for readers of the previous version
+    assert {i.name for i in indexer.table.list_indices()} == indexes
+    assert indexer.table.index_stats("text_idx").num_unindexed_rows == 0
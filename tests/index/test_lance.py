@@ -3,10 +3,19 @@
 These tests download the PubMedBERT model on first run (cached afterwards).
 """
 
+import asyncio
+import threading
+
+import lancedb
 import pytest
 
+import medirag.index.rerank as rerank
+from medirag.core.columnar import to_record_batch
 from medirag.core.reader import parse_spl
-from medirag.index.lance import LanceIndexer
+from medirag.index.filters import SplFilter
+from medirag.index.lance import EMBED_MODEL, LanceIndexer
+from medirag.index.query_cache import QueryEmbeddingCache
+from medirag.index.rerank import CrossEncoderReranker
 
 
 SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
@@ -98,3 +107,141 @@ def test_persistence_across_indexer_instances(data_dir, tmp_path):
     reopened = LanceIndexer(db_path=tmp_path / "lance")
     hits = reopened.retrieve("urinary tract infection", top_k=2)
     assert len(hits) > 0
+
+
+def test_add_record_batch(data_dir, tmp_path):
+    """
+    Columnar inserts land the same rows as dataclass inserts.
+    """
+    records = parse_spl(data_dir / SAMPLE_XML)
+    indexer = LanceIndexer(db_path=tmp_path / "lance")
+    assert indexer.add(to_record_batch(records)) == len(records)
+    assert indexer.table.count_rows() == len(records)
+    hits = indexer.retrieve("urinary tract infection", top_k=2)
+    assert len(hits) > 0
+
+
+def test_vector_index_skipped_for_small_tables(lance_index):
+    assert lance_index.create_vector_index("IVF_PQ") is False
+    with pytest.raises(ValueError):
+        lance_index.create_vector_index("IVF_FLAT")
+
+
+def test_retrieve_accepts_ann_knobs(lance_index):
+    """
+    Without a vector index the knobs are no-ops, and results match the plain flat scan.
+    """
+    plain = lance_index.retrieve("urinary tract infection", top_k=3)
+    tuned = lance_index.retrieve("urinary tract infection", top_k=3, nprobes=20, refine_factor=5)
+    assert [h.text for h in tuned] == [h.text for h in plain]
+
+
+def test_typed_filters_use_scalar_indexes(lance_index):
+    lance_index.create_scalar_indexes()
+    assert {i.name for i in lance_index.table.list_indices()} >= {"set_id_idx", "ndcs_idx", "is_patient_facing_idx"}
+
+    hits = lance_index.retrieve_for_ndc("how many capsules should I take", "0049-0920-50", top_k=5)
+    assert hits and all(h.set_id == "BE27854A-A805-4300-9729-ACCD1B7F226F" for h in hits)
+    assert lance_index.retrieve_for_ndc("dosage", "0000-0000-00") == []
+    assert lance_index.retrieve_for_drug("dosage", "Urobiotic", top_k=2)
+    assert lance_index.retrieve_patient_facing("dosage", top_k=2) == []  # sample label has no patient sections
+
+
+def test_retrieve_many_matches_retrieve(lance_index):
+    queries = ["urinary tract infection", "nausea diarrhea side effects", "how many capsules should I take"]
+    batched = lance_index.retrieve_many(queries, top_k=3, max_workers=2)
+    assert [[h.text for h in hits] for hits in batched] == [
+        [h.text for h in lance_index.retrieve(q, top_k=3)] for q in queries
+    ]
+
+
+def test_retrieve_many_filters(lance_index):
+    queries = ["dosage", "dosage"]
+    shared = lance_index.retrieve_many(queries, top_k=2, where=SplFilter(kind="product_card"))
+    assert all(h.kind == "product_card" for hits in shared for h in hits)
+
+    per_query = lance_index.retrieve_many(queries, top_k=2, where=[SplFilter(patient_facing=True), None])
+    assert per_query[0] == [] and per_query[1]
+    with pytest.raises(ValueError):
+        lance_index.retrieve_many(queries, where=[None])
+
+
+@pytest.mark.parametrize("hybrid", [False, True])
+def test_retrieve_arrow_reads_only_the_requested_columns(lance_index, hybrid):
+    rows = lance_index.retrieve_arrow("urinary tract infection", top_k=3, hybrid=hybrid, columns=["set_id", "loinc"])
+    assert rows.column_names == ["set_id", "loinc", "score"]
+    hits = lance_index.retrieve("urinary tract infection", top_k=3, hybrid=hybrid)
+    assert rows.column("loinc").to_pylist() == [h.loinc for h in hits]
+    assert rows.column("score").to_pylist() == pytest.approx([h.score for h in hits])
+
+    empty = LanceIndexer(db_path=lance_index.db_path, table_name="missing").retrieve_arrow("x", columns=["set_id"])
+    assert empty.num_rows == 0 and empty.column_names == ["set_id", "score"]
+
+
+@pytest.mark.parametrize("hybrid", [False, True])
+def test_aretrieve_matches_retrieve(lance_index, hybrid, monkeypatch):
+    queries = ["urinary tract infection", "Urobiotic", "nausea diarrhea side effects"]
+    where = SplFilter(kind="section")
+    connects = []
+    connect_async = lancedb.connect_async
+
+    async def counting_connect(*args, **kwargs):
+        connects.append(args)
+        return await connect_async(*args, **kwargs)
+
+    monkeypatch.setattr(lancedb, "connect_async", counting_connect)
+
+    async def run():
+        return await asyncio.gather(*(lance_index.aretrieve(q, top_k=3, hybrid=hybrid, where=where) for q in queries))
+
+    expected = [[h.text for h in lance_index.retrieve(q, top_k=3, hybrid=hybrid, where=where)] for q in queries]
+    assert [[h.text for h in hits] for hits in asyncio.run(run())] == expected
+    assert len(connects) == 1  # the concurrent first requests share one async table handle
+
+
+def test_aretrieve_encodes_off_the_event_loop(lance_index):
+    encoded_on = []
+    encode = lance_index.encode_query
+
+    def spy(query):
+        encoded_on.append(threading.current_thread().name)
+        return encode(query)
+
+    lance_index.encode_query = spy
+    assert asyncio.run(lance_index.aretrieve("urinary tract infection", top_k=2))
+    assert encoded_on and encoded_on[0].startswith("query-encode")
+
+    lance_index.close()
+    with pytest.raises(RuntimeError, match="shutdown"):
+        asyncio.run(lance_index.aretrieve("urinary tract infection", top_k=2))
+
+
+def test_query_cache_skips_the_encoder(lance_index):
+    lance_index.query_cache = QueryEmbeddingCache(EMBED_MODEL)
+    first = lance_index.retrieve("urinary tract infection", top_k=3)
+    again = lance_index.retrieve_many(["urinary tract infection", "Urinary  tract infection"], top_k=3)
+    assert lance_index.query_cache.stats()["misses"] == 2  # case is kept, whitespace isn't
+    assert [h.text for h in again[0]] == [h.text for h in first]
+    assert lance_index.query_cache.hits == 1
+
+
+def test_reranker_rescores_overfetched_candidates(lance_index, monkeypatch):
+    scored = []
+
+    class WordOverlap:
+        def predict(self, pairs, **kwargs):
+            scored.extend(pairs)
+            return [float(sum(w in text.lower() for w in query.split())) for query, text in pairs]
+
+    monkeypatch.setattr(rerank.MODELS, "cross_encoder", lambda name, device=None: WordOverlap())
+    lance_index.reranker = CrossEncoderReranker(overfetch=3, budget_ms=None)
+
+    hits = lance_index.retrieve("capsules daily dose", top_k=2, with_reranker=True)
+    assert len(hits) == 2 and len(scored) == 6
+    scores = [h.score for h in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert hits[0].score == max(sum(w in text.lower() for w in ("capsules", "daily", "dose")) for _, text in scored)
+
+    async_hits = asyncio.run(lance_index.aretrieve("capsules daily dose", top_k=2, with_reranker=True))
+    assert [h.text for h in async_hits] == [h.text for h in hits]
+    assert len(scored) == 6  # served from the score cache
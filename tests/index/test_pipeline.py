@@ -0,0 +1,87 @@
+"""Unit tests for the threaded parse → embed → write pipeline, using a fake indexer (no model download)."""
+
+import numpy as np
+import pytest
+
+from medirag.core.reader import parse_spl
+from medirag.index.pipeline import BatchEmbedder, BatchSizeTuner, chunk_records, run_pipeline
+
+
+SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
+
+
+class FakeIndexer:
+    """
+    Embeds each text as [len(text), 1.0] and records every batch passed to add().
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.encode_sizes = []
+
+    def embed(self, texts, batch_size=32, encode=None):
+        return (encode or self.encode)(texts)
+
+    def encode(self, texts, batch_size=32):
+        self.encode_sizes.append(len(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    def add(self, rows):
+        self.batches.append(rows)
+        return rows.num_rows
+
+
+@pytest.fixture
+def records(data_dir):
+    return parse_spl(data_dir / SAMPLE_XML)
+
+
+def test_chunk_records_never_splits_an_spl(records):
+    chunks = list(chunk_records([(f"{i}.xml", records) for i in range(5)], batch_size=len(records) * 2))
+    assert [c.spls for c in chunks] == [2, 2, 1]
+    assert [c.last_member for c in chunks] == ["1.xml", "3.xml", "4.xml"]
+    assert sum(c.rows.num_rows for c in chunks) == 5 * len(records)
+
+
+def test_batch_embedder_restores_input_order():
+    indexer = FakeIndexer()
+    texts = ["ccc", "a", "bbbbb", "dd"]
+    vectors = BatchEmbedder(indexer, batch_size=2)(texts)
+    assert vectors[:, 0].tolist() == [3, 1, 5, 2]
+    assert indexer.encode_sizes == [2, 2]
+
+
+def test_tuner_grows_then_settles():
+    tuner = BatchSizeTuner(start=8, max_size=64, probe_calls=1)
+    tuner.record(chars=100, seconds=1.0)  # 100/s at 8
+    assert tuner.size == 16
+    tuner.record(chars=200, seconds=1.0)  # 200/s at 16
+    assert tuner.size == 32
+    tuner.record(chars=190, seconds=1.0)  # worse at 32 → back to 16
+    assert tuner.settled and tuner.size == 16
+
+
+def test_run_pipeline_writes_vectors(records):
+    indexer = FakeIndexer()
+    written = []
+    spls, rows = run_pipeline(
+        chunk_records([("a.xml", records)] * 3, batch_size=len(records)),
+        indexer,
+        BatchEmbedder(indexer, batch_size=4),
+        on_write=written.append,
+    )
+    assert (spls, rows) == (3, 3 * len(records))
+    assert len(written) == 3
+    batch = indexer.batches[0]
+    texts = batch.column("text").to_pylist()
+    assert [v[0] for v in batch.column("vector").to_pylist()] == [len(t) for t in texts]
+
+
+def test_run_pipeline_reraises_stage_errors(records):
+    def broken():
+        yield "a.xml", records
+        raise RuntimeError("corrupt zip")
+
+    indexer = FakeIndexer()
+    with pytest.raises(RuntimeError, match="corrupt zip"):
+        run_pipeline(chunk_records(broken(), batch_size=1), indexer, BatchEmbedder(indexer, batch_size=4))
@@ -0,0 +1,83 @@
+"""Tests for the query embedding cache: LRU + TTL memory tier, on-disk tier, counters."""
+
+import numpy as np
+import pytest
+
+from medirag.index.embed_cache import EmbeddingCache
+from medirag.index.query_cache import QueryEmbeddingCache
+
+
+MODEL = "test/model"
+DIM = 4
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.seen: list[str] = []
+
+    def __call__(self, queries):
+        self.seen.extend(queries)
+        return np.stack([np.full(DIM, len(q), dtype=np.float32) for q in queries])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeats_and_whitespace_variants_hit():
+    cache = QueryEmbeddingCache(MODEL)
+    encoder = FakeEncoder()
+    first = cache.encode(["what is  aspirin?", "dose", "what is aspirin? "], encoder)
+    again = cache.encode([" what is aspirin?"], encoder)
+
+    assert encoder.seen == ["what is  aspirin?", "dose"]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(again[0], first[0])
+    assert (cache.hits, cache.misses) == (2, 2)  # the in-batch repeat counts as a hit
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(MODEL, max_entries=2)
+    encoder = FakeEncoder()
+    cache.encode(["a", "bb"], encoder)
+    cache.encode(["a"], encoder)  # "a" is now the most recent
+    cache.encode(["ccc"], encoder)
+
+    assert len(cache) == 2
+    assert cache.get("bb") is None
+    assert cache.get("a") is not None
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = QueryEmbeddingCache(MODEL, ttl=60, clock=clock)
+    encoder = FakeEncoder()
+    cache.encode(["a"], encoder)
+    clock.now = 59
+    cache.encode(["a"], encoder)
+    clock.now = 61
+    cache.encode(["a"], encoder)
+
+    assert encoder.seen == ["a", "a"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_persistent_tier_survives_restart(tmp_path):
+    encoder = FakeEncoder()
+    cache = QueryEmbeddingCache(MODEL, persistent=EmbeddingCache(tmp_path, MODEL, DIM, max_entries=8))
+    vec = cache.encode(["aspirin"], encoder)
+    cache.close()
+
+    restarted = QueryEmbeddingCache(MODEL, persistent=EmbeddingCache(tmp_path, MODEL, DIM, max_entries=8))
+    np.testing.assert_array_equal(restarted.encode(["aspirin"], encoder), vec)
+    restarted.encode(["aspirin"], encoder)
+    assert encoder.seen == ["aspirin"]
+    assert (restarted.disk_hits, restarted.hits, restarted.misses) == (1, 1, 0)
+
+    with pytest.raises(ValueError):
+        QueryEmbeddingCache("other/model", persistent=EmbeddingCache(tmp_path, MODEL, DIM, max_entries=8))
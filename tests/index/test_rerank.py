@@ -0,0 +1,123 @@
+"""Tests for the latency-budgeted reranker, against a stand-in cross-encoder."""
+
+import time
+
+import pytest
+
+import medirag.index.rerank as rerank
+from medirag.index.lance import RetrievalHit
+from medirag.index.rerank import UNSCORED, CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """
+    Scores a pair by how many query words the passage contains.
+    """
+
+    def __init__(self, ms_per_pair: float = 0.0):
+        self.ms_per_pair = ms_per_pair
+        self.pairs: list[tuple[str, str]] = []
+
+    def predict(self, pairs, **kwargs):
+        time.sleep(self.ms_per_pair * len(pairs) / 1000)
+        self.pairs.extend(pairs)
+        return [float(sum(w in text.split() for w in query.split())) for query, text in pairs]
+
+
+class FakeRegistry:
+    def __init__(self, model):
+        self.model = model
+
+    def cross_encoder(self, name, device=None):
+        return self.model
+
+
+@pytest.fixture
+def cross_encoder(monkeypatch):
+    def install(ms_per_pair: float = 0.0) -> FakeCrossEncoder:
+        model = FakeCrossEncoder(ms_per_pair)
+        monkeypatch.setattr(rerank, "MODELS", FakeRegistry(model))
+        return model
+
+    return install
+
+
+def _hits(*texts):
+    return [
+        RetrievalHit(
+            text=t,
+            drug_name="d",
+            set_id="s",
+            kind="section",
+            loinc="",
+            section_title="",
+            score=float(i),
+            is_patient_facing=False,
+        )
+        for i, t in enumerate(texts)
+    ]
+
+
+def test_rerank_orders_by_cross_encoder_and_caches_scores(cross_encoder):
+    model = cross_encoder()
+    reranker = CrossEncoderReranker(budget_ms=None)
+    hits = _hits("unrelated text", "take with food", "take two capsules with food")
+
+    ranked = reranker.rerank("take  capsules with food", hits, top_k=2)
+    assert [h.text for h in ranked] == ["take two capsules with food", "take with food"]
+    assert [h.score for h in ranked] == [4.0, 3.0]
+    assert len(model.pairs) == 3
+
+    # The same question, whitespace aside, is served from the score cache.
+    again = reranker.rerank("take capsules with food", hits, top_k=2)
+    assert [h.text for h in again] == [h.text for h in ranked]
+    assert len(model.pairs) == 3
+    assert reranker.stats()["cache_hits"] == 3
+
+
+def test_budget_limits_the_candidates_scored(cross_encoder):
+    model = cross_encoder(ms_per_pair=5)
+    reranker = CrossEncoderReranker(budget_ms=20, batch_size=2)
+    hits = _hits(*(f"passage {i}" for i in range(12)))
+
+    # No cost estimate yet: scoring stops at the first batch boundary past the deadline once top_k pairs are scored.
+    first = reranker.rerank("passage 11", hits, top_k=3)
+    assert len(first) == 3
+    assert 4 <= len(model.pairs) < 12
+
+    # With an estimate of at least 5 ms a pair, at most 4 new pairs fit in 20 ms, but never fewer than top_k.
+    model.pairs.clear()
+    reranker.rerank("another question", hits, top_k=3)
+    assert 3 <= len(model.pairs) <= 4
+    assert reranker.stats()["candidates"]["count"] == 2
+
+
+def test_budget_never_scores_fewer_than_top_k(cross_encoder):
+    model = cross_encoder(ms_per_pair=2)
+    reranker = CrossEncoderReranker(budget_ms=1.0, batch_size=1)
+    ranked = reranker.rerank("passage 2", _hits(*(f"passage {i}" for i in range(6))), top_k=3)
+    # The first batch alone blows the budget, but scoring goes on to top_k pairs.
+    assert len(model.pairs) == 3
+    assert ranked[0].text == "passage 2"
+    assert UNSCORED not in [h.score for h in ranked]
+
+
+def test_unscored_candidates_rank_last(cross_encoder):
+    cross_encoder()
+    reranker = CrossEncoderReranker(budget_ms=None)
+    reranker.rerank("c", _hits("c"), top_k=1)
+    reranker._affordable = lambda top_k, cached: 0  # only the cached pair gets a score
+    ranked = reranker.rerank("c", _hits("a", "b", "c"), top_k=3)
+    assert [(h.text, h.score) for h in ranked] == [("c", 1.0), ("a", UNSCORED), ("b", UNSCORED)]
+
+
+def test_retrieval_order_decides_what_the_budget_scores(cross_encoder):
+    model = cross_encoder()
+    reranker = CrossEncoderReranker(budget_ms=1.0)
+    reranker._ms_per_pair = 1.0  # one new pair fits the budget, topped up to top_k
+    ranked = reranker.rerank("c", _hits("a", "b", "c", "d"), top_k=3)
+    assert [text for _, text in model.pairs] == ["a", "b", "c"]
+    assert [h.text for h in ranked] == ["c", "a", "b"]
+
+    ranked = reranker.rerank("d", _hits("a", "b", "c", "d"), top_k=2)
+    assert [h.text for h in ranked] == ["a", "b"]  # "d" was never scored
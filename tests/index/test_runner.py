@@ -1,7 +1,11 @@
 """Smoke test: run the CLI runner end-to-end against a synthetic SPL zip."""
 
+import json
 import zipfile
 
+import pytest
+
+from medirag.core.parse_cache import ParseCache
 from medirag.index.lance import LanceIndexer
 from medirag.index.runner import main
 
@@ -9,21 +13,24 @@ from medirag.index.runner import main
 SAMPLE_XML = "BE27854A-A805-4300-9729-ACCD1B7F226F.xml"
 
 
-def test_runner_indexes_local_zip(data_dir, tmp_path):
+def _write_outer_zip(data_dir, tmp_path, set_ids=("BE27854A",)):
     """
-    parse_spl_zip handles nested zips (zips-of-zips).
-
-    Build one that mirrors DailyMed's structure: outer.zip → spl.zip → spl.xml.
+    A zip that mirrors DailyMed's structure, outer.zip → spl.zip → spl.xml, with one SPL per set_id.
     """
     xml_bytes = (data_dir / SAMPLE_XML).read_bytes()
 
-    inner_zip = tmp_path / "spl_BE27854A.zip"
-    with zipfile.ZipFile(inner_zip, "w") as z:
-        z.writestr(SAMPLE_XML, xml_bytes)
-
     outer_zip = tmp_path / "dm_spl_release_test.zip"
     with zipfile.ZipFile(outer_zip, "w") as z:
-        z.write(inner_zip, arcname=inner_zip.name)
+        for set_id in set_ids:
+            inner_zip = tmp_path / f"spl_{set_id}.zip"
+            with zipfile.ZipFile(inner_zip, "w") as inner:
+                inner.writestr(SAMPLE_XML, xml_bytes.replace(b"BE27854A", set_id.encode()))
+            z.write(inner_zip, arcname=inner_zip.name)
+    return outer_zip
+
+
+def test_runner_indexes_local_zip(data_dir, tmp_path):
+    outer_zip = _write_outer_zip(data_dir, tmp_path)
 
     db_path = tmp_path / "lance"
 
@@ -48,3 +55,57 @@ def test_runner_indexes_local_zip(data_dir, tmp_path):
     hits = reopened.retrieve("urinary tract infection", top_k=2)
     assert len(hits) > 0
     assert all(h.set_id == "BE27854A-A805-4300-9729-ACCD1B7F226F" for h in hits)
+
+
+def test_runner_sharded_build_commits_once(data_dir, tmp_path, monkeypatch):
+    import medirag.index.runner as runner
+
+    monkeypatch.setattr(runner, "build_indexes", lambda *args, **kwargs: None)  # index builds add versions of their own
+    outer_zip = _write_outer_zip(data_dir, tmp_path, set_ids=("AAAAAAAA", "BBBBBBBB", "CCCCCCCC"))
+    db_path = tmp_path / "lance"
+
+    argv = ["--source", str(outer_zip), "--db", str(db_path), "--shards", "2", "--batch-size", "4", "--no-finalize"]
+    with pytest.raises(SystemExit):
+        main([*argv, "--workers", "2"])  # shard workers parse their own slices
+    assert main([*argv, "--parse-cache", str(tmp_path / "parse_cache")]) == 0
+
+    table = LanceIndexer(db_path=db_path).table
+    # The empty table, then one write with every shard's rows, however many batches the shards wrote.
+    assert len(table.list_versions()) == 2
+    set_ids = set(table.to_arrow().column("set_id").to_pylist())
+    assert {s[:8] for s in set_ids} == {"AAAAAAAA", "BBBBBBBB", "CCCCCCCC"}
+    assert not (db_path / "spl.shards").exists()
+    assert len(ParseCache(tmp_path / "parse_cache")) == 3
+
+
+def test_runner_writes_metrics(data_dir, tmp_path):
+    outer_zip = _write_outer_zip(data_dir, tmp_path, set_ids=("AAAAAAAA", "BBBBBBBB"))
+    metrics = tmp_path / "metrics.json"
+
+    rc = main(["--source", str(outer_zip), "--db", str(tmp_path / "lance"), "--metrics", str(metrics), "--pipeline"])
+    assert rc == 0
+
+    snap = json.loads(metrics.read_text())
+    assert snap["counters"]["spls"] == 2
+    assert snap["counters"]["records"] == LanceIndexer(db_path=tmp_path / "lance").table.count_rows()
+    assert snap["counters"]["embed_texts"] == snap["counters"]["records"]
+    assert {"unzip", "parse", "clean", "embed", "write", "finalize"} <= set(snap["stages"])
+    assert "queue.to_embed" in snap["gauges"]
+
+
+def test_runner_keeps_an_existing_tables_vector_index(data_dir, tmp_path, monkeypatch):
+    import medirag.index.runner as runner
+
+    built = []
+    monkeypatch.setattr(runner, "finalize", lambda indexer, vector_index=None, **kwargs: built.append(vector_index))
+    db_path = tmp_path / "lance"
+
+    outer_zip = _write_outer_zip(data_dir, tmp_path, set_ids=("AAAAAAAA",))
+    assert main(["--source", str(outer_zip), "--db", str(db_path)]) == 0
+    monkeypatch.setattr(runner, "existing_vector_index", lambda indexer: "IVF_PQ")
+    outer_zip = _write_outer_zip(data_dir, tmp_path, set_ids=("BBBBBBBB",))
+    assert main(["--source", str(outer_zip), "--db", str(db_path)]) == 0
+    assert main(["--source", str(outer_zip), "--db", str(db_path), "--vector-index", "IVF_HNSW_SQ"]) == 0
+
+    # A new table gets IVF_HNSW_SQ; an existing one keeps its index unless --vector-index says otherwise.
+    assert built == ["IVF_HNSW_SQ", "IVF_PQ", "IVF_HNSW_SQ"]
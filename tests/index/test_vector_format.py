@@ -0,0 +1,59 @@
+"""Unit tests for compact vector formats and the format benchmark (no model download)."""
+
+from types import SimpleNamespace
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from medirag.core.columnar import with_vectors
+from medirag.index.ann_report import Query
+from medirag.index.vector_bench import run_bench
+from medirag.index.vector_format import VectorFormat
+
+
+def _unit(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    v = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_parse_and_normalize():
+    assert VectorFormat.parse("float16") == VectorFormat("float16")
+    assert VectorFormat.parse("float16:256") == VectorFormat("float16", 256)
+    assert str(VectorFormat("float32", 384)) == "float32:384"
+    assert VectorFormat.parse("float32:768").normalized(768).is_default
+    with pytest.raises(ValueError):
+        VectorFormat.parse("int8")
+    with pytest.raises(ValueError):
+        VectorFormat("float16", 1024).normalized(768)
+
+
+def test_apply_truncates_renormalizes_and_casts():
+    vectors = _unit(4, 16)
+    stored = VectorFormat("float16", 8).apply(vectors)
+    assert stored.dtype == np.float16 and stored.shape == (4, 8)
+    np.testing.assert_allclose(np.linalg.norm(stored.astype(np.float32), axis=1), 1.0, atol=1e-3)
+    np.testing.assert_allclose(VectorFormat().apply(vectors), vectors)
+
+
+def test_format_round_trips_through_the_arrow_column():
+    rows = pa.RecordBatch.from_pydict({"text": ["a", "b", "c", "d"]})
+    batch = with_vectors(rows, VectorFormat("float16", 8).apply(_unit(4, 16)))
+    assert batch.schema.field("vector").type == pa.list_(pa.float16(), 8)
+    assert VectorFormat.of_field(batch.schema.field("vector")) == VectorFormat("float16", 8)
+
+
+def test_bench_scores_formats_against_float32(tmp_path):
+    rows = with_vectors(pa.RecordBatch.from_pydict({"text": [str(i) for i in range(300)]}), _unit(300, 32, seed=1))
+    table = lancedb.connect(tmp_path / "db").create_table("spl", pa.Table.from_batches([rows]))
+    indexer = SimpleNamespace(table=table, table_name="spl")
+    queries = [Query(vector=v) for v in _unit(20, 32, seed=2)]
+
+    formats = [VectorFormat("float16"), VectorFormat("float16", 8)]
+    results = run_bench(indexer, queries, formats, tmp_path / "scratch", top_k=5)
+    by_format = {r.format: r for r in results}
+    assert list(by_format) == ["float32", "float16", "float16:8"]
+    assert by_format["float32"].recall == 1.0
+    assert by_format["float16"].recall >= 0.95
+    assert by_format["float16:8"].mb_on_disk < by_format["float16"].mb_on_disk < by_format["float32"].mb_on_disk
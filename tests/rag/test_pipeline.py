@@ -0,0 +1,85 @@
+"""Tests for answer_stream's caching policy, with the RAG and the LM stubbed out."""
+
+import asyncio
+
+import numpy as np
+
+from medirag.cache.abc import SemanticCache
+from medirag.rag import pipeline
+
+
+MODEL = "retriever/model"
+
+
+class FakeIndexer:
+    embed_model = MODEL
+
+    def __init__(self):
+        self.encoded: list[str] = []
+
+    async def aencode_query(self, query):
+        self.encoded.append(query)
+        return np.ones(3, dtype=np.float32)
+
+
+class FakeRAG:
+    def __init__(self):
+        self.indexer = FakeIndexer()
+
+
+class RecordingCache(SemanticCache):
+    def __init__(self, model_name, answer=None):
+        self.model_name = model_name
+        self.answer = answer
+        self.calls: list[tuple[str, object]] = []
+
+    def lookup(self, question, cosine_threshold, vector=None):
+        self.calls.append(("lookup", vector))
+        return self.answer
+
+    def save(self, question, answer, vector=None):
+        self.calls.append(("save", vector))
+
+
+def _answer(rag, cache, monkeypatch):
+    retrieved_with = []
+
+    async def fake_stream_answer(rag, question, query_vector=None):
+        retrieved_with.append(query_vector)
+        yield "Take it "
+        yield "with food."
+
+    monkeypatch.setattr(pipeline, "stream_answer", fake_stream_answer)
+
+    async def run():
+        return [chunk async for chunk in pipeline.answer_stream(rag, cache, "aspirin dose?")]
+
+    return asyncio.run(run()), retrieved_with
+
+
+def test_shared_model_encodes_the_question_once(monkeypatch):
+    rag, cache = FakeRAG(), RecordingCache(MODEL)
+    chunks, retrieved_with = _answer(rag, cache, monkeypatch)
+
+    assert chunks == ["Take it ", "with food."]
+    assert rag.indexer.encoded == ["aspirin dose?"]
+    vector = retrieved_with[0]
+    assert vector is not None
+    assert [kind for kind, _ in cache.calls] == ["lookup", "save"]
+    assert all(v is vector for _, v in cache.calls)
+
+
+def test_other_cache_model_encodes_on_its_own(monkeypatch):
+    rag, cache = FakeRAG(), RecordingCache("sentence-transformers/all-mpnet-base-v2")
+    _, retrieved_with = _answer(rag, cache, monkeypatch)
+
+    assert rag.indexer.encoded == []
+    assert retrieved_with == [None]
+    assert cache.calls == [("lookup", None), ("save", None)]
+
+
+def test_cache_hit_skips_retrieval(monkeypatch):
+    rag, cache = FakeRAG(), RecordingCache(MODEL, answer="Cached.")
+    chunks, retrieved_with = _answer(rag, cache, monkeypatch)
+    assert chunks == ["Cached."]
+    assert retrieved_with == []